@@ -3,17 +3,29 @@ Document Analysis API Routes
 Handles parsing and AI extraction from patient documents
 """
 
+import asyncio
 import json
 import csv
 import io
 import re
-import base64
-from typing import Dict, Any, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from typing import Dict, Any, Optional, Union, BinaryIO
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import logging
+import orjson
 
-from app.config import settings
+from app.config import Settings, get_settings
+
+try:
+    # Optional: google-re2 gives linear-time matching for extraction patterns
+    import re2
+except ImportError:
+    re2 = None
 
 logger = logging.getLogger(__name__)
 
@@ -28,28 +40,25 @@ class ExtractedData(BaseModel):
     warnings: list[str] = []
 
 
-# Field mappings for normalization
+# Field mappings for normalization. Keys are stored pre-normalized (lowercase,
+# underscores); incoming headers are normalized by _map_field before lookup.
 FIELD_MAPPINGS = {
     "age": "age",
     "patient_age": "age",
-    "patient age": "age",
     "bmi": "bmi",
     "body_mass_index": "bmi",
     "stage": "stage",
     "figo_stage": "stage",
-    "figo stage": "stage",
     "histology": "histology",
     "histology_type": "histology",
     "grade": "grade",
     "tumor_grade": "grade",
     "myometrial_invasion": "myometrial_invasion",
-    "myometrial invasion": "myometrial_invasion",
     "invasion_depth": "myometrial_invasion",
     "lvsi": "lvsi",
     "lvsi_status": "lvsi",
     "lymphovascular_invasion": "lvsi",
     "lymph_nodes": "lymph_nodes",
-    "lymph nodes": "lymph_nodes",
     "nodal_status": "lymph_nodes",
     "pole": "pole_status",
     "pole_status": "pole_status",
@@ -153,43 +162,145 @@ VALUE_NORMALIZATIONS = {
 }
 
 
+# Raw document content accepted by the parsers: decoded text, bytes, or a
+# binary file object such as the spooled file behind an UploadFile.
+DocumentContent = Union[str, bytes, BinaryIO]
+
+DIGEST_CHUNK_SIZE = 64 * 1024
+
+
+@lru_cache(maxsize=512)
+def _map_field(key: str) -> Optional[str]:
+    """Map a raw CSV header / JSON key onto a canonical field name"""
+    return FIELD_MAPPINGS.get(key.lower().strip().replace(" ", "_"))
+
+
+def _content_digest(content: DocumentContent) -> bytes:
+    """
+    BLAKE2b digest of document content. File objects are hashed chunk by
+    chunk and rewound so the parser can read them afterwards.
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8", "surrogatepass")
+    if isinstance(content, (bytes, bytearray)):
+        return hashlib.blake2b(content, digest_size=16).digest()
+
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk in iter(lambda: content.read(DIGEST_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.digest()
+
+
+def _memoize_by_content(maxsize: int = 256):
+    """
+    Memoize a document parser on a digest of its content.
+
+    Only the 16-byte digest is kept as the key, so cached documents are not
+    held in memory. Parsed results are flat dicts of scalars; callers get a
+    shallow copy and can mutate it without touching the cache.
+    """
+    def decorator(func):
+        cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(content):
+            key = _content_digest(content)
+            with lock:
+                cached = cache.get(key)
+                if cached is not None:
+                    cache.move_to_end(key)
+                    return dict(cached)
+
+            result = func(content)
+
+            with lock:
+                cache[key] = result
+                if len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return dict(result)
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
+
+
+def _to_float(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _to_int(value: str) -> Optional[int]:
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+# Numeric fields and their coercers (none of these have VALUE_NORMALIZATIONS)
+FIELD_COERCERS = {
+    "age": _to_float,
+    "bmi": _to_float,
+    "ecog_status": _to_int,
+    "er_percent": _to_float,
+    "pr_percent": _to_float,
+}
+
+
 def normalize_value(field: str, value: str) -> Any:
     """Normalize a field value based on field type"""
-    normalized_input = value.lower().strip()
+    # Handle numeric fields
+    coerce = FIELD_COERCERS.get(field)
+    if coerce is not None:
+        return coerce(value)
 
     # Check for field-specific normalizations
-    if field in VALUE_NORMALIZATIONS:
-        if normalized_input in VALUE_NORMALIZATIONS[field]:
-            return VALUE_NORMALIZATIONS[field][normalized_input]
-
-    # Handle numeric fields
-    if field in ["age", "bmi", "ecog_status", "er_percent", "pr_percent"]:
-        try:
-            num = float(value)
-            return int(num) if field == "ecog_status" else num
-        except ValueError:
-            return None
+    normalizations = VALUE_NORMALIZATIONS.get(field)
+    if normalizations is not None:
+        normalized_input = value.lower().strip()
+        if normalized_input in normalizations:
+            return normalizations[normalized_input]
 
     return value
 
 
-def parse_csv_content(content: str) -> Dict[str, Any]:
+@_memoize_by_content()
+def parse_csv_content(content: DocumentContent) -> Dict[str, Any]:
     """Parse CSV content and extract patient data"""
-    reader = csv.DictReader(io.StringIO(content))
-    rows = list(reader)
+    if isinstance(content, str):
+        return _parse_csv_rows(io.StringIO(content))
+    if isinstance(content, (bytes, bytearray)):
+        content = io.BytesIO(content)
+
+    # Decode the stream incrementally; detach afterwards so closing the
+    # wrapper does not close the caller's file.
+    text_stream = io.TextIOWrapper(content, encoding="utf-8", newline="")
+    try:
+        return _parse_csv_rows(text_stream)
+    finally:
+        text_stream.detach()
+
 
-    if not rows:
+def _parse_csv_rows(text_stream) -> Dict[str, Any]:
+    """Extract patient data from the first row of a CSV text stream"""
+    reader = csv.DictReader(text_stream)
+
+    # Only the first row is used; don't materialize the rest of the file
+    try:
+        row = next(reader)
+    except StopIteration:
         raise ValueError("CSV file is empty")
 
-    # Take first row
-    row = rows[0]
     result = {}
 
     for key, value in row.items():
         if not value:
             continue
-        normalized_key = key.lower().strip().replace(" ", "_")
-        mapped_field = FIELD_MAPPINGS.get(normalized_key)
+        mapped_field = _map_field(key)
 
         if mapped_field:
             normalized_value = normalize_value(mapped_field, value)
@@ -199,29 +310,19 @@ def parse_csv_content(content: str) -> Dict[str, Any]:
     return result
 
 
-def parse_json_content(content: str) -> Dict[str, Any]:
+@_memoize_by_content()
+def parse_json_content(content: DocumentContent) -> Dict[str, Any]:
     """Parse JSON content and extract patient data"""
-    data = json.loads(content)
+    if hasattr(content, "read"):
+        content = content.read()
+    # orjson parses bytes directly; its JSONDecodeError subclasses json's
+    data = orjson.loads(content)
     result = {}
 
-    # Flatten nested objects
-    def flatten(obj, prefix=""):
-        items = {}
-        for key, value in obj.items() if isinstance(obj, dict) else []:
-            new_key = f"{prefix}_{key}" if prefix else key
-            if isinstance(value, dict):
-                items.update(flatten(value, new_key))
-            else:
-                items[new_key] = value
-        return items
-
-    flat_data = flatten(data) if isinstance(data, dict) else {}
-
     for key, value in (data.items() if isinstance(data, dict) else []):
         if value is None:
             continue
-        normalized_key = key.lower().strip().replace(" ", "_")
-        mapped_field = FIELD_MAPPINGS.get(normalized_key)
+        mapped_field = _map_field(key)
 
         if mapped_field:
             normalized_value = normalize_value(mapped_field, str(value))
@@ -231,165 +332,370 @@ def parse_json_content(content: str) -> Dict[str, Any]:
     return result
 
 
+# ========================================
+# Precompiled extraction patterns
+# ========================================
+# Compiled once at import and matched against the lowercased document text.
+# re.IGNORECASE is deliberately avoided: it disables the literal-prefix scan
+# and makes each search several times slower than lowering the text once.
+
+# RE2's \s and \d are ASCII-only; Python's also match NBSP and other Unicode
+# spaces/digits, which pypdf emits throughout Soroka reports.
+_RE2_CLASS_TRANSLATIONS = {r"\s": r"\t-\r\x1c-\x1f\x85\p{Z}", r"\d": r"\p{Nd}"}
+
+if re2 is not None:
+    _RE2_OPTIONS = re2.Options()
+    _RE2_OPTIONS.log_errors = False
+
+
+def _to_re2_syntax(pattern: str) -> str:
+    """Rewrite Python-only character classes in pattern into RE2 equivalents"""
+    out = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            escape = pattern[i:i + 2]
+            translated = _RE2_CLASS_TRANSLATIONS.get(escape)
+            if translated is None:
+                out.append(escape)
+            else:
+                out.append(translated if in_class else f"[{translated}]")
+            i += 2
+            continue
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def _compile(pattern: str):
+    """
+    Compile an extraction pattern with RE2 when it is installed, falling back
+    to re when RE2 is missing or the pattern needs backtracking (lookarounds).
+    """
+    if re2 is not None:
+        try:
+            return re2.compile(_to_re2_syntax(pattern), _RE2_OPTIONS)
+        except re2.error:
+            pass
+    return re.compile(pattern)
+
+
+AGE_PATTERNS = (
+    _compile(r'age[:\s]+(\d+)'),
+    _compile(r'(\d+)\s*(?:year|yr)s?\s*old'),
+    _compile(r'patient.*?(\d+)\s*(?:year|yr)'),
+    _compile(r'גיל[:\s]*[yY]?(\d+)'),  # Hebrew: גיל: Y58 or גיל: 58
+    _compile(r'[yY](\d+)\s*(?:כתובת|גיל)'),  # Y58 format
+)
+
+TMB_PATTERNS = tuple(_compile(p) for p in (
+    r'tmb\s*(?:score)?[:\s]*(\d+\.?\d*)\s*(?:\||\s)*(?:muts?/mb)?',
+    r'tmb[:\s]*\(?(\d+\.?\d*)\s*muts?/mb',
+    r'(\d+\.?\d*)\s*muts?/mb.*?tmb',
+    r'low\s*\((\d+\.?\d*)\s*muts?/mb\).*?tmb',
+    r'high\s*\((\d+\.?\d*)\s*muts?/mb\).*?tmb',
+))
+
+MSI_STABLE_PATTERNS = (
+    _compile(r'msi[:\s]*(?:stable|mss)'),
+    _compile(r'stable.*msi'),
+)
+MSI_UNSTABLE_PATTERN = _compile(r'msi[:\s]*(?:unstable|high|msi-?h)')
+
+# Status families sharing an anchor are fused into one alternation with named
+# groups, so a single finditer pass reports every status mentioned.
+POLE_STATUS_PATTERN = _compile(
+    r'pole(?:[:\s]+(?:status[:\s]+)?(?:(?P<wild_type>wild[-\s]?type)|(?P<mutated>mutated))'
+    r'|\s+(?:(?P<detected>detected(?!\s+not))|(?P<not_detected>not\s+detected)))'
+)
+
+TP53_DETECTED_PATTERN = _compile(r'tp53\s*\(?detected\)?[:\s]*c\.')
+TP53_PATHOGENIC_PATTERN = _compile(r'tp53.*pathogenic')
+TP53_NOT_DETECTED_PATTERN = _compile(r'tp53\s*\(?not\s*detected\)?')
+
+# MMR IHC proteins, e.g. "MLH1 lost", "PMS2 (-)", "MSH6 intact", "MSH2 (+)"
+MMR_PROTEINS = ("mlh1", "pms2", "msh2", "msh6")
+MMR_STATUS_PATTERN = _compile(
+    r'(' + "|".join(MMR_PROTEINS) + r')\s*(lost|loss|\(?\-\)?|intact|\(?\+\)?)'
+)
+MMR_STATUS_LABELS = {"lost": "Lost", "loss": "Lost", "-": "Lost", "intact": "Intact", "+": "Intact"}
+
+TUMOR_PURITY_PATTERN = _compile(r'tumor\s*(?:purity|comprising)[:\s]*(\d+\.?\d*)%?')
+
+# Additional NGS genes reported as "<gene> (detected)" / "<gene> (not detected)"
+NGS_GENES = ("fgfr2", "pten", "pik3ca", "fbxw7", "kras")
+GENE_STATUS_PATTERN = _compile(r'(' + "|".join(NGS_GENES) + r')\s*\(?(not\s*)?detected\)?')
+
+BMI_PATTERNS = (
+    _compile(r'bmi[:\s]+(\d+\.?\d*)'),
+    _compile(r'body mass index[:\s]+(\d+\.?\d*)'),
+)
+
+# Histology keywords in priority order (first keyword present wins)
+HISTOLOGY_KEYWORDS = {
+    "endometrioid": "Endometrioid",
+    "endometrial carcinoma": "Endometrioid",
+    "serous": "Serous",
+    "clear cell": "Clear Cell",
+    "clearcell": "Clear Cell",
+    "carcinosarcoma": "Carcinosarcoma",
+    "mixed": "Mixed",
+    "undifferentiated": "Undifferentiated",
+    "dedifferentiated": "Undifferentiated",
+}
+
+FIGO_STAGES = frozenset({"IA", "IB", "II", "IIIA", "IIIB", "IIIC1", "IIIC2", "IVA", "IVB"})
+
+
+def _figo_stage(stage_raw: str) -> Optional[str]:
+    """Longest FIGO_STAGES prefix of a matched stage (IA1 -> IA, IIB -> II, IIIA1 -> IIIA)"""
+    for end in range(len(stage_raw), 0, -1):
+        if stage_raw[:end] in FIGO_STAGES:
+            return stage_raw[:end]
+    return None
+
+
+STAGE_PATTERNS = (
+    _compile(r'stage\s*(iv[ab]?|i{1,3}[abc]?\d?)'),
+    _compile(r'figo\s*(iv[ab]?|i{1,3}[abc]?\d?)'),
+)
+
+GRADE_LABELS = {
+    "1": "G1", "well": "G1",
+    "2": "G2", "moderately": "G2",
+    "3": "G3", "poorly": "G3",
+}
+
+GRADE_PATTERNS = (
+    _compile(r'grade\s*(\d|[123])'),
+    _compile(r'g(\d)'),
+    _compile(r'(well|moderately|poorly)\s*differentiated'),
+)
+
+LVSI_STATUS_PATTERN = _compile(
+    r'lvsi[:\s]+(?:status[:\s]+)?'
+    r'(?:(?P<focal>focal)|(?P<substantial>substantial)|(?P<present>present)|(?P<absent>absent|negative))'
+)
+
+CTNNB1_STATUS_PATTERN = _compile(
+    r'ctnnb1[:\s]+(?:status[:\s]+)?(?:(?P<wild_type>wild[-\s]?type)|(?P<mutated>mutated))'
+)
+
+LYMPH_STATUS_PATTERN = _compile(
+    r'lymph\s*node[:\s]+(?:status[:\s]+)?(?:(?P<negative>negative)|(?P<positive>positive))'
+)
+
+
+# Terms at least one of which must appear (in the lowercased text) for an
+# extraction section to match anything; sections without a hit are skipped.
+SECTION_ANCHORS = {
+    "age": ("age", "year", "yr", "גיל", "כתובת"),
+    "tmb": ("tmb",),
+    "msi": ("msi",),
+    "pole": ("pole",),
+    "p53": ("p53",),  # also covers "tp53"
+    "mmr": MMR_PROTEINS + ("mmr", "mismatch repair"),
+    "tumor_purity": ("tumor",),
+    "bmi": ("bmi", "body mass index"),
+    "stage": ("stage", "figo"),
+    "lvsi": ("lvsi", "lymphovascular"),
+    "ctnnb1": ("ctnnb1", "beta-catenin", "β-catenin"),
+    "lymph_nodes": ("lymph", "nodal"),
+}
+
+
+def _matched_groups(pattern, text: str) -> set:
+    """Names of every named group matched anywhere in text, in one pass"""
+    return {match.lastgroup for match in pattern.finditer(text)}
+
+
+# Whole-document fallback vocabulary per field, consulted when the anchored
+# patterns above found nothing. Statuses are tried in order and the first one
+# with any of its terms present in the text wins.
+STATUS_VOCAB = {
+    "pole_status": (
+        ("Mutated", ("mutated", "mutation")),
+        ("Wild-type", ("wild",)),
+    ),
+    "p53_status": (
+        ("Abnormal", ("abnormal", "mutant", "overexpression", "null", "detected", "pathogenic")),
+        ("Wild-type", ("wild", "normal", "not detected")),
+    ),
+    "mmr_status": (
+        ("Deficient", ("deficient", "loss", "dmmr")),
+        ("Proficient", ("proficient", "intact", "pmmr")),
+    ),
+    "lvsi": (
+        ("Focal", ("focal",)),
+        ("Substantial", ("substantial",)),
+        ("Present", ("present", "positive", "identified", "seen")),
+        ("Absent", ("absent", "negative", "not identified", "not seen")),
+    ),
+    "myometrial_invasion": (
+        ("<50%", ("<50%", "less than 50", "superficial", "< 50%", "inner half")),
+        ("≥50%", (">=50%", ">50%", "≥50%", "more than 50", "deep", "outer half")),
+    ),
+    "l1cam_status": (
+        ("Positive", ("positive", ">10%", "≥10%")),
+        ("Negative", ("negative", "<10%")),
+    ),
+    "ctnnb1_status": (
+        ("Mutated", ("mutated", "mutation", "positive", "nuclear")),
+        ("Wild-type", ("wild", "negative")),
+    ),
+    "lymph_nodes": (
+        ("Positive", ("positive", "metastasis", "involved")),
+        ("Negative", ("negative", "no metastasis", "not involved")),
+    ),
+}
+
+
+class _TermPresence(dict):
+    """Lazy term -> bool map over one document; each term is scanned at most once"""
+
+    def __init__(self, text: str):
+        super().__init__()
+        self.text = text
+
+    def __missing__(self, term: str) -> bool:
+        present = self[term] = term in self.text
+        return present
+
+
+def _classify_status(terms: _TermPresence, field: str) -> Optional[str]:
+    """First status in STATUS_VOCAB[field] with any of its terms in the document"""
+    for status, words in STATUS_VOCAB[field]:
+        if any(terms[word] for word in words):
+            return status
+    return None
+
+
+@_memoize_by_content()
 def extract_from_text(text: str) -> Dict[str, Any]:
     """
     Extract patient data from unstructured text using pattern matching.
     Optimized for Soroka Medical Center NGS/Oncomine and MMR IHC reports.
     """
     result = {}
+    # The single lowercased copy is shared by every pattern and keyword test;
+    # see the note above the precompiled patterns on why not re.IGNORECASE.
     text_lower = text.lower()
 
+    # Cheap substring prefilter: skip the regex work for any section whose
+    # anchor terms never appear in the document.
+    sections = {
+        section for section, anchors in SECTION_ANCHORS.items()
+        if any(anchor in text_lower for anchor in anchors)
+    }
+    # Fallback vocabulary terms ("positive", "wild", ...) recur across fields;
+    # share their presence checks instead of rescanning the text per field.
+    terms = _TermPresence(text_lower)
+
     # ========================================
     # AGE EXTRACTION (including Hebrew format)
     # ========================================
-    age_patterns = [
-        r'age[:\s]+(\d+)',
-        r'(\d+)\s*(?:year|yr)s?\s*old',
-        r'patient.*?(\d+)\s*(?:year|yr)',
-        r'גיל[:\s]*[yY]?(\d+)',  # Hebrew: גיל: Y58 or גיל: 58
-        r'[yY](\d+)\s*(?:כתובת|גיל)',  # Y58 format
-    ]
-    for pattern in age_patterns:
-        match = re.search(pattern, text_lower if 'גיל' not in pattern else text)
-        if match:
-            age = int(match.group(1))
-            if 18 <= age <= 100:
-                result["age"] = age
-                break
+    if "age" in sections:
+        for pattern in AGE_PATTERNS:
+            match = pattern.search(text_lower)
+            if match:
+                age = int(match.group(1))
+                if 18 <= age <= 100:
+                    result["age"] = age
+                    break
 
     # ========================================
     # TMB (Tumor Mutational Burden) - Soroka NGS Reports
     # ========================================
-    tmb_patterns = [
-        r'tmb\s*(?:score)?[:\s]*(\d+\.?\d*)\s*(?:\||\s)*(?:muts?/mb)?',
-        r'tmb[:\s]*\(?(\d+\.?\d*)\s*muts?/mb',
-        r'(\d+\.?\d*)\s*muts?/mb.*?tmb',
-        r'low\s*\((\d+\.?\d*)\s*muts?/mb\).*?tmb',
-        r'high\s*\((\d+\.?\d*)\s*muts?/mb\).*?tmb',
-    ]
-    for pattern in tmb_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            tmb_value = float(match.group(1))
-            result["tmb_score"] = tmb_value
-            # Classify TMB: Low (<10) or High (>=10)
-            result["tmb_status"] = "High" if tmb_value >= 10 else "Low"
-            break
+    if "tmb" in sections:
+        for pattern in TMB_PATTERNS:
+            match = pattern.search(text_lower)
+            if match:
+                tmb_value = float(match.group(1))
+                result["tmb_score"] = tmb_value
+                # Classify TMB: Low (<10) or High (>=10)
+                result["tmb_status"] = "High" if tmb_value >= 10 else "Low"
+                break
 
     # ========================================
     # MSI (Microsatellite Instability) - Soroka NGS Reports
     # ========================================
-    msi_patterns = [
-        r'msi[:\s]*stable',
-        r'msi[:\s]*unstable',
-        r'msi[:\s]*high',
-        r'msi[:\s]*low',
-        r'msi-?h',
-        r'msi-?s',
-        r'stable\s*\([\d.]+\).*?msi',
-    ]
-    if re.search(r'msi[:\s]*(?:stable|mss)', text_lower) or re.search(r'stable.*msi', text_lower):
-        result["msi_status"] = "Stable"
-    elif re.search(r'msi[:\s]*(?:unstable|high|msi-?h)', text_lower):
-        result["msi_status"] = "Unstable"
+    if "msi" in sections:
+        if any(pattern.search(text_lower) for pattern in MSI_STABLE_PATTERNS):
+            result["msi_status"] = "Stable"
+        elif MSI_UNSTABLE_PATTERN.search(text_lower):
+            result["msi_status"] = "Unstable"
 
     # ========================================
     # POLE MUTATION STATUS - Soroka NGS Reports
     # ========================================
-    # Check POLE mutation status - look for explicit patterns first
-    pole_wildtype = re.search(r'pole[:\s]+(?:status[:\s]+)?wild[-\s]?type', text_lower)
-    pole_mutated = re.search(r'pole[:\s]+(?:status[:\s]+)?mutated', text_lower)
-    pole_detected = re.search(r'pole\s+detected(?!\s+not)', text_lower)
-    pole_not_detected = re.search(r'pole\s+not\s+detected', text_lower)
-
-    if pole_wildtype or pole_not_detected:
-        result["pole_status"] = "Wild-type"
-    elif pole_mutated or pole_detected:
-        result["pole_status"] = "Mutated"
-    elif "pole" in text_lower:
-        if any(word in text_lower for word in ["mutated", "mutation"]):
-            result["pole_status"] = "Mutated"
-        elif "wild" in text_lower:
+    if "pole" in sections:
+        # Check POLE mutation status - look for explicit patterns first
+        pole_hits = _matched_groups(POLE_STATUS_PATTERN, text_lower)
+
+        if "wild_type" in pole_hits or "not_detected" in pole_hits:
             result["pole_status"] = "Wild-type"
+        elif "mutated" in pole_hits or "detected" in pole_hits:
+            result["pole_status"] = "Mutated"
+        else:
+            status = _classify_status(terms, "pole_status")
+            if status:
+                result["pole_status"] = status
 
     # ========================================
     # TP53 MUTATION STATUS - Soroka NGS Reports
     # ========================================
-    tp53_detected = re.search(r'tp53\s*\(?detected\)?[:\s]*c\.', text_lower)
-    tp53_pathogenic = re.search(r'tp53.*pathogenic', text_lower)
-    tp53_not_detected = re.search(r'tp53\s*\(?not\s*detected\)?', text_lower)
+    if "p53" in sections:
+        tp53_detected = TP53_DETECTED_PATTERN.search(text_lower)
+        tp53_pathogenic = TP53_PATHOGENIC_PATTERN.search(text_lower)
+        tp53_not_detected = TP53_NOT_DETECTED_PATTERN.search(text_lower)
 
-    if (tp53_detected or tp53_pathogenic) and not tp53_not_detected:
-        result["p53_status"] = "Abnormal"
-    elif tp53_not_detected:
-        result["p53_status"] = "Wild-type"
-    elif "p53" in text_lower or "tp53" in text_lower:
-        if any(word in text_lower for word in ["abnormal", "mutant", "overexpression", "null", "detected", "pathogenic"]):
+        if (tp53_detected or tp53_pathogenic) and not tp53_not_detected:
             result["p53_status"] = "Abnormal"
-        elif any(word in text_lower for word in ["wild", "normal", "not detected"]):
+        elif tp53_not_detected:
             result["p53_status"] = "Wild-type"
+        else:
+            status = _classify_status(terms, "p53_status")
+            if status:
+                result["p53_status"] = status
 
     # ========================================
     # MMR IHC STATUS - Soroka MMR Reports
     # ========================================
-    # Parse MMR immunohistochemistry results
-    mlh1_lost = re.search(r'mlh1\s*(?:lost|loss|\(?\-\)?)', text_lower)
-    pms2_lost = re.search(r'pms2\s*(?:lost|loss|\(?\-\)?)', text_lower)
-    msh2_lost = re.search(r'msh2\s*(?:lost|loss|\(?\-\)?)', text_lower)
-    msh6_lost = re.search(r'msh6\s*(?:lost|loss|\(?\-\)?)', text_lower)
-
-    mlh1_intact = re.search(r'mlh1\s*(?:intact|\(?\+\)?)', text_lower)
-    pms2_intact = re.search(r'pms2\s*(?:intact|\(?\+\)?)', text_lower)
-    msh2_intact = re.search(r'msh2\s*(?:intact|\(?\+\)?)', text_lower)
-    msh6_intact = re.search(r'msh6\s*(?:intact|\(?\+\)?)', text_lower)
-
-    # Store individual MMR protein status
-    if mlh1_lost:
-        result["mlh1_status"] = "Lost"
-    elif mlh1_intact:
-        result["mlh1_status"] = "Intact"
-
-    if pms2_lost:
-        result["pms2_status"] = "Lost"
-    elif pms2_intact:
-        result["pms2_status"] = "Intact"
-
-    if msh2_lost:
-        result["msh2_status"] = "Lost"
-    elif msh2_intact:
-        result["msh2_status"] = "Intact"
-
-    if msh6_lost:
-        result["msh6_status"] = "Lost"
-    elif msh6_intact:
-        result["msh6_status"] = "Intact"
-
-    # Determine overall MMR status
-    if mlh1_lost or pms2_lost or msh2_lost or msh6_lost:
-        result["mmr_status"] = "Deficient"
-    elif mlh1_intact and pms2_intact and msh2_intact and msh6_intact:
-        result["mmr_status"] = "Proficient"
-    elif "mmr" in text_lower or "mismatch repair" in text_lower:
-        if any(word in text_lower for word in ["deficient", "loss", "dmmr"]):
+    if "mmr" in sections:
+        # Parse MMR immunohistochemistry results
+        # One pass over all four proteins; a "lost" mention wins over "intact"
+        protein_status = {}
+        for match in MMR_STATUS_PATTERN.finditer(text_lower):
+            protein = match.group(1)
+            status = MMR_STATUS_LABELS[match.group(2).strip("()")]
+            if status == "Lost" or protein not in protein_status:
+                protein_status[protein] = status
+
+        # Store individual MMR protein status
+        for protein in MMR_PROTEINS:
+            if protein in protein_status:
+                result[f"{protein}_status"] = protein_status[protein]
+
+        # Determine overall MMR status
+        if "Lost" in protein_status.values():
             result["mmr_status"] = "Deficient"
-        elif any(word in text_lower for word in ["proficient", "intact", "pmmr"]):
+        elif len(protein_status) == len(MMR_PROTEINS):
             result["mmr_status"] = "Proficient"
+        elif terms["mmr"] or terms["mismatch repair"]:
+            status = _classify_status(terms, "mmr_status")
+            if status:
+                result["mmr_status"] = status
 
     # ========================================
     # HISTOLOGY / CANCER TYPE
     # ========================================
-    histology_keywords = {
-        "endometrioid": "Endometrioid",
-        "endometrial carcinoma": "Endometrioid",
-        "serous": "Serous",
-        "clear cell": "Clear Cell",
-        "clearcell": "Clear Cell",
-        "carcinosarcoma": "Carcinosarcoma",
-        "mixed": "Mixed",
-        "undifferentiated": "Undifferentiated",
-        "dedifferentiated": "Undifferentiated",
-    }
-    for keyword, value in histology_keywords.items():
+    for keyword, value in HISTOLOGY_KEYWORDS.items():
         if keyword in text_lower:
             result["histology"] = value
             break
@@ -397,42 +703,26 @@ def extract_from_text(text: str) -> Dict[str, Any]:
     # ========================================
     # TUMOR PURITY (Soroka NGS Reports)
     # ========================================
-    tumor_purity_match = re.search(r'tumor\s*(?:purity|comprising)[:\s]*(\d+\.?\d*)%?', text_lower)
-    if tumor_purity_match:
-        result["tumor_purity"] = float(tumor_purity_match.group(1))
+    if "tumor_purity" in sections:
+        tumor_purity_match = TUMOR_PURITY_PATTERN.search(text_lower)
+        if tumor_purity_match:
+            result["tumor_purity"] = float(tumor_purity_match.group(1))
 
     # ========================================
     # ADDITIONAL MOLECULAR MARKERS FROM NGS
     # ========================================
-    # FGFR2
-    if re.search(r'fgfr2\s*\(?detected\)?', text_lower):
-        result["fgfr2_status"] = "Mutated"
-    elif re.search(r'fgfr2\s*\(?not\s*detected\)?', text_lower):
-        result["fgfr2_status"] = "Wild-type"
-
-    # PTEN
-    if re.search(r'pten\s*\(?detected\)?', text_lower):
-        result["pten_status"] = "Mutated"
-    elif re.search(r'pten\s*\(?not\s*detected\)?', text_lower):
-        result["pten_status"] = "Wild-type"
-
-    # PIK3CA
-    if re.search(r'pik3ca\s*\(?detected\)?', text_lower):
-        result["pik3ca_status"] = "Mutated"
-    elif re.search(r'pik3ca\s*\(?not\s*detected\)?', text_lower):
-        result["pik3ca_status"] = "Wild-type"
-
-    # FBXW7
-    if re.search(r'fbxw7\s*\(?detected\)?', text_lower):
-        result["fbxw7_status"] = "Mutated"
-    elif re.search(r'fbxw7\s*\(?not\s*detected\)?', text_lower):
-        result["fbxw7_status"] = "Wild-type"
-
-    # KRAS
-    if re.search(r'kras\s*\(?detected\)?', text_lower):
-        result["kras_status"] = "Mutated"
-    elif re.search(r'kras\s*\(?not\s*detected\)?', text_lower):
-        result["kras_status"] = "Wild-type"
+    # FGFR2, PTEN, PIK3CA, FBXW7, KRAS - one pass; any "detected" wins
+    gene_status = {}
+    for match in GENE_STATUS_PATTERN.finditer(text_lower):
+        gene, negated = match.group(1), match.group(2)
+        if negated is None:
+            gene_status[gene] = "Mutated"
+        else:
+            gene_status.setdefault(gene, "Wild-type")
+
+    for gene in NGS_GENES:
+        if gene in gene_status:
+            result[f"{gene}_status"] = gene_status[gene]
 
     # ========================================
     # DETERMINE MOLECULAR CLASSIFICATION (TCGA)
@@ -460,139 +750,139 @@ def extract_from_text(text: str) -> Dict[str, Any]:
     # ========================================
     # BMI extraction
     # ========================================
-    bmi_patterns = [
-        r'bmi[:\s]+(\d+\.?\d*)',
-        r'body mass index[:\s]+(\d+\.?\d*)',
-    ]
-    for pattern in bmi_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            bmi = float(match.group(1))
-            if 15 <= bmi <= 60:
-                result["bmi"] = bmi
-                break
+    if "bmi" in sections:
+        for pattern in BMI_PATTERNS:
+            match = pattern.search(text_lower)
+            if match:
+                bmi = float(match.group(1))
+                if 15 <= bmi <= 60:
+                    result["bmi"] = bmi
+                    break
 
     # ========================================
     # Stage extraction
     # ========================================
-    stage_patterns = [
-        r'stage\s*(i{1,3}[abc]?\d?|iv[ab]?)',
-        r'figo\s*(i{1,3}[abc]?\d?|iv[ab]?)',
-    ]
-    for pattern in stage_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            stage_raw = match.group(1).upper()
-            stage_map = {
-                "IA": "IA", "IB": "IB", "II": "II",
-                "IIIA": "IIIA", "IIIB": "IIIB", "IIIC1": "IIIC1", "IIIC2": "IIIC2",
-                "IVA": "IVA", "IVB": "IVB",
-            }
-            for key, val in stage_map.items():
-                if key in stage_raw:
-                    result["stage"] = val
-                    break
-            break
+    if "stage" in sections:
+        for pattern in STAGE_PATTERNS:
+            match = pattern.search(text_lower)
+            if match:
+                stage = _figo_stage(match.group(1).upper())
+                if stage:
+                    result["stage"] = stage
+                break
 
     # ========================================
     # Grade extraction
     # ========================================
-    grade_patterns = [
-        r'grade\s*(\d|[123])',
-        r'g(\d)',
-        r'(well|moderately|poorly)\s*differentiated',
-    ]
-    for pattern in grade_patterns:
-        match = re.search(pattern, text_lower)
+    for pattern in GRADE_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
-            grade_raw = match.group(1)
-            if grade_raw in ["1", "well"]:
-                result["grade"] = "G1"
-            elif grade_raw in ["2", "moderately"]:
-                result["grade"] = "G2"
-            elif grade_raw in ["3", "poorly"]:
-                result["grade"] = "G3"
+            grade = GRADE_LABELS.get(match.group(1))
+            if grade:
+                result["grade"] = grade
             break
 
     # ========================================
     # LVSI extraction
     # ========================================
-    lvsi_focal = re.search(r'lvsi[:\s]+(?:status[:\s]+)?focal', text_lower)
-    lvsi_substantial = re.search(r'lvsi[:\s]+(?:status[:\s]+)?substantial', text_lower)
-    lvsi_present = re.search(r'lvsi[:\s]+(?:status[:\s]+)?present', text_lower)
-    lvsi_absent = re.search(r'lvsi[:\s]+(?:status[:\s]+)?(?:absent|negative)', text_lower)
-
-    if lvsi_focal:
-        result["lvsi"] = "Focal"
-    elif lvsi_substantial:
-        result["lvsi"] = "Substantial"
-    elif lvsi_present:
-        result["lvsi"] = "Present"
-    elif lvsi_absent:
-        result["lvsi"] = "Absent"
-    elif "lvsi" in text_lower or "lymphovascular" in text_lower:
-        if "focal" in text_lower:
+    if "lvsi" in sections:
+        lvsi_hits = _matched_groups(LVSI_STATUS_PATTERN, text_lower)
+
+        if "focal" in lvsi_hits:
             result["lvsi"] = "Focal"
-        elif "substantial" in text_lower:
+        elif "substantial" in lvsi_hits:
             result["lvsi"] = "Substantial"
-        elif any(word in text_lower for word in ["present", "positive", "identified", "seen"]):
+        elif "present" in lvsi_hits:
             result["lvsi"] = "Present"
-        elif any(word in text_lower for word in ["absent", "negative", "not identified", "not seen"]):
+        elif "absent" in lvsi_hits:
             result["lvsi"] = "Absent"
+        else:
+            status = _classify_status(terms, "lvsi")
+            if status:
+                result["lvsi"] = status
 
     # ========================================
     # Myometrial invasion
     # ========================================
     if "myometrial" in text_lower or "invasion" in text_lower:
-        if any(phrase in text_lower for phrase in ["<50%", "less than 50", "superficial", "< 50%", "inner half"]):
-            result["myometrial_invasion"] = "<50%"
-        elif any(phrase in text_lower for phrase in [">=50%", ">50%", "≥50%", "more than 50", "deep", "outer half"]):
-            result["myometrial_invasion"] = "≥50%"
+        status = _classify_status(terms, "myometrial_invasion")
+        if status:
+            result["myometrial_invasion"] = status
 
     # ========================================
     # L1CAM
     # ========================================
     if "l1cam" in text_lower:
-        if any(word in text_lower for word in ["positive", ">10%", "≥10%"]):
-            result["l1cam_status"] = "Positive"
-        elif any(word in text_lower for word in ["negative", "<10%"]):
-            result["l1cam_status"] = "Negative"
+        status = _classify_status(terms, "l1cam_status")
+        if status:
+            result["l1cam_status"] = status
 
     # ========================================
     # CTNNB1
     # ========================================
-    ctnnb1_wildtype = re.search(r'ctnnb1[:\s]+(?:status[:\s]+)?wild[-\s]?type', text_lower)
-    ctnnb1_mutated = re.search(r'ctnnb1[:\s]+(?:status[:\s]+)?mutated', text_lower)
+    if "ctnnb1" in sections:
+        ctnnb1_hits = _matched_groups(CTNNB1_STATUS_PATTERN, text_lower)
 
-    if ctnnb1_wildtype:
-        result["ctnnb1_status"] = "Wild-type"
-    elif ctnnb1_mutated:
-        result["ctnnb1_status"] = "Mutated"
-    elif "ctnnb1" in text_lower or "beta-catenin" in text_lower or "β-catenin" in text_lower:
-        if any(word in text_lower for word in ["mutated", "mutation", "positive", "nuclear"]):
-            result["ctnnb1_status"] = "Mutated"
-        elif any(word in text_lower for word in ["wild", "negative"]):
+        if "wild_type" in ctnnb1_hits:
             result["ctnnb1_status"] = "Wild-type"
+        elif "mutated" in ctnnb1_hits:
+            result["ctnnb1_status"] = "Mutated"
+        else:
+            status = _classify_status(terms, "ctnnb1_status")
+            if status:
+                result["ctnnb1_status"] = status
 
     # ========================================
     # Lymph nodes
     # ========================================
-    lymph_negative = re.search(r'lymph\s*node[:\s]+(?:status[:\s]+)?negative', text_lower)
-    lymph_positive = re.search(r'lymph\s*node[:\s]+(?:status[:\s]+)?positive', text_lower)
+    if "lymph_nodes" in sections:
+        lymph_hits = _matched_groups(LYMPH_STATUS_PATTERN, text_lower)
 
-    if lymph_negative:
-        result["lymph_nodes"] = "Negative"
-    elif lymph_positive:
-        result["lymph_nodes"] = "Positive"
-    elif "lymph node" in text_lower or "nodal" in text_lower:
-        if any(word in text_lower for word in ["positive", "metastasis", "involved"]):
-            result["lymph_nodes"] = "Positive"
-        elif any(word in text_lower for word in ["negative", "no metastasis", "not involved"]):
+        if "negative" in lymph_hits:
             result["lymph_nodes"] = "Negative"
+        elif "positive" in lymph_hits:
+            result["lymph_nodes"] = "Positive"
+        elif terms["lymph node"] or terms["nodal"]:
+            status = _classify_status(terms, "lymph_nodes")
+            if status:
+                result["lymph_nodes"] = status
 
     return result
 
 
+def _is_blank(text: str) -> bool:
+    """Whitespace-only check without building a stripped copy of the document"""
+    return not text or text.isspace()
+
+
+def _pdf_to_text(stream: BinaryIO, page_suffix: str = "") -> str:
+    """
+    Extract the text of every PDF page, each followed by page_suffix.
+    pypdf is pure Python and CPU-bound, so callers run this in a worker
+    thread to keep the event loop free.
+    """
+    import pypdf
+
+    pdf_reader = pypdf.PdfReader(stream)
+    return "".join((page.extract_text() or "") + page_suffix for page in pdf_reader.pages)
+
+
+def _extraction_response(
+    extracted: Dict[str, Any], confidence: float, method: str, warnings: list[str]
+) -> ORJSONResponse:
+    """
+    Serialize an ExtractedData payload straight to JSON. Returning a Response
+    skips FastAPI's response_model validation pass; the model still documents
+    the schema in OpenAPI.
+    """
+    return ORJSONResponse({
+        "extracted_data": extracted,
+        "confidence": confidence,
+        "method": method,
+        "warnings": warnings,
+    })
+
+
 @router.post("/analyze", response_model=ExtractedData)
 async def analyze_document(file: UploadFile = File(...)):
     """
@@ -609,49 +899,29 @@ async def analyze_document(file: UploadFile = File(...)):
     warnings = []
 
     try:
-        content = await file.read()
+        # UploadFile is already spooled (to disk past 1 MB); parse from the
+        # file object instead of reading the whole upload into one bytes.
+        await file.seek(0)
+        upload = file.file
 
         # Handle CSV
         if filename.endswith(".csv") or "csv" in content_type:
-            text_content = content.decode("utf-8")
-            extracted = parse_csv_content(text_content)
-            return ExtractedData(
-                extracted_data=extracted,
-                confidence=0.95,
-                method="csv_parsing",
-                warnings=warnings
-            )
+            extracted = parse_csv_content(upload)
+            return _extraction_response(extracted, 0.95, "csv_parsing", warnings)
 
         # Handle JSON
         if filename.endswith(".json") or "json" in content_type:
-            text_content = content.decode("utf-8")
-            extracted = parse_json_content(text_content)
-            return ExtractedData(
-                extracted_data=extracted,
-                confidence=0.95,
-                method="json_parsing",
-                warnings=warnings
-            )
+            extracted = parse_json_content(upload)
+            return _extraction_response(extracted, 0.95, "json_parsing", warnings)
 
         # Handle PDF
         if filename.endswith(".pdf") or "pdf" in content_type:
             try:
-                # Try to extract text from PDF using PyPDF2 or pdfplumber
-                import pypdf
+                text = await asyncio.to_thread(_pdf_to_text, upload)
 
-                pdf_reader = pypdf.PdfReader(io.BytesIO(content))
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() or ""
-
-                if not text.strip():
+                if _is_blank(text):
                     warnings.append("Could not extract text from PDF. The document may be scanned/image-based.")
-                    return ExtractedData(
-                        extracted_data={},
-                        confidence=0.0,
-                        method="pdf_extraction_failed",
-                        warnings=warnings
-                    )
+                    return _extraction_response({}, 0.0, "pdf_extraction_failed", warnings)
 
                 extracted = extract_from_text(text)
                 confidence = min(0.7, 0.2 + len(extracted) * 0.05)
@@ -659,31 +929,16 @@ async def analyze_document(file: UploadFile = File(...)):
                 if len(extracted) < 3:
                     warnings.append("Only partial data could be extracted. Please verify and complete missing fields.")
 
-                return ExtractedData(
-                    extracted_data=extracted,
-                    confidence=confidence,
-                    method="pdf_text_extraction",
-                    warnings=warnings
-                )
+                return _extraction_response(extracted, confidence, "pdf_text_extraction", warnings)
 
             except ImportError:
                 warnings.append("PDF parsing library not available. Please install pypdf.")
-                return ExtractedData(
-                    extracted_data={},
-                    confidence=0.0,
-                    method="pdf_library_missing",
-                    warnings=warnings
-                )
+                return _extraction_response({}, 0.0, "pdf_library_missing", warnings)
 
         # Handle Images
         if any(filename.endswith(ext) for ext in [".png", ".jpg", ".jpeg"]) or "image" in content_type:
             warnings.append("Image OCR requires additional setup. Please use PDF or structured data formats.")
-            return ExtractedData(
-                extracted_data={},
-                confidence=0.0,
-                method="image_ocr_not_available",
-                warnings=warnings
-            )
+            return _extraction_response({}, 0.0, "image_ocr_not_available", warnings)
 
         raise HTTPException(status_code=400, detail=f"Unsupported file type: {content_type}")
 
@@ -701,7 +956,9 @@ async def analyze_document(file: UploadFile = File(...)):
 # ============================================
 
 @router.post("/ai-analyze")
-async def ai_analyze_document(file: UploadFile = File(...)):
+async def ai_analyze_document(
+    file: UploadFile = File(...), settings: Settings = Depends(get_settings)
+):
     """
     AI-Powered Intelligent Document Analysis
 
@@ -731,49 +988,53 @@ async def ai_analyze_document(file: UploadFile = File(...)):
     content_type = file.content_type or ""
 
     try:
-        content = await file.read()
         document_text = ""
         document_type = "unknown"
         image_data = None
+        image_media_type = "image/png"
 
         # Extract text based on file type
         if filename.endswith(".pdf") or "pdf" in content_type:
             document_type = "Medical Report (PDF)"
             try:
-                import pypdf
-                pdf_reader = pypdf.PdfReader(io.BytesIO(content))
-                for page in pdf_reader.pages:
-                    document_text += (page.extract_text() or "") + "\n"
+                await file.seek(0)
+                document_text = await asyncio.to_thread(_pdf_to_text, file.file, "\n")
             except ImportError:
                 raise HTTPException(status_code=500, detail="pypdf not installed. Run: pip install pypdf")
 
         elif filename.endswith(".csv") or "csv" in content_type:
             document_type = "Structured Data (CSV)"
-            document_text = content.decode("utf-8")
+            document_text = (await file.read()).decode("utf-8")
 
         elif filename.endswith(".json") or "json" in content_type:
             document_type = "Structured Data (JSON)"
-            document_text = content.decode("utf-8")
+            document_text = (await file.read()).decode("utf-8")
 
         elif any(filename.endswith(ext) for ext in [".png", ".jpg", ".jpeg"]) or "image" in content_type:
             document_type = "Medical Document (Image)"
             # For images, we'll send the image data to the AI for visual analysis
-            image_data = base64.b64encode(content).decode("utf-8")
+            from app.services.ai_agent import prepare_image
+
+            try:
+                image_data, image_media_type = await asyncio.to_thread(prepare_image, await file.read())
+            except OSError:  # PIL.UnidentifiedImageError and truncated files
+                raise HTTPException(status_code=400, detail="Could not read the uploaded image")
             document_text = "[Image document - visual analysis required]"
 
         elif filename.endswith(".txt") or "text" in content_type:
             document_type = "Text Document"
-            document_text = content.decode("utf-8")
+            document_text = (await file.read()).decode("utf-8")
 
         else:
             # Try to decode as text
+            content = await file.read()
             try:
                 document_text = content.decode("utf-8")
                 document_type = "Unknown Text Document"
             except:
                 raise HTTPException(status_code=400, detail=f"Unsupported file type: {content_type}")
 
-        if not document_text.strip() and not image_data:
+        if _is_blank(document_text) and not image_data:
             raise HTTPException(status_code=400, detail="Could not extract content from document")
 
         # Import and use the AI agent
@@ -782,7 +1043,8 @@ async def ai_analyze_document(file: UploadFile = File(...)):
         assessment = await ai_agent.analyze_document(
             document_text=document_text,
             document_type=document_type,
-            image_data=image_data
+            image_data=image_data,
+            image_media_type=image_media_type
         )
 
         return assessment.model_dump()
@@ -4,35 +4,44 @@ Explanation API Routes
 Endpoints for SHAP explanations.
 """
 
+import asyncio
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from app.models.patient import PatientData
 from app.models.explanation import ShapExplanation
+from app.core.batch_scheduler import get_prediction_batcher, get_explanation_batcher
 from app.core.explainer import get_shap_explainer
-from app.core.risk_engine import get_risk_engine
 
 router = APIRouter()
 
 
 @router.post("/explain", response_model=ShapExplanation)
-async def explain_prediction(patient: PatientData):
+async def explain_prediction(patient: PatientData, interactions: bool = False):
     """
     Generate SHAP explanation for prediction
 
     Args:
         patient: Complete patient data
+        interactions: Also report the strongest measured SHAP interaction
+            pairs (slower; computed outside the request batcher)
 
     Returns:
         ShapExplanation with feature contributions and interactions
     """
     try:
-        # Get prediction first
-        risk_engine = get_risk_engine()
-        prediction = risk_engine.predict(patient)
+        # Get prediction first (batched with concurrent requests)
+        prediction = await get_prediction_batcher().submit(patient)
 
         # Generate SHAP explanation
-        explainer = get_shap_explainer()
-        explanation = explainer.explain(patient, prediction)
-
-        return explanation
+        if interactions:
+            explanation = await asyncio.to_thread(
+                get_shap_explainer().explain, patient, prediction, True
+            )
+        else:
+            explanation = await get_explanation_batcher().submit(patient, prediction)
+
+        # Serialize directly; the explanation was validated when it was built
+        return ORJSONResponse(explanation.model_dump())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Explanation error: {str(e)}")
@@ -4,9 +4,15 @@ Prediction API Routes
 Endpoints for risk prediction.
 """
 
+import asyncio
+from typing import List
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
+from app.config import settings
 from app.models.patient import PatientData
 from app.models.prediction import PredictionResult
+from app.core.batch_scheduler import get_prediction_batcher
 from app.core.risk_engine import get_risk_engine
 
 router = APIRouter()
@@ -24,8 +30,36 @@ async def predict_risk(patient: PatientData):
         PredictionResult with risk score and molecular classification
     """
     try:
-        risk_engine = get_risk_engine()
-        result = risk_engine.predict(patient)
-        return result
+        # Concurrent requests are scored together in one model pass
+        result = await get_prediction_batcher().submit(patient)
+        # Serialize directly; the result was validated when it was built
+        return ORJSONResponse(result.model_dump())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+
+
+@router.post("/predict/batch", response_model=List[PredictionResult])
+async def predict_risk_batch(patients: List[PatientData]):
+    """
+    Predict 5-year recurrence risk for a cohort of patients
+
+    All patients are encoded into one feature matrix and scored in a single
+    model call, so this is much cheaper than one /predict per patient.
+
+    Args:
+        patients: Complete patient data, one entry per patient
+
+    Returns:
+        PredictionResult per patient, in input order
+    """
+    if len(patients) > settings.PREDICT_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.PREDICT_BATCH_LIMIT} patients per batch request",
+        )
+
+    try:
+        results = await asyncio.to_thread(get_risk_engine().batch_predict, patients)
+        return ORJSONResponse([result.model_dump() for result in results])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
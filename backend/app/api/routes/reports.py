@@ -4,13 +4,16 @@ Reports API Routes
 Endpoints for clinical report generation.
 """
 
+import asyncio
+
+import orjson
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from app.models.patient import PatientData
 from app.models.report import ClinicalReport
-from app.core.risk_engine import get_risk_engine
-from app.core.explainer import get_shap_explainer
+from app.core.batch_scheduler import get_prediction_batcher, get_explanation_batcher
 from app.core.recommendation_engine import RecommendationEngine
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 
 router = APIRouter()
@@ -28,45 +31,104 @@ async def generate_report(patient: PatientData):
         ClinicalReport with all analysis and recommendations
     """
     try:
-        # Get prediction
-        risk_engine = get_risk_engine()
-        prediction = risk_engine.predict(patient)
-
-        # Get SHAP explanation
-        explainer = get_shap_explainer()
-        explanation = explainer.explain(patient, prediction)
-
-        # Get treatment recommendation
-        recommendation = RecommendationEngine.generate_recommendation(patient, prediction)
-
-        # Build report
-        report = ClinicalReport(
-            patient_id=patient.patient_id or "Anonymous",
-            assessment_date=datetime.utcnow().isoformat() + "Z",
-            report_id=f"RPT-{datetime.utcnow().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}",
-            version="1.0.0",
-            risk_score=prediction.recurrence_probability,
-            risk_category=prediction.risk_category.value,
-            molecular_group=prediction.molecular_classification.group.value,
-            one_line_summary=_generate_summary(prediction),
-            clinical_summary=_summarize_clinical(patient),
-            pathological_summary=_summarize_pathological(patient),
-            molecular_summary=_summarize_molecular(patient, prediction),
-            shap_summary=explanation.summary,
-            top_risk_drivers=[f.display_name for f in explanation.top_risk_factors],
-            top_protective_factors=[f.display_name for f in explanation.top_protective_factors],
-            molecular_explanation=prediction.molecular_classification.rationale,
-            biological_significance=prediction.molecular_classification.clinical_significance,
-            therapeutic_implications=recommendation.primary_recommendation,
-            treatment_recommendation=recommendation,
+        # Get prediction (batched with concurrent requests)
+        prediction = await get_prediction_batcher().submit(patient)
+
+        # SHAP explanation and treatment recommendation only need the
+        # prediction, so compute them concurrently
+        explanation, recommendation = await asyncio.gather(
+            get_explanation_batcher().submit(patient, prediction),
+            asyncio.to_thread(RecommendationEngine.generate_recommendation, patient, prediction),
         )
 
-        return report
+        report = _build_report(patient, prediction, explanation, recommendation)
+        return ORJSONResponse(report.model_dump())
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Report generation error: {str(e)}")
 
 
+@router.post("/report/stream")
+async def stream_report(patient: PatientData):
+    """
+    Generate the clinical report as a stream of sections (NDJSON)
+
+    Emits one JSON object per line as each part becomes available, so a
+    client can render the risk assessment before SHAP finishes:
+    {"section": "prediction" | "recommendation" | "explanation" | "report", "data": ...}.
+    The explanation and recommendation lines arrive in whichever order they
+    complete. A failure after streaming has started is reported as a final
+    {"section": "error", "detail": ...} line.
+
+    Args:
+        patient: Complete patient data
+
+    Returns:
+        StreamingResponse of newline-delimited JSON sections
+    """
+
+    def line(section: str, data) -> bytes:
+        return orjson.dumps({"section": section, "data": data}) + b"\n"
+
+    async def sections():
+        try:
+            prediction = await get_prediction_batcher().submit(patient)
+            yield line("prediction", prediction.model_dump())
+
+            explanation_task = asyncio.ensure_future(
+                get_explanation_batcher().submit(patient, prediction)
+            )
+            recommendation_task = asyncio.ensure_future(
+                asyncio.to_thread(RecommendationEngine.generate_recommendation, patient, prediction)
+            )
+            pending = {explanation_task: "explanation", recommendation_task: "recommendation"}
+            try:
+                while pending:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield line(pending.pop(task), task.result().model_dump())
+            finally:
+                for task in pending:
+                    task.cancel()
+
+            report = _build_report(
+                patient, prediction, explanation_task.result(), recommendation_task.result()
+            )
+            yield line("report", report.model_dump())
+
+        except Exception as e:
+            yield orjson.dumps({"section": "error", "detail": f"Report generation error: {str(e)}"}) + b"\n"
+
+    return StreamingResponse(sections(), media_type="application/x-ndjson")
+
+
+def _build_report(patient: PatientData, prediction, explanation, recommendation) -> ClinicalReport:
+    """Assemble the ClinicalReport from the prediction, explanation and recommendation"""
+
+    # One timestamp so the date and report ID always agree
+    now = datetime.now(timezone.utc)
+    return ClinicalReport(
+        patient_id=patient.patient_id or "Anonymous",
+        assessment_date=now.replace(tzinfo=None).isoformat() + "Z",
+        report_id=f"RPT-{now:%Y%m%d}-{uuid.uuid4().hex[:8].upper()}",
+        version="1.0.0",
+        risk_score=prediction.recurrence_probability,
+        risk_category=prediction.risk_category.value,
+        molecular_group=prediction.molecular_classification.group.value,
+        one_line_summary=_generate_summary(prediction),
+        clinical_summary=_summarize_clinical(patient),
+        pathological_summary=_summarize_pathological(patient),
+        molecular_summary=_summarize_molecular(patient, prediction),
+        shap_summary=explanation.summary,
+        top_risk_drivers=[f.display_name for f in explanation.top_risk_factors],
+        top_protective_factors=[f.display_name for f in explanation.top_protective_factors],
+        molecular_explanation=prediction.molecular_classification.rationale,
+        biological_significance=prediction.molecular_classification.clinical_significance,
+        therapeutic_implications=recommendation.primary_recommendation,
+        treatment_recommendation=recommendation,
+    )
+
+
 def _generate_summary(prediction) -> str:
     """Generate one-line summary"""
     risk_cat = prediction.risk_category.value
@@ -4,13 +4,62 @@ Demo Scenarios API Routes
 Endpoints for accessing pre-defined clinical scenarios for demo mode.
 """
 
+import orjson
+from typing import Mapping
 from fastapi import APIRouter, HTTPException
-from typing import Dict, List
-from app.data.clinical_evidence import get_scenario, get_all_scenarios, DEMO_SCENARIOS
+from fastapi.responses import Response
+from app.data.clinical_evidence import get_all_scenarios
 
 router = APIRouter()
 
 
+def _scenario_summary(scenario: Mapping) -> dict:
+    """Simplified scenario entry for the UI list"""
+    return {
+        "id": scenario["id"],
+        "title": scenario["title"],
+        "subtitle": scenario["subtitle"],
+        "description": scenario["description"],
+        "expected_molecular_group": scenario.get("expected_molecular_group"),
+        "expected_risk_category": scenario.get("expected_risk_category"),
+        "key_insight": scenario["key_insight"],
+    }
+
+
+def _scenario_patient(scenario_id: str, scenario: Mapping) -> Mapping:
+    """Patient data for a scenario (both patients for grey-zone)"""
+    if scenario_id == "grey-zone":
+        return {
+            "patient_a": scenario["patient_data_a"],
+            "patient_b": scenario["patient_data_b"],
+        }
+    return scenario["patient_data"]
+
+
+def _dumps(content) -> bytes:
+    # Scenario data is frozen (MappingProxyType/tuples); orjson writes tuples
+    # as arrays and default=dict handles the read-only mappings
+    return orjson.dumps(content, default=dict)
+
+
+# The scenario catalog is static, so every response body is serialized once
+# at import and served as-is
+_scenarios = get_all_scenarios()
+_scenario_list = [_scenario_summary(scenario) for scenario in _scenarios.values()]
+SCENARIO_LIST_BODY = _dumps({"scenarios": _scenario_list, "total": len(_scenario_list)})
+SCENARIO_BODIES = {
+    scenario_id: _dumps(scenario) for scenario_id, scenario in _scenarios.items()
+}
+SCENARIO_PATIENT_BODIES = {
+    scenario_id: _dumps(_scenario_patient(scenario_id, scenario))
+    for scenario_id, scenario in _scenarios.items()
+}
+
+
+def _json_body(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
 @router.get("/scenarios")
 async def list_scenarios():
     """
@@ -19,24 +68,7 @@ async def list_scenarios():
     Returns:
         Dictionary of all scenarios with metadata
     """
-    scenarios = get_all_scenarios()
-
-    # Return simplified list for UI
-    scenario_list = []
-    for scenario_id, scenario in scenarios.items():
-        scenario_list.append(
-            {
-                "id": scenario["id"],
-                "title": scenario["title"],
-                "subtitle": scenario["subtitle"],
-                "description": scenario["description"],
-                "expected_molecular_group": scenario.get("expected_molecular_group"),
-                "expected_risk_category": scenario.get("expected_risk_category"),
-                "key_insight": scenario["key_insight"],
-            }
-        )
-
-    return {"scenarios": scenario_list, "total": len(scenario_list)}
+    return _json_body(SCENARIO_LIST_BODY)
 
 
 @router.get("/scenarios/{scenario_id}")
@@ -50,12 +82,12 @@ async def get_scenario_details(scenario_id: str):
     Returns:
         Complete scenario with patient data and narrative
     """
-    scenario = get_scenario(scenario_id)
+    body = SCENARIO_BODIES.get(scenario_id)
 
-    if not scenario:
+    if body is None:
         raise HTTPException(status_code=404, detail=f"Scenario '{scenario_id}' not found")
 
-    return scenario
+    return _json_body(body)
 
 
 @router.get("/scenarios/{scenario_id}/patient")
@@ -69,16 +101,9 @@ async def get_scenario_patient(scenario_id: str):
     Returns:
         Patient data object ready for prediction API
     """
-    scenario = get_scenario(scenario_id)
+    body = SCENARIO_PATIENT_BODIES.get(scenario_id)
 
-    if not scenario:
+    if body is None:
         raise HTTPException(status_code=404, detail=f"Scenario '{scenario_id}' not found")
 
-    # For grey-zone scenario with two patients
-    if scenario_id == "grey-zone":
-        return {
-            "patient_a": scenario["patient_data_a"],
-            "patient_b": scenario["patient_data_b"],
-        }
-
-    return scenario["patient_data"]
+    return _json_body(body)
@@ -2,7 +2,8 @@
 Configuration Module for OncoRisk EC Backend
 """
 
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from functools import lru_cache
 from typing import List, Optional
 import os
 
@@ -29,8 +30,8 @@ class Settings(BaseSettings):
 
     # Paths
     BASE_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    MODEL_PATH: str = os.path.join(BASE_DIR, "app", "ml", "model.json")
-    SYNTHETIC_DATA_PATH: str = os.path.join(BASE_DIR, "app", "data", "synthetic_patients.csv")
+    MODEL_PATH: str = os.path.join(BASE_DIR, "app", "ml", "model.json")  # or model.ubj (UBJSON)
+    SYNTHETIC_DATA_PATH: str = os.path.join(BASE_DIR, "app", "data", "synthetic_patients.csv")  # .parquet to store as Parquet
 
     # Data Generation
     N_SYNTHETIC_PATIENTS: int = 2000
@@ -38,6 +39,17 @@ class Settings(BaseSettings):
 
     # Model
     SHAP_SAMPLE_SIZE: int = 100  # Number of background samples for SHAP
+    SHAP_USE_GPU: bool = True  # Use GPUTreeExplainer when a CUDA device is present
+    TRAIN_USE_GPU: bool = True  # Train XGBoost on CUDA when a device is present
+    TRAIN_GPU_MIN_ROWS: int = 50_000  # Smallest training split worth moving to the GPU
+    HPO_TRIALS: int = 0  # Optuna trials before the final fit (0 keeps the hand-tuned parameters)
+    BATCH_MAX_SIZE: int = 32  # Max concurrent requests coalesced into one model pass
+    BATCH_MAX_WAIT_MS: float = 5.0  # How long the first request waits for company
+    FEATURE_CACHE_SIZE: int = 1024  # Model outputs cached per distinct feature row
+    MODEL_N_JOBS: Optional[int] = None  # Threads per predict call (None: all cores; gunicorn.conf.py pins 1 with several workers)
+    USE_ONNX: bool = True  # Score small batches with ONNX Runtime when model.onnx matches the model file
+    ONNX_MAX_ROWS: int = 16  # Largest batch sent to ONNX Runtime; XGBoost is faster beyond this
+    PREDICT_BATCH_LIMIT: int = 1000  # Max patients per /predict/batch request
 
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -47,10 +59,20 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = None
     AI_MODEL: str = "claude-sonnet-4-20250514"  # Default to Claude Sonnet
     AI_MAX_TOKENS: int = 4096
+    AI_CACHE_DIR: Optional[str] = None  # Persist document analyses here across restarts (None keeps them in memory only)
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Get the process-wide settings instance
+
+    Env/.env parsing and validation run once; use with Depends(get_settings)
+    in routes, or override it in tests via app.dependency_overrides.
+    """
+    return Settings()
+
+
+settings = get_settings()
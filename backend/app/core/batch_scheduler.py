@@ -0,0 +1,154 @@
+"""
+Dynamic Micro-Batching
+
+Coalesces concurrent single-patient requests into one stacked model pass, so
+XGBoost and SHAP score a matrix instead of many 1xN rows.
+"""
+
+import asyncio
+from typing import Any, Callable, List, Optional, Tuple
+
+from app.config import settings
+
+
+class BatchScheduler:
+    """Collects concurrent submissions and runs them through a batch function together"""
+
+    def __init__(
+        self,
+        batch_fn: Callable[..., List[Any]],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+    ):
+        """
+        Initialize batch scheduler
+
+        Args:
+            batch_fn: Blocking function taking one list per positional argument
+                of submit() and returning one result per item, in order
+            max_batch_size: Largest batch dispatched at once
+            max_wait_ms: How long a batch stays open after its first item
+                while other batches are in flight
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size or settings.BATCH_MAX_SIZE
+        if max_wait_ms is None:
+            max_wait_ms = settings.BATCH_MAX_WAIT_MS
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._dispatches = set()
+        self._in_flight = 0
+
+    async def submit(self, *args) -> Any:
+        """Queue one item and wait for its result from the next batch"""
+        loop = asyncio.get_running_loop()
+        self._ensure_collector(loop)
+        future = loop.create_future()
+        self._queue.put_nowait((args, future))
+        return await future
+
+    def _ensure_collector(self, loop: asyncio.AbstractEventLoop):
+        """Start the collector task on this loop if it isn't already running there"""
+        if self._collector is None or self._collector.done() or self._collector.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._collector = loop.create_task(self._collect())
+
+    async def _collect(self):
+        """Group queued items into batches and hand each one off for dispatch"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Only hold the batch open while earlier batches are still running;
+            # an idle scheduler dispatches at once so a lone request pays no
+            # added latency.
+            deadline = loop.time() + (self.max_wait if self._in_flight else 0)
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Dispatch concurrently so one slow batch doesn't hold up the next;
+            # the bounded default executor caps how many run at once.
+            self._in_flight += 1
+            task = loop.create_task(self._run_batch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[tuple, asyncio.Future]]):
+        """Dispatch one collected batch, counting it as in flight until it resolves"""
+        try:
+            await self._dispatch(batch)
+        finally:
+            self._in_flight -= 1
+
+    async def _dispatch(self, batch: List[Tuple[tuple, asyncio.Future]]):
+        """Run one batch in a worker thread and resolve each waiting future"""
+        columns = [list(column) for column in zip(*(args for args, _ in batch))]
+        try:
+            results = await asyncio.to_thread(self.batch_fn, *columns)
+        except Exception as e:
+            if len(batch) > 1:
+                # Retry items one by one so a single bad request fails alone
+                for item in batch:
+                    await self._dispatch([item])
+                return
+            _, future = batch[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        if len(results) != len(batch):
+            # Results can't be paired with requests safely; fail every waiter
+            # rather than leave the unmatched ones hanging
+            error = RuntimeError(f"Batch function returned {len(results)} results for {len(batch)} items")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+# Singleton instances
+_prediction_batcher = None
+_explanation_batcher = None
+
+
+def get_prediction_batcher() -> BatchScheduler:
+    """
+    Get singleton batcher for RiskEngine.batch_predict
+
+    Returns:
+        BatchScheduler taking (patient) and returning a PredictionResult
+    """
+    global _prediction_batcher
+    if _prediction_batcher is None:
+        from app.core.risk_engine import get_risk_engine
+
+        _prediction_batcher = BatchScheduler(get_risk_engine().batch_predict)
+    return _prediction_batcher
+
+
+def get_explanation_batcher() -> BatchScheduler:
+    """
+    Get singleton batcher for ShapExplainer.explain_batch
+
+    Returns:
+        BatchScheduler taking (patient, prediction) and returning a ShapExplanation
+    """
+    global _explanation_batcher
+    if _explanation_batcher is None:
+        from app.core.explainer import get_shap_explainer
+
+        _explanation_batcher = BatchScheduler(get_shap_explainer().explain_batch)
+    return _explanation_batcher
@@ -4,10 +4,9 @@ SHAP Explainability Module
 Provides transparent explanations for risk predictions using SHAP values.
 """
 
-import shap
+import threading
 import numpy as np
-from typing import List, Dict
-import pandas as pd
+from typing import List, Optional
 
 from app.config import settings
 from app.models.patient import PatientData
@@ -16,10 +15,75 @@ from app.models.explanation import (
     FeatureContribution,
     FeatureInteraction,
 )
-from app.core.risk_engine import RiskEngine
+from app.core.risk_engine import RiskEngine, FeatureRowCache
 from app.data.feature_definitions import FEATURE_DISPLAY_NAMES, FEATURE_DESCRIPTIONS
 
 
+def _display_name(feature_name: str) -> str:
+    """Human-readable feature name (tabulated per model in ShapExplainer.display_names)"""
+
+    # Remove _encoded suffix
+    clean_name = feature_name.replace("_encoded", "").replace("_int", "")
+
+    # Special case for molecular_group
+    if "molecular_group" in feature_name:
+        return "Molecular Classification"
+
+    return FEATURE_DISPLAY_NAMES.get(clean_name, clean_name.replace("_", " ").title())
+
+
+# Feature name -> display value(patient, molecular_group); only the features
+# that survive the SHAP cutoff are formatted.
+DISPLAY_VALUE_GETTERS = {
+    "molecular_group_encoded": lambda patient, group: group,
+    "p53_encoded": lambda patient, group: patient.p53_status,
+    "pole_encoded": lambda patient, group: patient.pole_status,
+    "lvsi_encoded": lambda patient, group: patient.lvsi.value,
+    "l1cam_encoded": lambda patient, group: patient.l1cam_status,
+    "myometrial_encoded": lambda patient, group: patient.myometrial_invasion.value,
+    "grade_encoded": lambda patient, group: patient.grade.value,
+    "stage_encoded": lambda patient, group: patient.stage.value,
+    "age": lambda patient, group: f"{patient.age} years",
+    "mmr_encoded": lambda patient, group: patient.mmr_status,
+    "ctnnb1_encoded": lambda patient, group: patient.ctnnb1_status,
+    "histology_encoded": lambda patient, group: patient.histology.value,
+    "lymph_nodes_encoded": lambda patient, group: patient.lymph_nodes.value,
+    "bmi": lambda patient, group: f"{patient.bmi:.1f}",
+    "ecog_status": lambda patient, group: f"ECOG {patient.ecog_status}",
+    "diabetes_int": lambda patient, group: "Yes" if patient.diabetes else "No",
+}
+
+
+# Features taking part in the domain-knowledge interactions highlighted by
+# ShapExplainer._calculate_interactions
+INTERACTION_FEATURES = frozenset({
+    "p53_encoded",
+    "stage_encoded",
+    "l1cam_encoded",
+    "molecular_group_encoded",
+    "lvsi_encoded",
+    "grade_encoded",
+})
+
+
+# Measured (SHAP interaction value) pairs reported when interactions are
+# requested: at most this many, and only above this absolute value
+MAX_MEASURED_INTERACTIONS = 5
+SHAP_INTERACTION_THRESHOLD = 0.01
+
+
+def cuda_available() -> bool:
+    """True when CuPy is installed and can see at least one CUDA device"""
+    try:
+        import cupy
+    except ImportError:
+        return False
+    try:
+        return cupy.cuda.runtime.getDeviceCount() > 0
+    except Exception:
+        return False
+
+
 class ShapExplainer:
     """SHAP explainer for XGBoost model"""
 
@@ -33,50 +97,139 @@ class ShapExplainer:
         self.risk_engine = risk_engine
         self.explainer = None
         self.background_data = None
+        self._shap_cache = FeatureRowCache()
+        self.display_names = {}
         self._initialize_explainer()
 
     def _initialize_explainer(self):
         """Initialize SHAP TreeExplainer"""
 
+        # Deferred like xgboost in RiskEngine._load_model: shap takes ~1 s to
+        # import and is only needed once an explainer is built
+        import shap
+
         if self.risk_engine is None:
             from app.core.risk_engine import get_risk_engine
 
             self.risk_engine = get_risk_engine()
 
+        self._shap_cache.clear()
+        self.display_names = {name: _display_name(name) for name in self.risk_engine.feature_names}
+
+        # Prefer GPUTreeShap when a CUDA device is available; it needs shap's
+        # CUDA extension, so fall back to the CPU TreeExplainer on any failure.
+        if settings.SHAP_USE_GPU and cuda_available():
+            try:
+                self.explainer = shap.GPUTreeExplainer(self.risk_engine.model)
+                print("SHAP explainer initialized (GPU)")
+                return
+            except Exception as e:
+                print(f"GPUTreeExplainer unavailable ({e}), using CPU")
+
         # Create TreeExplainer for XGBoost
         self.explainer = shap.TreeExplainer(self.risk_engine.model)
 
         print("SHAP explainer initialized")
 
-    def explain(self, patient: PatientData, prediction_result=None) -> ShapExplanation:
+    def explain(
+        self, patient: PatientData, prediction_result=None, with_interactions: bool = False
+    ) -> ShapExplanation:
         """
         Generate SHAP explanation for patient prediction
 
         Args:
             patient: Patient data
             prediction_result: Optional pre-computed prediction result
+            with_interactions: Also compute true SHAP interaction values
 
         Returns:
             ShapExplanation with feature contributions
         """
 
-        # Get prediction if not provided
-        if prediction_result is None:
-            prediction_result = self.risk_engine.predict(patient)
+        return self.explain_batch([patient], [prediction_result], with_interactions)[0]
+
+    def explain_batch(
+        self,
+        patients: List[PatientData],
+        prediction_results: Optional[list] = None,
+        with_interactions: bool = False,
+    ) -> List[ShapExplanation]:
+        """
+        Generate SHAP explanations for several patients in one SHAP pass
 
-        # Prepare feature vector
-        molecular_group = prediction_result.molecular_classification.group.value
-        X = self.risk_engine._prepare_features(patient, molecular_group)
+        Feature vectors are stacked into a single matrix so the tree traversal
+        (and kernel launch on GPU) is amortized across the whole batch.
+
+        Args:
+            patients: Patient data
+            prediction_results: Optional pre-computed prediction results, in order
+            with_interactions: Also compute true SHAP interaction values (much
+                slower than plain SHAP values on CPU, hence opt-in)
+
+        Returns:
+            One ShapExplanation per patient
+        """
+
+        if prediction_results is None:
+            prediction_results = [None] * len(patients)
+
+        # Get predictions where not provided
+        prediction_results = [
+            result if result is not None else self.risk_engine.predict(patient)
+            for patient, result in zip(patients, prediction_results)
+        ]
+
+        # Stack feature vectors
+        molecular_groups = [
+            result.molecular_classification.group.value for result in prediction_results
+        ]
+        # Reuse the rows the risk engine already encoded when it made the predictions
+        feature_rows = [result._features for result in prediction_results]
+        if all(row is not None for row in feature_rows):
+            X = np.vstack(feature_rows)
+        else:
+            X = self.risk_engine._prepare_feature_matrix(patients, molecular_groups)
 
-        # Calculate SHAP values
-        shap_values = self.explainer.shap_values(X)
+        # Calculate SHAP values for every uncached row at once
+        shap_values = np.vstack(self._shap_cache.map_rows(X, self.explainer.shap_values))
 
         # Get base value (expected value)
         base_value = float(self.explainer.expected_value)
 
+        # Rank every row's contributions in one vectorized pass
+        rankings = self._rank_contributions(shap_values)
+
+        interaction_values = (
+            self.explainer.shap_interaction_values(X) if with_interactions else None
+        )
+
+        return [
+            self._build_explanation(
+                X[i:i + 1], shap_values[i:i + 1], base_value,
+                patient, molecular_group, prediction_result, rankings[i],
+                interaction_values[i] if interaction_values is not None else None,
+            )
+            for i, (patient, molecular_group, prediction_result) in enumerate(
+                zip(patients, molecular_groups, prediction_results)
+            )
+        ]
+
+    def _build_explanation(
+        self,
+        X: np.ndarray,
+        shap_values: np.ndarray,
+        base_value: float,
+        patient: PatientData,
+        molecular_group: str,
+        prediction_result,
+        ranked: List[int],
+        interaction_values: Optional[np.ndarray] = None,
+    ) -> ShapExplanation:
+        """Assemble the ShapExplanation for one patient's feature and SHAP rows"""
+
         # Get feature contributions
         feature_contributions = self._parse_feature_contributions(
-            X, shap_values, self.risk_engine.feature_names, patient, molecular_group
+            X, shap_values, self.risk_engine.feature_names, patient, molecular_group, ranked
         )
 
         # Get top risk and protective factors
@@ -90,6 +243,8 @@ class ShapExplainer:
 
         # Generate interactions
         interactions = self._calculate_interactions(X, feature_contributions)
+        if interaction_values is not None:
+            interactions += self._measured_interactions(interaction_values, interactions)
 
         # Generate summary
         summary = self._generate_summary(
@@ -113,6 +268,7 @@ class ShapExplainer:
         feature_names: List[str],
         patient: PatientData,
         molecular_group: str,
+        ranked: Optional[List[int]] = None,
     ) -> List[FeatureContribution]:
         """
         Parse SHAP values into feature contributions
@@ -123,28 +279,31 @@ class ShapExplainer:
             feature_names: Feature names
             patient: Patient data (for display values)
             molecular_group: Molecular group
+            ranked: Optional precomputed feature indices from _rank_contributions
 
         Returns:
             List of FeatureContribution objects
         """
 
-        contributions = []
+        if ranked is None:
+            ranked = self._rank_contributions(shap_values)[0]
+        row = shap_values[0].tolist()
 
-        # Map to get display values
-        display_value_map = self._get_display_value_map(patient, molecular_group)
-
-        for i, feature_name in enumerate(feature_names):
-            shap_val = float(shap_values[0][i])
+        contributions = []
 
-            # Skip features with negligible contribution
-            if abs(shap_val) < 0.001:
-                continue
+        for rank, i in enumerate(ranked, 1):
+            feature_name = feature_names[i]
+            shap_val = row[i]
 
             # Get display name
-            display_name = self._get_display_name(feature_name)
+            display_name = self.display_names[feature_name]
 
             # Get display value
-            display_value = display_value_map.get(feature_name, str(X[0, i]))
+            get_display_value = DISPLAY_VALUE_GETTERS.get(feature_name)
+            if get_display_value is not None:
+                display_value = get_display_value(patient, molecular_group)
+            else:
+                display_value = str(X[0, i])
 
             # Determine direction and color
             if shap_val > 0:
@@ -162,50 +321,25 @@ class ShapExplainer:
                     shap_value=shap_val,
                     direction=direction,
                     color=color,
-                    importance_rank=0,  # Will be set after sorting
+                    importance_rank=rank,
                 )
             )
 
-        # Sort by absolute SHAP value and assign ranks
-        contributions.sort(key=lambda x: abs(x.shap_value), reverse=True)
-        for rank, contrib in enumerate(contributions, 1):
-            contrib.importance_rank = rank
-
         return contributions
 
-    def _get_display_name(self, feature_name: str) -> str:
-        """Get human-readable feature name"""
-
-        # Remove _encoded suffix
-        clean_name = feature_name.replace("_encoded", "").replace("_int", "")
-
-        # Special case for molecular_group
-        if "molecular_group" in feature_name:
-            return "Molecular Classification"
-
-        return FEATURE_DISPLAY_NAMES.get(clean_name, clean_name.replace("_", " ").title())
-
-    def _get_display_value_map(self, patient: PatientData, molecular_group: str) -> Dict[str, str]:
-        """Get display values for features"""
-
-        return {
-            "molecular_group_encoded": molecular_group,
-            "p53_encoded": patient.p53_status,
-            "pole_encoded": patient.pole_status,
-            "lvsi_encoded": patient.lvsi.value,
-            "l1cam_encoded": patient.l1cam_status,
-            "myometrial_encoded": patient.myometrial_invasion.value,
-            "grade_encoded": patient.grade.value,
-            "stage_encoded": patient.stage.value,
-            "age": f"{patient.age} years",
-            "mmr_encoded": patient.mmr_status,
-            "ctnnb1_encoded": patient.ctnnb1_status,
-            "histology_encoded": patient.histology.value,
-            "lymph_nodes_encoded": patient.lymph_nodes.value,
-            "bmi": f"{patient.bmi:.1f}",
-            "ecog_status": f"ECOG {patient.ecog_status}",
-            "diabetes_int": "Yes" if patient.diabetes else "No",
-        }
+    @staticmethod
+    def _rank_contributions(shap_values: np.ndarray) -> List[List[int]]:
+        """
+        Per row, indices of non-negligible features by descending |SHAP value|
+
+        Vectorized over the whole batch so the filter and sort cost one NumPy
+        pass instead of a Python loop per patient. Ties keep feature order,
+        and the cutoff is compared in float64 to match float(shap_value).
+        """
+        magnitudes = np.abs(shap_values.astype(np.float64))
+        order = np.argsort(-magnitudes, axis=1, kind="stable")
+        keep = np.take_along_axis(magnitudes, order, axis=1) >= 0.001
+        return [row_order[row_keep].tolist() for row_order, row_keep in zip(order, keep)]
 
     def _calculate_interactions(
         self, X: np.ndarray, contributions: List[FeatureContribution]
@@ -219,8 +353,10 @@ class ShapExplainer:
 
         interactions = []
 
-        # Get feature name to contribution map
-        contrib_map = {c.name: c for c in contributions}
+        # Get feature name to contribution map (interaction features only)
+        contrib_map = {c.name: c for c in contributions if c.name in INTERACTION_FEATURES}
+        if not contrib_map:
+            return interactions
 
         # Key interactions to highlight:
 
@@ -229,7 +365,7 @@ class ShapExplainer:
             p53_contrib = contrib_map["p53_encoded"]
             stage_contrib = contrib_map["stage_encoded"]
 
-            if p53_contrib.value == "Abnormal" and stage_contrib.value in ["IA", "IB"]:
+            if p53_contrib.value == "Abnormal" and stage_contrib.value in ("IA", "IB"):
                 interactions.append(
                     FeatureInteraction(
                         feature1_name="p53_encoded",
@@ -277,6 +413,53 @@ class ShapExplainer:
 
         return interactions
 
+    def _measured_interactions(
+        self, interaction_values: np.ndarray, known: List[FeatureInteraction]
+    ) -> List[FeatureInteraction]:
+        """
+        Strongest pairwise effects from one patient's SHAP interaction matrix
+
+        Args:
+            interaction_values: (n_features, n_features) SHAP interaction values
+            known: Interactions already reported; their pairs are skipped
+
+        Returns:
+            Up to MAX_MEASURED_INTERACTIONS FeatureInteraction objects
+        """
+
+        feature_names = self.risk_engine.feature_names
+        known_pairs = {frozenset((i.feature1_name, i.feature2_name)) for i in known}
+
+        # A pair's effect is split evenly across its two off-diagonal cells
+        rows, cols = np.triu_indices(len(feature_names), k=1)
+        pair_values = (interaction_values[rows, cols] + interaction_values[cols, rows]).astype(np.float64)
+        order = np.argsort(-np.abs(pair_values), kind="stable")
+
+        interactions = []
+        for k in order.tolist():
+            value = float(pair_values[k])
+            if abs(value) < SHAP_INTERACTION_THRESHOLD or len(interactions) == MAX_MEASURED_INTERACTIONS:
+                break
+
+            name1, name2 = feature_names[rows[k]], feature_names[cols[k]]
+            if frozenset((name1, name2)) in known_pairs:
+                continue
+
+            display1, display2 = self.display_names[name1], self.display_names[name2]
+            effect = "raise" if value > 0 else "lower"
+            interactions.append(
+                FeatureInteraction(
+                    feature1_name=name1,
+                    feature1_display=display1,
+                    feature2_name=name2,
+                    feature2_display=display2,
+                    interaction_value=value,
+                    interpretation=f"{display1} and {display2} together {effect} predicted risk beyond their individual effects.",
+                )
+            )
+
+        return interactions
+
     def _generate_summary(
         self,
         top_risk_factors: List[FeatureContribution],
@@ -305,16 +488,22 @@ class ShapExplainer:
 
 # Singleton instance
 _explainer_instance = None
+_explainer_lock = threading.Lock()
 
 
 def get_shap_explainer() -> ShapExplainer:
     """
     Get singleton SHAP explainer instance
 
+    Creation is locked like get_risk_engine's, so concurrent first callers
+    build one TreeExplainer.
+
     Returns:
         ShapExplainer instance
     """
     global _explainer_instance
     if _explainer_instance is None:
-        _explainer_instance = ShapExplainer()
+        with _explainer_lock:
+            if _explainer_instance is None:
+                _explainer_instance = ShapExplainer()
     return _explainer_instance
@@ -6,12 +6,15 @@ Reference: FIGO staging of endometrial cancer 2023
 Int J Gynaecol Obstet. 2023 Aug;162(2):383-394
 """
 
-from typing import Dict, Any, Optional
-from pydantic import BaseModel
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import product
+from typing import Dict, Any, List, Optional
 
 
-class FIGO2023Stage(BaseModel):
-    """FIGO 2023 staging result with molecular integration"""
+@dataclass(slots=True, frozen=True)
+class FIGO2023Stage:
+    """FIGO 2023 staging result with molecular integration (internal; the API model is FIGO2023Staging)"""
     anatomical_stage: str  # Original anatomical stage (e.g., "IA", "IB")
     molecular_integrated_stage: str  # FIGO 2023 with molecular suffix (e.g., "IAm1", "IC2")
     stage_group: str  # I, II, III, or IV
@@ -22,6 +25,183 @@ class FIGO2023Stage(BaseModel):
     clinical_implications: str  # Treatment implications
 
 
+# Anatomical stage -> stage group. Stages outside the table fall back to
+# their longest Roman-numeral prefix (IV before III before II before I).
+STAGE_GROUPS = {
+    **{stage: "I" for stage in ("I", "IA", "IB", "IC", "1A", "1B", "1C")},
+    **{stage: "II" for stage in ("II", "IIA", "IIB", "IIC")},
+    **{stage: "III" for stage in ("III", "IIIA", "IIIB", "IIIC", "IIIC1", "IIIC2")},
+    **{stage: "IV" for stage in ("IV", "IVA", "IVB")},
+}
+STAGE_GROUP_PREFIXES = ("IV", "III", "II", "I")
+
+# Histology substrings that mark an aggressive histotype
+AGGRESSIVE_HISTOTYPES = frozenset({"serous", "clear cell", "carcinosarcoma", "undifferentiated", "dedifferentiated"})
+SUBSTANTIAL_LVSI = frozenset({"substantial", "present", "extensive"})
+FAVORABLE_MOLECULAR_GROUPS = frozenset({"POLEmut", "MMRd"})
+
+
+@lru_cache(maxsize=256)
+def _is_aggressive_histotype(histology: str) -> bool:
+    """Substring-match a histology against AGGRESSIVE_HISTOTYPES (few distinct values, so memoized)"""
+    histology_lower = histology.lower() if histology else ""
+    return any(h in histology_lower for h in AGGRESSIVE_HISTOTYPES)
+
+
+# Prognosis impact text; the favorable text is pre-rendered per group
+PROGNOSIS_FAVORABLE = {
+    group: (
+        f"FAVORABLE: {group} molecular profile significantly improves prognosis. "
+        "5-year survival rates are excellent (>90%) even with adverse pathological features. "
+        "May allow de-escalation of adjuvant therapy in appropriate cases."
+    )
+    for group in FAVORABLE_MOLECULAR_GROUPS
+}
+PROGNOSIS_AGGRESSIVE = (
+    "AGGRESSIVE: p53 abnormal molecular profile indicates high-risk biology. "
+    "Higher recurrence rates and poorer survival compared to other molecular groups. "
+    "Warrants intensified treatment regardless of anatomical stage."
+)
+PROGNOSIS_INTERMEDIATE = (
+    "INTERMEDIATE: NSMP (No Specific Molecular Profile). "
+    "Prognosis determined primarily by traditional clinicopathological features. "
+    "Further risk stratification by L1CAM and CTNNB1 may be helpful."
+)
+
+# Group-specific clinical implications (anything unrecognised is treated as NSMP)
+CLINICAL_IMPLICATIONS_BY_GROUP = {
+    "POLEmut": (
+        "POLEmut: Consider observation alone for Stage I-II. "
+        "PORTEC-4a trial suggests adjuvant therapy may be omitted."
+    ),
+    "MMRd": (
+        "MMRd: Screen for Lynch syndrome. Consider immunotherapy for advanced/recurrent disease. "
+        "Pembrolizumab/dostarlimab are FDA-approved options."
+    ),
+    "p53abn": (
+        "p53abn: Recommend combined chemoradiotherapy per PORTEC-3. "
+        "Consider clinical trials (RAINBO p53abn-RED: CTRT + olaparib). "
+        "Close surveillance warranted."
+    ),
+    "NSMP": (
+        "NSMP: Treatment based on clinicopathological risk factors. "
+        "Consider adjuvant therapy per ESGO/ESTRO/ESP guidelines based on stage and grade."
+    ),
+}
+
+# FIGO 2023 rules per base stage: a rationale intro, then ordered
+# (condition, integrated stage, modifier, note) rules where the first rule
+# whose condition flag is set wins (None always matches). Notes may use
+# {group} and {histology}.
+FIGO_2023_FLAGS = ("favorable_molecular", "aggressive_molecular", "aggressive_histotype", "substantial_lvsi")
+FIGO_2023_RULES = {
+    # Stage I
+    "IA": ("Tumor confined to uterus with <50% myometrial invasion", (
+        ("favorable_molecular", "IAm1", "m1", "Favorable molecular profile ({group}) - indicates excellent prognosis"),
+        ("aggressive_histotype", "IC", None, "Aggressive histotype ({histology}) - staged as IC"),
+        ("aggressive_molecular", "IC", "2", "p53 abnormal molecular profile - upstaged to IC per FIGO 2023"),
+        (None, "IA", None, "NSMP with favorable features - standard Stage IA"),
+    )),
+    "IB": ("Tumor confined to uterus with ≥50% myometrial invasion", (
+        ("favorable_molecular", "IBm1", "m1", "Favorable molecular profile ({group}) - better prognosis than expected"),
+        ("aggressive_molecular", "IC", "2", "p53 abnormal - upstaged to IC per FIGO 2023"),
+        ("aggressive_histotype", "IC", None, "Aggressive histotype ({histology}) - staged as IC"),
+        (None, "IB", None, ""),
+    )),
+    "IC": ("Stage IC - aggressive features (p53abn or aggressive histotype)", (
+        (None, "IC", None, ""),
+    )),
+    # Stage II
+    "II": ("Tumor invades cervical stroma", (
+        ("substantial_lvsi", "IIB", None, "Substantial LVSI present - staged as IIB"),
+        ("favorable_molecular", "IIAm1", "m1", "Favorable molecular profile ({group})"),
+        ("aggressive_molecular", "IIC", "2", "p53 abnormal - upstaged to IIC"),
+        (None, "IIA", None, ""),
+    )),
+    # Stage III: the molecular group is recorded in the modifier only. Appending
+    # it to the stage ("IIIC12", "IIIA2") yields invalid stages or collides with
+    # FIGO 2023's own anatomical substages (IIIA2, IIIB2).
+    "IIIA": ("Tumor invades serosa and/or adnexa", (
+        ("aggressive_molecular", "IIIA", "2", ""),
+        ("favorable_molecular", "IIIA", "1", ""),
+        (None, "IIIA", None, ""),
+    )),
+    "IIIB": ("Vaginal and/or parametrial involvement", (
+        ("aggressive_molecular", "IIIB", "2", ""),
+        (None, "IIIB", None, ""),
+    )),
+    "IIIC1": ("Pelvic lymph node involvement", (
+        ("aggressive_molecular", "IIIC1", "2", "p53 abnormal - worst prognostic subgroup"),
+        ("favorable_molecular", "IIIC1", "1", "Favorable molecular ({group}) - better prognosis within stage"),
+        (None, "IIIC1", None, ""),
+    )),
+    "IIIC2": ("Para-aortic lymph node involvement", (
+        ("aggressive_molecular", "IIIC2", "2", "p53 abnormal - worst prognostic subgroup"),
+        ("favorable_molecular", "IIIC2", "1", "Favorable molecular ({group}) - better prognosis within stage"),
+        (None, "IIIC2", None, ""),
+    )),
+    "III": ("Stage III - tumor extends beyond uterus", (
+        (None, "III", None, ""),
+    )),
+    # Stage IV
+    "IVA": ("Tumor invades bladder and/or bowel mucosa", (
+        (None, "IVA", None, ""),
+    )),
+    "IVB": ("Distant metastases including abdominal/inguinal nodes", (
+        (None, "IVB", None, ""),
+    )),
+}
+
+
+def _build_figo_2023_table() -> Dict[tuple, tuple]:
+    """Expand FIGO_2023_RULES to (base stage, *flags) -> (stage, modifier, rationale) for every flag combination"""
+    table = {}
+    for base_stage, (intro, rules) in FIGO_2023_RULES.items():
+        for flags in product((False, True), repeat=len(FIGO_2023_FLAGS)):
+            state = dict(zip(FIGO_2023_FLAGS, flags))
+            stage, modifier, note = next(
+                (stage, modifier, note) for condition, stage, modifier, note in rules
+                if condition is None or state[condition]
+            )
+            table[(base_stage, *flags)] = (stage, modifier, " ".join(filter(None, (intro, note))))
+    return table
+
+
+FIGO_2023_TABLE = _build_figo_2023_table()
+
+
+def _base_stage(stage_upper: str, stage_group: str) -> str:
+    """Map an anatomical stage to its FIGO_2023_RULES key"""
+    match stage_group:
+        case "I":
+            match stage_upper:
+                case "IA" | "1A":
+                    return "IA"
+                case "IB" | "1B":
+                    return "IB"
+                case "IC" | "1C":
+                    return "IC"
+                case _:
+                    return stage_upper
+        case "II":
+            return "II"
+        case "III":
+            # III[ABC] plus an optional node level (C2, or the C1I spelling of it)
+            substage = stage_upper[3:4]
+            if substage == "C":
+                return "IIIC2" if stage_upper[4:] in ("2", "1I") else "IIIC1"
+            if substage == "B":
+                return "IIIB"
+            if substage == "A":
+                return "IIIA"
+            return "III"
+        case _:
+            return "IVB" if "B" in stage_upper else "IVA"
+
+
+FIGO_2023_BASE_STAGES = {stage: _base_stage(stage, group) for stage, group in STAGE_GROUPS.items()}
+
+
 def determine_figo_2023_stage(
     anatomical_stage: str,
     histology: str,
@@ -61,217 +241,65 @@ def determine_figo_2023_stage(
 
     # Normalize inputs
     stage_upper = anatomical_stage.upper()
-    histology_lower = histology.lower() if histology else ""
-    grade_upper = grade.upper() if grade else ""
     lvsi_lower = lvsi.lower() if lvsi else ""
 
+    # The flags below are needed for every stage group, IV included: even when
+    # the substage ignores them, the clinical implications add the LVSI and
+    # histotype sentences, so there is no early exit for any stage.
+
     # Determine if aggressive histotype
-    aggressive_histotypes = ["serous", "clear cell", "carcinosarcoma", "undifferentiated", "dedifferentiated"]
-    is_aggressive_histotype = any(h in histology_lower for h in aggressive_histotypes)
+    is_aggressive_histotype = _is_aggressive_histotype(histology)
 
     # Determine molecular modifier
-    is_favorable_molecular = molecular_group in ["POLEmut", "MMRd"]
+    is_favorable_molecular = molecular_group in FAVORABLE_MOLECULAR_GROUPS
     is_aggressive_molecular = molecular_group == "p53abn" or p53_status == "Abnormal"
 
     # Determine LVSI status
-    substantial_lvsi = lvsi_lower in ["substantial", "present", "extensive"]
+    substantial_lvsi = lvsi_lower in SUBSTANTIAL_LVSI
 
     # Base stage group
-    if stage_upper.startswith("I") and not stage_upper.startswith("IV"):
-        stage_group = "I"
-    elif stage_upper.startswith("II"):
-        stage_group = "II"
-    elif stage_upper.startswith("III"):
-        stage_group = "III"
-    elif stage_upper.startswith("IV"):
-        stage_group = "IV"
-    else:
-        stage_group = "I"  # Default
-
-    # Initialize
-    molecular_integrated_stage = stage_upper
-    molecular_modifier = None
-    rationale_parts = []
-
-    # ========================================
-    # FIGO 2023 STAGE I
-    # ========================================
-    if stage_group == "I":
-        if stage_upper in ["IA", "1A"]:
-            base_stage = "IA"
-            rationale_parts.append("Tumor confined to uterus with <50% myometrial invasion")
-
-            if is_favorable_molecular:
-                # IA with favorable molecular → IAm1 (excellent prognosis)
-                molecular_integrated_stage = "IAm1"
-                molecular_modifier = "m1"
-                rationale_parts.append(f"Favorable molecular profile ({molecular_group}) - indicates excellent prognosis")
-            elif is_aggressive_molecular and not is_aggressive_histotype:
-                # IA with p53abn but endometrioid → Stage IC (upstaged)
-                molecular_integrated_stage = "IC"
-                molecular_modifier = "2"
-                rationale_parts.append("p53 abnormal molecular profile - upstaged to IC per FIGO 2023")
-            elif is_aggressive_histotype:
-                # IA with aggressive histotype → IC
-                molecular_integrated_stage = "IC"
-                rationale_parts.append(f"Aggressive histotype ({histology}) - staged as IC")
-            else:
-                molecular_integrated_stage = "IA"
-                rationale_parts.append("NSMP with favorable features - standard Stage IA")
-
-        elif stage_upper in ["IB", "1B"]:
-            base_stage = "IB"
-            rationale_parts.append("Tumor confined to uterus with ≥50% myometrial invasion")
-
-            if is_favorable_molecular:
-                molecular_integrated_stage = "IBm1"
-                molecular_modifier = "m1"
-                rationale_parts.append(f"Favorable molecular profile ({molecular_group}) - better prognosis than expected")
-            elif is_aggressive_molecular:
-                molecular_integrated_stage = "IC"
-                molecular_modifier = "2"
-                rationale_parts.append("p53 abnormal - upstaged to IC per FIGO 2023")
-            elif is_aggressive_histotype:
-                molecular_integrated_stage = "IC"
-                rationale_parts.append(f"Aggressive histotype ({histology}) - staged as IC")
-            else:
-                molecular_integrated_stage = "IB"
-
-        elif stage_upper in ["IC", "1C"]:
-            base_stage = "IC"
-            molecular_integrated_stage = "IC"
-            rationale_parts.append("Stage IC - aggressive features (p53abn or aggressive histotype)")
-
-    # ========================================
-    # FIGO 2023 STAGE II
-    # ========================================
-    elif stage_group == "II":
-        rationale_parts.append("Tumor invades cervical stroma")
-
-        if substantial_lvsi:
-            # Substantial LVSI → IIB
-            molecular_integrated_stage = "IIB"
-            rationale_parts.append("Substantial LVSI present - staged as IIB")
-        elif is_favorable_molecular:
-            molecular_integrated_stage = "IIAm1"
-            molecular_modifier = "m1"
-            rationale_parts.append(f"Favorable molecular profile ({molecular_group})")
-        elif is_aggressive_molecular:
-            molecular_integrated_stage = "IIC"
-            molecular_modifier = "2"
-            rationale_parts.append("p53 abnormal - upstaged to IIC")
-        else:
-            molecular_integrated_stage = "IIA"
-
-    # ========================================
-    # FIGO 2023 STAGE III
-    # ========================================
-    elif stage_group == "III":
-        if "C" in stage_upper:
-            # Lymph node involvement
-            if "C2" in stage_upper or "C1I" in stage_upper:
-                molecular_integrated_stage = "IIIC2"
-                rationale_parts.append("Para-aortic lymph node involvement")
-            else:
-                molecular_integrated_stage = "IIIC1"
-                rationale_parts.append("Pelvic lymph node involvement")
-
-            if is_aggressive_molecular:
-                molecular_integrated_stage += "2"
-                molecular_modifier = "2"
-                rationale_parts.append("p53 abnormal - worst prognostic subgroup")
-            elif is_favorable_molecular:
-                molecular_integrated_stage += "1"
-                molecular_modifier = "1"
-                rationale_parts.append(f"Favorable molecular ({molecular_group}) - better prognosis within stage")
-
-        elif "B" in stage_upper:
-            molecular_integrated_stage = "IIIB"
-            rationale_parts.append("Vaginal and/or parametrial involvement")
-            if is_aggressive_molecular:
-                molecular_integrated_stage += "2"
-                molecular_modifier = "2"
-        elif "A" in stage_upper:
-            molecular_integrated_stage = "IIIA"
-            rationale_parts.append("Tumor invades serosa and/or adnexa")
-            if is_aggressive_molecular:
-                molecular_integrated_stage += "2"
-                molecular_modifier = "2"
-            elif is_favorable_molecular:
-                molecular_integrated_stage += "1"
-                molecular_modifier = "1"
-        else:
-            molecular_integrated_stage = "III"
-            rationale_parts.append("Stage III - tumor extends beyond uterus")
+    stage_group = STAGE_GROUPS.get(stage_upper) or next(
+        (prefix for prefix in STAGE_GROUP_PREFIXES if stage_upper.startswith(prefix)),
+        "I",  # Default
+    )
 
-    # ========================================
-    # FIGO 2023 STAGE IV
-    # ========================================
-    elif stage_group == "IV":
-        if "B" in stage_upper:
-            molecular_integrated_stage = "IVB"
-            rationale_parts.append("Distant metastases including abdominal/inguinal nodes")
-        else:
-            molecular_integrated_stage = "IVA"
-            rationale_parts.append("Tumor invades bladder and/or bowel mucosa")
+    # FIGO 2023 substage, modifier and rationale: one table lookup
+    molecular_integrated_stage, molecular_modifier, rationale = FIGO_2023_TABLE.get(
+        (
+            FIGO_2023_BASE_STAGES.get(stage_upper) or _base_stage(stage_upper, stage_group),
+            is_favorable_molecular,
+            is_aggressive_molecular,
+            is_aggressive_histotype,
+            substantial_lvsi,
+        ),
+        (stage_upper, None, ""),
+    )
+    if "{" in rationale:
+        rationale = rationale.replace("{group}", molecular_group).replace("{histology}", histology)
 
     # ========================================
     # DETERMINE PROGNOSIS IMPACT
     # ========================================
     if is_favorable_molecular:
-        prognosis_impact = (
-            f"FAVORABLE: {molecular_group} molecular profile significantly improves prognosis. "
-            f"5-year survival rates are excellent (>90%) even with adverse pathological features. "
-            f"May allow de-escalation of adjuvant therapy in appropriate cases."
-        )
+        prognosis_impact = PROGNOSIS_FAVORABLE[molecular_group]
     elif is_aggressive_molecular:
-        prognosis_impact = (
-            f"AGGRESSIVE: p53 abnormal molecular profile indicates high-risk biology. "
-            f"Higher recurrence rates and poorer survival compared to other molecular groups. "
-            f"Warrants intensified treatment regardless of anatomical stage."
-        )
+        prognosis_impact = PROGNOSIS_AGGRESSIVE
     else:
-        prognosis_impact = (
-            "INTERMEDIATE: NSMP (No Specific Molecular Profile). "
-            "Prognosis determined primarily by traditional clinicopathological features. "
-            "Further risk stratification by L1CAM and CTNNB1 may be helpful."
-        )
+        prognosis_impact = PROGNOSIS_INTERMEDIATE
 
     # ========================================
     # CLINICAL IMPLICATIONS
     # ========================================
-    clinical_implications_parts = []
-
-    if molecular_group == "POLEmut":
-        clinical_implications_parts.append(
-            "POLEmut: Consider observation alone for Stage I-II. "
-            "PORTEC-4a trial suggests adjuvant therapy may be omitted."
-        )
-    elif molecular_group == "MMRd":
-        clinical_implications_parts.append(
-            "MMRd: Screen for Lynch syndrome. Consider immunotherapy for advanced/recurrent disease. "
-            "Pembrolizumab/dostarlimab are FDA-approved options."
-        )
-    elif molecular_group == "p53abn":
-        clinical_implications_parts.append(
-            "p53abn: Recommend combined chemoradiotherapy per PORTEC-3. "
-            "Consider clinical trials (RAINBO p53abn-RED: CTRT + olaparib). "
-            "Close surveillance warranted."
-        )
-    else:  # NSMP
-        clinical_implications_parts.append(
-            "NSMP: Treatment based on clinicopathological risk factors. "
-            "Consider adjuvant therapy per ESGO/ESTRO/ESP guidelines based on stage and grade."
-        )
+    clinical_implications = CLINICAL_IMPLICATIONS_BY_GROUP.get(molecular_group, CLINICAL_IMPLICATIONS_BY_GROUP["NSMP"])
 
     if substantial_lvsi:
-        clinical_implications_parts.append(
-            "Substantial LVSI: Associated with increased risk of nodal involvement and recurrence."
+        clinical_implications += (
+            " Substantial LVSI: Associated with increased risk of nodal involvement and recurrence."
         )
 
     if is_aggressive_histotype:
-        clinical_implications_parts.append(
-            f"Aggressive histotype ({histology}): Recommend adjuvant chemotherapy ± radiation."
+        clinical_implications += (
+            f" Aggressive histotype ({histology}): Recommend adjuvant chemotherapy ± radiation."
         )
 
     return FIGO2023Stage(
@@ -280,14 +308,36 @@ def determine_figo_2023_stage(
         stage_group=stage_group,
         substage=molecular_integrated_stage,
         molecular_modifier=molecular_modifier,
-        rationale=" ".join(rationale_parts),
+        rationale=rationale,
         prognosis_impact=prognosis_impact,
-        clinical_implications=" ".join(clinical_implications_parts)
+        clinical_implications=clinical_implications
     )
 
 
+def determine_figo_2023_stage_many(cases: List[Dict[str, Any]]) -> List[FIGO2023Stage]:
+    """
+    Stage a batch of cases (e.g. cohort re-staging).
+
+    Args:
+        cases: Keyword arguments for determine_figo_2023_stage, one dict per case
+
+    Returns:
+        FIGO2023Stage per case, in input order
+    """
+    determine = determine_figo_2023_stage
+    return [determine(**case) for case in cases]
+
+
+STAGING_SYSTEM = "FIGO 2023 (Molecular-Integrated)"
+
+
 def get_figo_2023_summary(stage: FIGO2023Stage) -> Dict[str, Any]:
-    """Get a summary dictionary of the FIGO 2023 staging for API response"""
+    """
+    Get a summary dictionary of the FIGO 2023 staging for API response
+
+    A dict literal with constant keys is the cheapest way to build this
+    (the key hashes are cached on the interned literals).
+    """
     return {
         "anatomical_stage": stage.anatomical_stage,
         "figo_2023_stage": stage.molecular_integrated_stage,
@@ -296,5 +346,5 @@ def get_figo_2023_summary(stage: FIGO2023Stage) -> Dict[str, Any]:
         "rationale": stage.rationale,
         "prognosis_impact": stage.prognosis_impact,
         "clinical_implications": stage.clinical_implications,
-        "staging_system": "FIGO 2023 (Molecular-Integrated)"
+        "staging_system": STAGING_SYSTEM,
     }
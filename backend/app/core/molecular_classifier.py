@@ -15,11 +15,138 @@ Additional risk stratification for NSMP:
 - Both negative → Low-risk NSMP
 """
 
-from typing import Dict, Tuple
+from types import MappingProxyType
+from typing import List, Mapping
 from app.models.patient import PatientData
 from app.models.prediction import MolecularGroup, MolecularClassification
 
 
+# Static reference descriptions; read-only so callers can share them
+MOLECULAR_GROUP_DESCRIPTIONS: Mapping[MolecularGroup, Mapping[str, str]] = {
+    MolecularGroup.POLEMUT: MappingProxyType({
+        "name": "POLE Ultramutated",
+        "short_name": "POLEmut",
+        "frequency": "~7% of endometrial cancers",
+        "prognosis": "Excellent (5-year RFS >95%)",
+        "key_feature": "POLE exonuclease domain mutation",
+        "biology": "Ultramutated tumors with high neoantigen load but excellent outcomes",
+        "treatment_implication": "Consider de-escalation regardless of stage/grade",
+        "color": "#10b981",
+    }),
+    MolecularGroup.MMRD: MappingProxyType({
+        "name": "Mismatch Repair Deficient",
+        "short_name": "MMRd",
+        "frequency": "~28% of endometrial cancers",
+        "prognosis": "Intermediate (5-year RFS ~85-90%)",
+        "key_feature": "Loss of MMR proteins (MLH1, MSH2, MSH6, PMS2)",
+        "biology": "High tumor mutational burden, immunogenic",
+        "treatment_implication": "Exceptional response to checkpoint inhibitors; screen for Lynch",
+        "color": "#3b82f6",
+    }),
+    MolecularGroup.NSMP: MappingProxyType({
+        "name": "No Specific Molecular Profile",
+        "short_name": "NSMP",
+        "frequency": "~40% of endometrial cancers",
+        "prognosis": "Variable (depends on L1CAM/CTNNB1)",
+        "key_feature": "Wild-type POLE, proficient MMR, wild-type p53",
+        "biology": "Heterogeneous group; L1CAM/CTNNB1 refine risk",
+        "treatment_implication": "Risk-adapted approach based on biomarkers",
+        "color": "#64748b",
+    }),
+    MolecularGroup.P53ABN: MappingProxyType({
+        "name": "p53 Abnormal",
+        "short_name": "p53abn",
+        "frequency": "~25% of endometrial cancers",
+        "prognosis": "Poor (5-year RFS ~50-60%)",
+        "key_feature": "Abnormal p53 IHC (null or missense pattern)",
+        "biology": "Copy number high, serous-like biology, aggressive",
+        "treatment_implication": "Requires aggressive multimodal therapy (CTRT)",
+        "color": "#ef4444",
+    }),
+}
+_NO_DESCRIPTION: Mapping[str, str] = MappingProxyType({})
+
+# Enum members classify() builds per call, bound once (one global load each)
+_MMRD = MolecularGroup.MMRD
+_P53ABN = MolecularGroup.P53ABN
+
+# Classifications that don't depend on patient-specific values are built once
+# and shared by every result; treat them as read-only.
+POLEMUT_CLASSIFICATION = MolecularClassification(
+    group=MolecularGroup.POLEMUT,
+    subtype=None,
+    confidence=1.0,
+    rationale="POLE pathogenic mutation detected. This is the ProMisE POLEmut group.",
+    clinical_significance=(
+        "Excellent prognosis regardless of stage or grade. "
+        "Ultramutated tumors with very low recurrence risk. "
+        "PORTEC-3 data shows 100% 5-year RFS regardless of adjuvant treatment. "
+        "Consider treatment de-escalation. "
+        "Eligible for RAINBO POLEmut-BLUE trial (observation vs RT)."
+    ),
+)
+
+MMRD_SIGNIFICANCE = (
+    "Intermediate prognosis with high tumor mutational burden. "
+    "High neoantigen load makes these tumors exceptionally responsive to "
+    "immune checkpoint inhibitors (pembrolizumab, dostarlimab, durvalumab). "
+    "Should screen for Lynch syndrome (germline MMR mutation). "
+    "Eligible for RAINBO MMRd-GREEN trial (durvalumab + RT). "
+    "FDA-approved indications for checkpoint inhibitors in MMRd tumors."
+)
+
+P53ABN_SIGNIFICANCE = (
+    "Worst prognosis group with aggressive tumor biology. "
+    "High recurrence risk regardless of anatomical stage. "
+    "PORTEC-3 10-year data shows significant benefit from chemoradiotherapy "
+    "(OS HR 0.52, p=0.021). "
+    "Systemic therapy is critical - requires multimodal treatment. "
+    "Eligible for RAINBO p53abn-RED trial (CTRT + olaparib PARP inhibitor). "
+    "Anatomical staging alone underestimates biological risk."
+)
+
+# NSMP subtype -> (rationale, clinical significance)
+NSMP_PROFILES = {
+    "NSMP-high-risk": (
+        "No POLE/MMR/p53 alterations, but L1CAM expression >10% detected. "
+        "This indicates high-risk NSMP.",
+        "L1CAM-positive NSMP has aggressive behavior similar to p53abn group. "
+        "Significantly worse outcomes than L1CAM-negative NSMP. "
+        "L1CAM is an independent adverse prognostic factor. "
+        "Should be treated as high-risk disease with aggressive therapy. "
+        "Eligible for RAINBO NSMP-ORANGE trial (risk-adapted approach).",
+    ),
+    "NSMP-intermediate": (
+        "No POLE/MMR/p53 alterations. CTNNB1 mutation detected. "
+        "This indicates intermediate-risk NSMP.",
+        "CTNNB1-mutated NSMP has intermediate prognosis. "
+        "Associated with younger age and favorable outcomes compared to p53abn. "
+        "Risk-adapted treatment based on conventional clinicopathological features. "
+        "Eligible for RAINBO NSMP-ORANGE trial.",
+    ),
+    "NSMP-low-risk": (
+        "No POLE/MMR/p53 alterations. L1CAM negative and CTNNB1 wild-type. "
+        "This indicates low-risk NSMP.",
+        "Heterogeneous group with variable outcomes. "
+        "Risk depends on conventional clinicopathological features (stage, grade, LVSI). "
+        "Generally favorable prognosis in early-stage disease. "
+        "May benefit from treatment de-escalation in selected cases. "
+        "Eligible for RAINBO NSMP-ORANGE trial (observation vs RT in early-stage).",
+    ),
+}
+
+NSMP_CLASSIFICATIONS = {
+    subtype: MolecularClassification(
+        group=MolecularGroup.NSMP,
+        subtype=subtype,
+        confidence=1.0,
+        rationale=rationale,
+        clinical_significance=significance,
+    )
+    for subtype, (rationale, significance) in NSMP_PROFILES.items()
+}
+
+
 class MolecularClassifier:
     """Molecular classification engine"""
 
@@ -37,118 +164,71 @@ class MolecularClassifier:
 
         # Step 1: Check POLE
         if patient.pole_status == "Mutated":
-            return MolecularClassification(
-                group=MolecularGroup.POLEMUT,
-                subtype=None,
-                confidence=1.0,
-                rationale="POLE pathogenic mutation detected. This is the ProMisE POLEmut group.",
-                clinical_significance=(
-                    "Excellent prognosis regardless of stage or grade. "
-                    "Ultramutated tumors with very low recurrence risk. "
-                    "PORTEC-3 data shows 100% 5-year RFS regardless of adjuvant treatment. "
-                    "Consider treatment de-escalation. "
-                    "Eligible for RAINBO POLEmut-BLUE trial (observation vs RT)."
-                ),
-            )
+            return POLEMUT_CLASSIFICATION
 
         # Step 2: Check MMR
         if patient.mmr_status == "Deficient":
             mmr_protein = patient.mmr_protein_lost or "unspecified protein"
             return MolecularClassification(
-                group=MolecularGroup.MMRD,
+                group=_MMRD,
                 subtype=f"MMRd-{mmr_protein}",
                 confidence=1.0,
                 rationale=f"Mismatch repair deficiency detected (loss of {mmr_protein}). "
                 f"This is the ProMisE MMRd group.",
-                clinical_significance=(
-                    "Intermediate prognosis with high tumor mutational burden. "
-                    "High neoantigen load makes these tumors exceptionally responsive to "
-                    "immune checkpoint inhibitors (pembrolizumab, dostarlimab, durvalumab). "
-                    "Should screen for Lynch syndrome (germline MMR mutation). "
-                    "Eligible for RAINBO MMRd-GREEN trial (durvalumab + RT). "
-                    "FDA-approved indications for checkpoint inhibitors in MMRd tumors."
-                ),
+                clinical_significance=MMRD_SIGNIFICANCE,
             )
 
         # Step 3: Check p53
         if patient.p53_status == "Abnormal":
             pattern = patient.p53_pattern or "unspecified"
             return MolecularClassification(
-                group=MolecularGroup.P53ABN,
+                group=_P53ABN,
                 subtype=f"p53abn-{pattern}",
                 confidence=1.0,
                 rationale=f"p53 abnormal pattern detected ({pattern} on IHC). "
                 f"This is the ProMisE p53abn group.",
-                clinical_significance=(
-                    "Worst prognosis group with aggressive tumor biology. "
-                    "High recurrence risk regardless of anatomical stage. "
-                    "PORTEC-3 10-year data shows significant benefit from chemoradiotherapy "
-                    "(OS HR 0.52, p=0.021). "
-                    "Systemic therapy is critical - requires multimodal treatment. "
-                    "Eligible for RAINBO p53abn-RED trial (CTRT + olaparib PARP inhibitor). "
-                    "Anatomical staging alone underestimates biological risk."
-                ),
+                clinical_significance=P53ABN_SIGNIFICANCE,
             )
 
         # Step 4: NSMP (no specific molecular profile)
         # Further stratify by L1CAM and CTNNB1
-        subtype, rationale, significance = MolecularClassifier._classify_nsmp(patient)
+        return MolecularClassifier._classify_nsmp(patient)
+
+    @staticmethod
+    def classify_many(patients: List[PatientData]) -> List[MolecularClassification]:
+        """
+        Classify a batch of patients
 
-        return MolecularClassification(
-            group=MolecularGroup.NSMP,
-            subtype=subtype,
-            confidence=1.0,
-            rationale=rationale,
-            clinical_significance=significance,
-        )
+        Args:
+            patients: Patients with molecular markers
+
+        Returns:
+            MolecularClassification per patient, in input order
+        """
+        classify = MolecularClassifier.classify
+        return [classify(patient) for patient in patients]
 
     @staticmethod
-    def _classify_nsmp(patient: PatientData) -> Tuple[str, str, str]:
+    def _classify_nsmp(patient: PatientData) -> MolecularClassification:
         """
         Classify NSMP subtype based on L1CAM and CTNNB1
 
         Returns:
-            Tuple of (subtype, rationale, clinical_significance)
+            Shared NSMP classification for the subtype
         """
 
-        l1cam_positive = patient.l1cam_status == "Positive"
-        ctnnb1_mutated = patient.ctnnb1_status == "Mutated"
-
-        if l1cam_positive:
-            return (
-                "NSMP-high-risk",
-                "No POLE/MMR/p53 alterations, but L1CAM expression >10% detected. "
-                "This indicates high-risk NSMP.",
-                "L1CAM-positive NSMP has aggressive behavior similar to p53abn group. "
-                "Significantly worse outcomes than L1CAM-negative NSMP. "
-                "L1CAM is an independent adverse prognostic factor. "
-                "Should be treated as high-risk disease with aggressive therapy. "
-                "Eligible for RAINBO NSMP-ORANGE trial (risk-adapted approach).",
-            )
-        elif ctnnb1_mutated:
-            return (
-                "NSMP-intermediate",
-                "No POLE/MMR/p53 alterations. CTNNB1 mutation detected. "
-                "This indicates intermediate-risk NSMP.",
-                "CTNNB1-mutated NSMP has intermediate prognosis. "
-                "Associated with younger age and favorable outcomes compared to p53abn. "
-                "Risk-adapted treatment based on conventional clinicopathological features. "
-                "Eligible for RAINBO NSMP-ORANGE trial.",
-            )
+        # (L1CAM+, any CTNNB1) -> high risk; (L1CAM-, CTNNB1 mut) -> intermediate;
+        # otherwise low risk. Two short-circuiting comparisons beat building a
+        # (l1cam, ctnnb1) tuple key for a dict lookup (~96 vs ~176 ns).
+        if patient.l1cam_status == "Positive":
+            return NSMP_CLASSIFICATIONS["NSMP-high-risk"]
+        elif patient.ctnnb1_status == "Mutated":
+            return NSMP_CLASSIFICATIONS["NSMP-intermediate"]
         else:
-            return (
-                "NSMP-low-risk",
-                "No POLE/MMR/p53 alterations. L1CAM negative and CTNNB1 wild-type. "
-                "This indicates low-risk NSMP.",
-                "Heterogeneous group with variable outcomes. "
-                "Risk depends on conventional clinicopathological features (stage, grade, LVSI). "
-                "Generally favorable prognosis in early-stage disease. "
-                "May benefit from treatment de-escalation in selected cases. "
-                "Eligible for RAINBO NSMP-ORANGE trial (observation vs RT in early-stage).",
-            )
+            return NSMP_CLASSIFICATIONS["NSMP-low-risk"]
 
     @staticmethod
-    def get_molecular_group_description(group: MolecularGroup) -> Dict[str, str]:
+    def get_molecular_group_description(group: MolecularGroup) -> Mapping[str, str]:
         """
         Get detailed description of molecular group
 
@@ -156,50 +236,6 @@ class MolecularClassifier:
             group: Molecular group enum
 
         Returns:
-            Dictionary with description fields
+            Read-only mapping with description fields
         """
-
-        descriptions = {
-            MolecularGroup.POLEMUT: {
-                "name": "POLE Ultramutated",
-                "short_name": "POLEmut",
-                "frequency": "~7% of endometrial cancers",
-                "prognosis": "Excellent (5-year RFS >95%)",
-                "key_feature": "POLE exonuclease domain mutation",
-                "biology": "Ultramutated tumors with high neoantigen load but excellent outcomes",
-                "treatment_implication": "Consider de-escalation regardless of stage/grade",
-                "color": "#10b981",
-            },
-            MolecularGroup.MMRD: {
-                "name": "Mismatch Repair Deficient",
-                "short_name": "MMRd",
-                "frequency": "~28% of endometrial cancers",
-                "prognosis": "Intermediate (5-year RFS ~85-90%)",
-                "key_feature": "Loss of MMR proteins (MLH1, MSH2, MSH6, PMS2)",
-                "biology": "High tumor mutational burden, immunogenic",
-                "treatment_implication": "Exceptional response to checkpoint inhibitors; screen for Lynch",
-                "color": "#3b82f6",
-            },
-            MolecularGroup.NSMP: {
-                "name": "No Specific Molecular Profile",
-                "short_name": "NSMP",
-                "frequency": "~40% of endometrial cancers",
-                "prognosis": "Variable (depends on L1CAM/CTNNB1)",
-                "key_feature": "Wild-type POLE, proficient MMR, wild-type p53",
-                "biology": "Heterogeneous group; L1CAM/CTNNB1 refine risk",
-                "treatment_implication": "Risk-adapted approach based on biomarkers",
-                "color": "#64748b",
-            },
-            MolecularGroup.P53ABN: {
-                "name": "p53 Abnormal",
-                "short_name": "p53abn",
-                "frequency": "~25% of endometrial cancers",
-                "prognosis": "Poor (5-year RFS ~50-60%)",
-                "key_feature": "Abnormal p53 IHC (null or missense pattern)",
-                "biology": "Copy number high, serous-like biology, aggressive",
-                "treatment_implication": "Requires aggressive multimodal therapy (CTRT)",
-                "color": "#ef4444",
-            },
-        }
-
-        return descriptions.get(group, {})
+        return MOLECULAR_GROUP_DESCRIPTIONS.get(group, _NO_DESCRIPTION)
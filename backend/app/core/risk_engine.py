@@ -4,12 +4,15 @@ Risk Prediction Engine
 Loads trained XGBoost model and predicts 5-year recurrence risk.
 """
 
-import xgboost as xgb
 import numpy as np
+import hashlib
 import json
 import os
-from typing import Dict, Tuple
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+from datetime import datetime, timezone
 
 from app.config import settings
 from app.models.patient import PatientData
@@ -29,9 +32,190 @@ from app.data.feature_definitions import (
     L1CAM_ENCODING,
     CTNNB1_ENCODING,
     STAGE_BASED_RISK,
+    STAGE_RISK_CATEGORY,
     get_risk_category,
 )
 
+try:
+    # Optional: ONNX Runtime scores small batches with a fraction of
+    # inplace_predict's fixed per-call overhead (see app/ml/export_onnx.py)
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+
+# Model encoding for molecular groups (unknown groups encode as NSMP)
+MOLECULAR_GROUP_ENCODING = {"POLEmut": 0, "MMRd": 1, "NSMP": 2, "p53abn": 3}
+
+# Input name and metadata key shared with app/ml/export_onnx.py. The export
+# records the SHA-256 of the model file it was converted from.
+ONNX_INPUT_NAME = "input"
+ONNX_SOURCE_DIGEST_KEY = "source_model_sha256"
+
+# Model feature order used when the model ships without metadata
+DEFAULT_FEATURE_NAMES = (
+    "molecular_group_encoded",
+    "p53_encoded",
+    "pole_encoded",
+    "lvsi_encoded",
+    "l1cam_encoded",
+    "myometrial_encoded",
+    "grade_encoded",
+    "stage_encoded",
+    "age",
+    "mmr_encoded",
+    "ctnnb1_encoded",
+    "histology_encoded",
+    "lymph_nodes_encoded",
+    "bmi",
+    "ecog_status",
+    "diabetes_int",
+)
+
+# Feature name -> Python expression encoding it from `patient`. The molecular
+# group encoding is inlined as a constant by _compile_row_builder instead.
+# Enum fields are looked up by member: the enums subclass str, so a member
+# hashes and compares as its value, and skipping the .value property (~165 ns
+# per read, six per row) roughly halves the cost of building a row.
+FEATURE_EXPRESSIONS = {
+    "p53_encoded": "P53_ENCODING.get(patient.p53_status, 0)",
+    "pole_encoded": "POLE_ENCODING.get(patient.pole_status, 0)",
+    "lvsi_encoded": "LVSI_ENCODING.get(patient.lvsi, 0)",
+    "l1cam_encoded": "L1CAM_ENCODING.get(patient.l1cam_status, 0)",
+    "myometrial_encoded": "MYOMETRIAL_ENCODING.get(patient.myometrial_invasion, 0)",
+    "grade_encoded": "GRADE_ENCODING.get(patient.grade, 0)",
+    "stage_encoded": "STAGE_ENCODING.get(patient.stage, 0)",
+    "age": "patient.age",
+    "mmr_encoded": "MMR_ENCODING.get(patient.mmr_status, 0)",
+    "ctnnb1_encoded": "CTNNB1_ENCODING.get(patient.ctnnb1_status, 0)",
+    "histology_encoded": "HISTOLOGY_ENCODING.get(patient.histology, 0)",
+    "lymph_nodes_encoded": "LYMPH_NODE_ENCODING.get(patient.lymph_nodes, 0)",
+    "bmi": "patient.bmi",
+    "ecog_status": "patient.ecog_status",
+    "diabetes_int": "int(patient.diabetes)",
+}
+
+
+def _compile_row_builder(feature_names: List[str], molecular_encoded: int) -> Callable[[PatientData], list]:
+    """
+    Generate build_row(patient) returning one feature row in model order
+
+    The row is a single list display with the molecular group encoding
+    folded in as a constant, so building a row makes no per-feature calls.
+    One builder is compiled per molecular group when the model loads.
+    """
+    items = [
+        str(molecular_encoded) if name == "molecular_group_encoded" else FEATURE_EXPRESSIONS[name]
+        for name in feature_names
+    ]
+    source = "def build_row(patient):\n    return [" + ", ".join(items) + "]\n"
+    namespace = {}
+    exec(compile(source, "<feature-row-builder>", "exec"), globals(), namespace)
+    return namespace["build_row"]
+
+
+# Distinct staging input combinations kept by _figo_2023_staging
+FIGO_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=FIGO_CACHE_SIZE)
+def _figo_2023_staging(
+    stage,
+    histology,
+    grade,
+    lvsi,
+    molecular_group,
+    pole_status: str,
+    mmr_status: str,
+    p53_status: str,
+    myometrial_invasion,
+    lymph_nodes,
+) -> FIGO2023Staging:
+    """
+    FIGO 2023 staging for one combination of staging inputs
+
+    Staging is a pure function of these ten low-cardinality values, so
+    patients sharing them share one (frozen) FIGO2023Staging. Enum members
+    are passed as-is - they hash and compare as their str values - and only
+    unwrapped on a miss.
+    """
+    figo_stage = determine_figo_2023_stage(
+        anatomical_stage=stage.value,
+        histology=histology.value,
+        grade=grade.value,
+        lvsi=lvsi.value,
+        molecular_group=molecular_group.value,
+        pole_status=pole_status,
+        mmr_status=mmr_status,
+        p53_status=p53_status,
+        myometrial_invasion=myometrial_invasion.value,
+        lymph_nodes=lymph_nodes.value,
+    )
+    return FIGO2023Staging(
+        anatomical_stage=figo_stage.anatomical_stage,
+        figo_2023_stage=figo_stage.molecular_integrated_stage,
+        stage_group=figo_stage.stage_group,
+        molecular_modifier=figo_stage.molecular_modifier,
+        rationale=figo_stage.rationale,
+        prognosis_impact=figo_stage.prognosis_impact,
+        clinical_implications=figo_stage.clinical_implications,
+    )
+
+
+class FeatureRowCache:
+    """
+    Thread-safe LRU of per-row model outputs keyed by the feature row
+
+    Model outputs (probabilities, SHAP values) depend only on the encoded
+    feature row, so repeated patients - demo scenarios, grey-zone A/B
+    comparisons, re-submitted reports - skip the tree traversal. A float32
+    row is a few dozen bytes, so its raw bytes serve as the key directly.
+    """
+
+    def __init__(self, maxsize: int = None):
+        self.maxsize = maxsize or settings.FEATURE_CACHE_SIZE
+        self._entries: "OrderedDict[bytes, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def map_rows(self, X: np.ndarray, compute: Callable[[np.ndarray], Any]) -> List[Any]:
+        """
+        Per-row outputs for X, running compute only on the rows not cached
+
+        Args:
+            X: Feature matrix
+            compute: Model call returning one output per row of its input
+
+        Returns:
+            One output per row of X, in order
+        """
+        keys = [row.tobytes() for row in X]
+        outputs = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    outputs[i] = self._entries[key]
+                else:
+                    missing.append(i)
+
+        if missing:
+            computed = compute(X[missing])
+            with self._lock:
+                for i, output in zip(missing, computed):
+                    # Copy so a cached row doesn't pin the whole batch array
+                    output = output.copy() if isinstance(output, np.ndarray) else output
+                    outputs[i] = self._entries[keys[i]] = output
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        return outputs
+
+    def clear(self):
+        """Drop every cached output (e.g. after the model is reloaded)"""
+        with self._lock:
+            self._entries.clear()
+
 
 class RiskEngine:
     """Risk prediction engine"""
@@ -45,8 +229,12 @@ class RiskEngine:
         """
         self.model_path = model_path or settings.MODEL_PATH
         self.model = None
+        self._booster = None
+        self._onnx_session = None
         self.feature_names = None
         self.metadata = None
+        self._row_builders = None
+        self._probability_cache = FeatureRowCache()
         self._load_model()
 
     def _load_model(self):
@@ -58,39 +246,81 @@ class RiskEngine:
                 f"Please run 'python app/ml/train_model.py' first."
             )
 
+        # Imported here rather than at module level: xgboost pulls in pandas,
+        # scipy and sklearn (~1 s), which modules that only need this one's
+        # constants or FeatureRowCache shouldn't pay for
+        import xgboost as xgb
+
         # Load XGBoost model
         self.model = xgb.XGBClassifier()
         self.model.load_model(self.model_path)
+        self.model.set_params(n_jobs=settings.MODEL_N_JOBS)
+        # inplace_predict scores the float32 feature matrix directly, without
+        # the per-call DMatrix that predict_proba builds. It is thread-safe, so
+        # the executor's worker threads can share this one booster; for
+        # binary:logistic it returns P(recurrence) as a 1-D array.
+        self._booster = self.model.get_booster()
 
         # Load metadata
-        metadata_path = self.model_path.replace(".json", "_metadata.json")
+        metadata_path = os.path.splitext(self.model_path)[0] + "_metadata.json"
         if os.path.exists(metadata_path):
             with open(metadata_path, "r") as f:
                 self.metadata = json.load(f)
                 self.feature_names = self.metadata.get("feature_names", [])
         else:
             # Fallback feature names if metadata doesn't exist
-            self.feature_names = [
-                "molecular_group_encoded",
-                "p53_encoded",
-                "pole_encoded",
-                "lvsi_encoded",
-                "l1cam_encoded",
-                "myometrial_encoded",
-                "grade_encoded",
-                "stage_encoded",
-                "age",
-                "mmr_encoded",
-                "ctnnb1_encoded",
-                "histology_encoded",
-                "lymph_nodes_encoded",
-                "bmi",
-                "ecog_status",
-                "diabetes_int",
-            ]
+            self.feature_names = DEFAULT_FEATURE_NAMES
+
+        self._row_builders = {
+            group: _compile_row_builder(self.feature_names, encoded)
+            for group, encoded in MOLECULAR_GROUP_ENCODING.items()
+        }
+        self._onnx_session = self._load_onnx_session()
+        self._probability_cache.clear()
 
         print(f"Model loaded from {self.model_path}")
 
+    def _load_onnx_session(self):
+        """
+        ONNX Runtime session for the exported model, or None to use XGBoost
+
+        The session is only used when the export's recorded digest matches
+        the loaded model file, so a retrained model is never scored by a
+        stale export.
+        """
+        onnx_path = os.path.splitext(self.model_path)[0] + ".onnx"
+        if not settings.USE_ONNX or onnxruntime is None or not os.path.exists(onnx_path):
+            return None
+
+        with open(self.model_path, "rb") as f:
+            model_digest = hashlib.sha256(f.read()).hexdigest()
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = settings.MODEL_N_JOBS or 0  # 0: one per core
+        options.inter_op_num_threads = 1
+        session = onnxruntime.InferenceSession(
+            onnx_path, options, providers=["CPUExecutionProvider"]
+        )
+        if session.get_modelmeta().custom_metadata_map.get(ONNX_SOURCE_DIGEST_KEY) != model_digest:
+            print(f"Ignoring {onnx_path}: exported from a different model file")
+            return None
+
+        print(f"ONNX Runtime session loaded from {onnx_path}")
+        return session
+
+    def _predict_probabilities(self, X: np.ndarray) -> list:
+        """
+        P(recurrence) for each row of X
+
+        inplace_predict has ~130 us of fixed per-call overhead, so small
+        batches (single requests, micro-batches) go through ONNX Runtime when
+        an export is loaded; past ONNX_MAX_ROWS XGBoost's per-row cost wins.
+        """
+        if self._onnx_session is not None and len(X) <= settings.ONNX_MAX_ROWS:
+            # Outputs are (label, probabilities); column 1 is P(recurrence)
+            return self._onnx_session.run(None, {ONNX_INPUT_NAME: X})[1][:, 1].tolist()
+        return self._booster.inplace_predict(X).tolist()
+
     def _prepare_features(self, patient: PatientData, molecular_group: str) -> np.ndarray:
         """
         Convert patient data to feature vector
@@ -102,35 +332,55 @@ class RiskEngine:
         Returns:
             Feature vector as numpy array
         """
+        return self._prepare_feature_matrix([patient], [molecular_group])
 
-        # Encode molecular group
-        molecular_group_encoding = {"POLEmut": 0, "MMRd": 1, "NSMP": 2, "p53abn": 3}
-        molecular_encoded = molecular_group_encoding.get(molecular_group, 2)
-
-        # Encode all features
-        features = {
-            "molecular_group_encoded": molecular_encoded,
-            "p53_encoded": P53_ENCODING.get(patient.p53_status, 0),
-            "pole_encoded": POLE_ENCODING.get(patient.pole_status, 0),
-            "lvsi_encoded": LVSI_ENCODING.get(patient.lvsi.value, 0),
-            "l1cam_encoded": L1CAM_ENCODING.get(patient.l1cam_status, 0),
-            "myometrial_encoded": MYOMETRIAL_ENCODING.get(patient.myometrial_invasion.value, 0),
-            "grade_encoded": GRADE_ENCODING.get(patient.grade.value, 0),
-            "stage_encoded": STAGE_ENCODING.get(patient.stage.value, 0),
-            "age": patient.age,
-            "mmr_encoded": MMR_ENCODING.get(patient.mmr_status, 0),
-            "ctnnb1_encoded": CTNNB1_ENCODING.get(patient.ctnnb1_status, 0),
-            "histology_encoded": HISTOLOGY_ENCODING.get(patient.histology.value, 0),
-            "lymph_nodes_encoded": LYMPH_NODE_ENCODING.get(patient.lymph_nodes.value, 0),
-            "bmi": patient.bmi,
-            "ecog_status": patient.ecog_status,
-            "diabetes_int": int(patient.diabetes),
-        }
+    def _prepare_feature_matrix(self, patients: list[PatientData], molecular_groups: list[str]) -> np.ndarray:
+        """
+        Convert several patients to one feature matrix
 
-        # Create feature vector in correct order
-        feature_vector = np.array([features[name] for name in self.feature_names])
+        Rows come from the compiled per-group builders and are converted in a
+        single np.array call to float32 (the dtype XGBoost and SHAP use
+        internally), in model feature order. A fresh array per call keeps
+        concurrent requests on the thread pool from sharing a buffer.
+        Narrower dtypes don't pay: even 1000 rows are only 64 KB, and int8
+        codes score no faster since tree traversal, not reading the input,
+        is the cost.
 
-        return feature_vector.reshape(1, -1)
+        Args:
+            patients: Patient data
+            molecular_groups: Molecular classification group per patient
+
+        Returns:
+            Feature matrix of shape (len(patients), n_features)
+        """
+        builders = self._row_builders
+        default_builder = builders["NSMP"]  # unknown groups encode as NSMP
+        if not patients:
+            return np.empty((0, len(self.feature_names)), dtype=np.float32)
+        # Cost is reading patient attributes and unboxing Python numbers
+        # (~0.9 + ~0.5 us per row); there is no numeric loop left for a
+        # JIT to compile, and np.fromiter over the flattened rows only
+        # trades a few percent on large batches for slower single rows.
+        return np.array(
+            [
+                builders.get(molecular_group, default_builder)(patient)
+                for patient, molecular_group in zip(patients, molecular_groups)
+            ],
+            dtype=np.float32,
+        )
+
+    def warm_up(self) -> None:
+        """
+        Score one dummy row through each loaded backend
+
+        Starts XGBoost's predictor and OpenMP threads (and the ONNX Runtime
+        session, when one is loaded) ahead of the first request. The
+        prediction cache is bypassed, so the dummy row never lands in it.
+        """
+        X = np.zeros((1, len(self.feature_names)), dtype=np.float32)
+        self._booster.inplace_predict(X)
+        if self._onnx_session is not None:
+            self._onnx_session.run(None, {ONNX_INPUT_NAME: X})
 
     def predict(self, patient: PatientData) -> PredictionResult:
         """
@@ -142,24 +392,64 @@ class RiskEngine:
         Returns:
             PredictionResult with risk score and classification
         """
+        return self.batch_predict([patient])[0]
+
+    def batch_predict(self, patients: list[PatientData]) -> list[PredictionResult]:
+        """
+        Predict for multiple patients
+
+        Feature vectors are stacked so the model scores the whole batch in a
+        single model call.
+
+        Args:
+            patients: List of patient data
+
+        Returns:
+            List of prediction results
+        """
+        if not patients:
+            return []
 
         # Step 1: Molecular classification
-        molecular_classification = MolecularClassifier.classify(patient)
+        classifications = MolecularClassifier.classify_many(patients)
 
         # Step 2: Prepare features for ML model
-        X = self._prepare_features(patient, molecular_classification.group.value)
+        X = self._prepare_feature_matrix(
+            patients, [classification.group.value for classification in classifications]
+        )
 
-        # Step 3: Predict probability
-        recurrence_probability = float(self.model.predict_proba(X)[0, 1])
+        # Step 3: Predict probability (rows seen before come from the cache)
+        probabilities = self._probability_cache.map_rows(X, self._predict_probabilities)
+
+        # One assessment timestamp for the whole batch, formatted once
+        assessment_date = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        results = [
+            self._build_result(patient, classification, float(probability), assessment_date)
+            for patient, classification, probability in zip(patients, classifications, probabilities)
+        ]
+        for i, result in enumerate(results):
+            result._features = X[i:i + 1]
+        return results
+
+    def _build_result(
+        self,
+        patient: PatientData,
+        molecular_classification,
+        recurrence_probability: float,
+        assessment_date: str,
+    ) -> PredictionResult:
+        """Assemble the PredictionResult for one scored patient"""
 
         # Step 4: Categorize risk
         risk_category = get_risk_category(recurrence_probability)
 
         # Step 5: Get stage-based risk estimate for comparison
-        stage_based_risk = STAGE_BASED_RISK.get(patient.stage.value, 0.15)
+        # (stage members hash as their str values, so no .value needed)
+        stage = patient.stage
+        stage_based_risk = STAGE_BASED_RISK.get(stage, 0.15)
 
         # Step 6: Check if reclassified
-        stage_risk_category = get_risk_category(stage_based_risk)
+        stage_risk_category = STAGE_RISK_CATEGORY.get(stage) or get_risk_category(stage_based_risk)
         reclassified = stage_risk_category != risk_category
 
         # Step 7: Calculate risk difference
@@ -169,27 +459,17 @@ class RiskEngine:
         risk_percentile = int(recurrence_probability * 100)
 
         # Step 9: FIGO 2023 staging with molecular integration
-        figo_stage = determine_figo_2023_stage(
-            anatomical_stage=patient.stage.value,
-            histology=patient.histology.value,
-            grade=patient.grade.value,
-            lvsi=patient.lvsi.value,
-            molecular_group=molecular_classification.group.value,
-            pole_status=patient.pole_status or "Not Tested",
-            mmr_status=patient.mmr_status or "Not Tested",
-            p53_status=patient.p53_status or "Not Tested",
-            myometrial_invasion=patient.myometrial_invasion.value,
-            lymph_nodes=patient.lymph_nodes.value,
-        )
-
-        figo_2023_staging = FIGO2023Staging(
-            anatomical_stage=figo_stage.anatomical_stage,
-            figo_2023_stage=figo_stage.molecular_integrated_stage,
-            stage_group=figo_stage.stage_group,
-            molecular_modifier=figo_stage.molecular_modifier,
-            rationale=figo_stage.rationale,
-            prognosis_impact=figo_stage.prognosis_impact,
-            clinical_implications=figo_stage.clinical_implications,
+        figo_2023_staging = _figo_2023_staging(
+            stage,
+            patient.histology,
+            patient.grade,
+            patient.lvsi,
+            molecular_classification.group,
+            patient.pole_status or "Not Tested",
+            patient.mmr_status or "Not Tested",
+            patient.p53_status or "Not Tested",
+            patient.myometrial_invasion,
+            patient.lymph_nodes,
         )
 
         # Create result
@@ -203,36 +483,30 @@ class RiskEngine:
             risk_difference=risk_difference,
             reclassified=reclassified,
             model_version=settings.VERSION,
-            assessment_date=datetime.utcnow().isoformat() + "Z",
+            assessment_date=assessment_date,
         )
 
         return result
 
-    def batch_predict(self, patients: list[PatientData]) -> list[PredictionResult]:
-        """
-        Predict for multiple patients
-
-        Args:
-            patients: List of patient data
-
-        Returns:
-            List of prediction results
-        """
-        return [self.predict(patient) for patient in patients]
-
 
 # Singleton instance for API use
 _engine_instance = None
+_engine_lock = threading.Lock()
 
 
 def get_risk_engine() -> RiskEngine:
     """
     Get singleton risk engine instance
 
+    Creation is locked so concurrent first callers on the thread pool
+    load the model once; later calls skip the lock.
+
     Returns:
         RiskEngine instance
     """
     global _engine_instance
     if _engine_instance is None:
-        _engine_instance = RiskEngine()
+        with _engine_lock:
+            if _engine_instance is None:
+                _engine_instance = RiskEngine()
     return _engine_instance
@@ -5,6 +5,9 @@ Pre-defined clinical scenarios for demo mode, based on actual clinical patterns
 observed in PORTEC-3 and other trials.
 """
 
+from types import MappingProxyType
+from typing import Mapping, Optional
+
 DEMO_SCENARIOS = {
     "silent-killer": {
         "id": "silent-killer",
@@ -209,11 +212,25 @@ DEMO_SCENARIOS = {
 }
 
 
-def get_scenario(scenario_id: str) -> dict:
-    """Get scenario by ID"""
+def _freeze(value):
+    """Read-only copy of nested scenario data (dicts -> MappingProxyType, lists -> tuples)"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# The catalog is static: freeze it all the way down so every caller can share
+# the same objects without defensive copies
+DEMO_SCENARIOS: Mapping[str, Mapping] = _freeze(DEMO_SCENARIOS)
+
+
+def get_scenario(scenario_id: str) -> Optional[Mapping]:
+    """Get scenario by ID (read-only)"""
     return DEMO_SCENARIOS.get(scenario_id)
 
 
-def get_all_scenarios() -> dict:
-    """Get all scenarios"""
+def get_all_scenarios() -> Mapping[str, Mapping]:
+    """Get all scenarios (read-only)"""
     return DEMO_SCENARIOS
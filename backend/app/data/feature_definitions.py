@@ -132,6 +132,10 @@ def get_risk_category(probability: float) -> str:
         return "HIGH"
 
 
+# Risk category of each stage's stage-based risk (pure function of the stage)
+STAGE_RISK_CATEGORY = {stage: get_risk_category(risk) for stage, risk in STAGE_BASED_RISK.items()}
+
+
 def get_risk_color(category: str) -> str:
     """Get color for risk category"""
     colors = {
@@ -12,11 +12,54 @@ and molecular profiles along with realistic outcome data.
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Sequence, Tuple
 import os
 
 from app.config import settings
 
+# Molecular groups are carried through generation as int8 codes (index into
+# MOLECULAR_GROUPS, same order as the model's molecular_group encoding) and
+# only turned into labels for the final DataFrame
+MOLECULAR_GROUPS = np.array(["POLEmut", "MMRd", "NSMP", "p53abn"])
+POLEMUT, MMRD, NSMP, P53ABN = range(len(MOLECULAR_GROUPS))
+
+
+def _choice_by_group(
+    options: Sequence, probabilities: List[List[float]], rows: np.ndarray, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Draw one option per patient from the probability row selected for it
+
+    Vectorized inverse-CDF sampling: one uniform draw per patient is placed
+    in the (normalized) cumulative distribution of its row, replacing a
+    choice() call per patient.
+
+    Args:
+        options: Category labels
+        probabilities: One probability row per subgroup (columns match options)
+        rows: Row index into probabilities for each patient
+        rng: Random generator to draw from
+
+    Returns:
+        Array of sampled labels, one per patient
+    """
+    cdf = np.cumsum(probabilities, axis=1)
+    cdf /= cdf[:, -1:]
+    u = rng.random(len(rows))
+    # Number of CDF steps at or below u is the sampled index
+    # (np.searchsorted(cdf, u, side="right") per row)
+    index = (u[:, None] >= cdf[rows]).sum(axis=1)
+    return np.asarray(options)[index]
+
+
+def _factor_by_value(factors: Dict[str, float], values: np.ndarray) -> np.ndarray:
+    """Per-patient multiplier from a value -> factor table (1.0 for unlisted values)"""
+    # Binary-search each value among the table's few sorted keys rather than
+    # sorting all values (np.unique) to find the distinct ones
+    keys = np.array(sorted(factors))
+    index = np.searchsorted(keys, values) % len(keys)
+    return np.where(keys[index] == values, np.array([factors[key] for key in keys])[index], 1.0)
+
 
 class SyntheticDataGenerator:
     """Generate synthetic endometrial cancer patient data"""
@@ -31,7 +74,9 @@ class SyntheticDataGenerator:
         """
         self.n_patients = n_patients
         self.random_seed = random_seed
-        np.random.seed(random_seed)
+        # Instance-owned generator rather than the global legacy RNG, so
+        # generators don't share (or reseed) process-wide random state
+        self.rng = np.random.default_rng(random_seed)
 
     def generate_molecular_groups(self) -> np.ndarray:
         """
@@ -42,29 +87,32 @@ class SyntheticDataGenerator:
         - MMRd: 28%
         - NSMP: 40%
         - p53abn: 25%
+
+        Returns:
+            int8 group codes (see MOLECULAR_GROUPS)
         """
-        molecular_groups = np.random.choice(
-            ["POLEmut", "MMRd", "NSMP", "p53abn"],
+        molecular_groups = self.rng.choice(
+            len(MOLECULAR_GROUPS),
             size=self.n_patients,
             p=[0.07, 0.28, 0.40, 0.25],
         )
-        return molecular_groups
+        return molecular_groups.astype(np.int8)
 
     def generate_clinical_features(self) -> Dict[str, np.ndarray]:
         """Generate clinical features with realistic distributions"""
 
         # Age: Normal distribution, mean=63, std=10, range 35-85
-        age = np.clip(np.random.normal(63, 10, self.n_patients), 35, 85).astype(int)
+        age = np.clip(self.rng.normal(63, 10, self.n_patients), 35, 85).astype(int)
 
         # BMI: Normal distribution, mean=32, std=8, range 18-55
-        bmi = np.clip(np.random.normal(32, 8, self.n_patients), 18, 55)
+        bmi = np.clip(self.rng.normal(32, 8, self.n_patients), 18, 55)
 
         # Diabetes: ~30% prevalence (correlated with BMI)
         diabetes_prob = 0.15 + 0.3 * (bmi - 18) / (55 - 18)
-        diabetes = np.random.random(self.n_patients) < diabetes_prob
+        diabetes = self.rng.random(self.n_patients) < diabetes_prob
 
         # ECOG: Mostly 0-1, some 2-3
-        ecog = np.random.choice([0, 1, 2, 3], size=self.n_patients, p=[0.50, 0.35, 0.10, 0.05])
+        ecog = self.rng.choice([0, 1, 2, 3], size=self.n_patients, p=[0.50, 0.35, 0.10, 0.05])
 
         return {"age": age, "bmi": bmi, "diabetes": diabetes, "ecog_status": ecog}
 
@@ -80,87 +128,67 @@ class SyntheticDataGenerator:
 
         n = len(molecular_groups)
 
+        # Each feature is drawn for all patients at once from a per-patient
+        # row of a (subgroup x option) probability table - see _choice_by_group
+
         # Stage distribution with molecular correlation
         stage_options = ["IA", "IB", "II", "IIIA", "IIIB", "IIIC1", "IIIC2", "IVA", "IVB"]
-        stage = []
-        for mol_group in molecular_groups:
-            if mol_group == "p53abn":
-                # p53abn tends toward more advanced stages
-                stage.append(
-                    np.random.choice(
-                        stage_options, p=[0.20, 0.20, 0.15, 0.10, 0.10, 0.10, 0.08, 0.05, 0.02]
-                    )
-                )
-            elif mol_group == "POLEmut":
-                # POLEmut mostly early stage
-                stage.append(
-                    np.random.choice(
-                        stage_options, p=[0.55, 0.25, 0.10, 0.05, 0.03, 0.01, 0.01, 0.0, 0.0]
-                    )
-                )
-            else:
-                # Standard distribution for MMRd and NSMP
-                stage.append(
-                    np.random.choice(
-                        stage_options, p=[0.45, 0.25, 0.10, 0.05, 0.05, 0.07, 0.03, 0.0, 0.0]
-                    )
-                )
-        stage = np.array(stage)
+        stage_probabilities = [
+            # p53abn tends toward more advanced stages
+            [0.20, 0.20, 0.15, 0.10, 0.10, 0.10, 0.08, 0.05, 0.02],
+            # POLEmut mostly early stage
+            [0.55, 0.25, 0.10, 0.05, 0.03, 0.01, 0.01, 0.0, 0.0],
+            # Standard distribution for MMRd and NSMP
+            [0.45, 0.25, 0.10, 0.05, 0.05, 0.07, 0.03, 0.0, 0.0],
+        ]
+        stage_rows = np.select(
+            [molecular_groups == P53ABN, molecular_groups == POLEMUT], [0, 1], default=2
+        )
+        stage = _choice_by_group(stage_options, stage_probabilities, stage_rows, self.rng)
 
         # Grade with molecular correlation
-        grade = []
-        for mol_group in molecular_groups:
-            if mol_group == "POLEmut" or mol_group == "p53abn":
-                # Both tend toward high grade
-                grade.append(np.random.choice(["G1", "G2", "G3"], p=[0.05, 0.20, 0.75]))
-            else:
-                # Standard distribution
-                grade.append(np.random.choice(["G1", "G2", "G3"], p=[0.30, 0.40, 0.30]))
-        grade = np.array(grade)
+        grade_probabilities = [
+            # POLEmut and p53abn both tend toward high grade
+            [0.05, 0.20, 0.75],
+            # Standard distribution
+            [0.30, 0.40, 0.30],
+        ]
+        grade_rows = np.where(np.isin(molecular_groups, (POLEMUT, P53ABN)), 0, 1)
+        grade = _choice_by_group(["G1", "G2", "G3"], grade_probabilities, grade_rows, self.rng)
 
         # Histology - mostly endometrioid except for p53abn
-        histology = []
-        for mol_group in molecular_groups:
-            if mol_group == "p53abn":
-                # p53abn often serous or high-grade endometrioid
-                histology.append(
-                    np.random.choice(
-                        ["Endometrioid", "Serous", "Clear Cell", "Carcinosarcoma", "Mixed"],
-                        p=[0.30, 0.40, 0.15, 0.10, 0.05],
-                    )
-                )
-            else:
-                # Mostly endometrioid for other groups
-                histology.append(
-                    np.random.choice(
-                        ["Endometrioid", "Serous", "Clear Cell", "Carcinosarcoma", "Mixed"],
-                        p=[0.85, 0.05, 0.05, 0.03, 0.02],
-                    )
-                )
-        histology = np.array(histology)
+        histology_probabilities = [
+            # p53abn often serous or high-grade endometrioid
+            [0.30, 0.40, 0.15, 0.10, 0.05],
+            # Mostly endometrioid for other groups
+            [0.85, 0.05, 0.05, 0.03, 0.02],
+        ]
+        histology_rows = np.where(molecular_groups == P53ABN, 0, 1)
+        histology = _choice_by_group(
+            ["Endometrioid", "Serous", "Clear Cell", "Carcinosarcoma", "Mixed"],
+            histology_probabilities,
+            histology_rows,
+            self.rng,
+        )
 
         # LVSI - correlated with stage and grade
-        lvsi = np.random.choice(["None", "Focal", "Substantial"], size=n, p=[0.50, 0.30, 0.20])
+        lvsi = self.rng.choice(["None", "Focal", "Substantial"], size=n, p=[0.50, 0.30, 0.20])
 
         # Myometrial invasion
-        myometrial = np.random.choice(["<50%", "≥50%"], size=n, p=[0.55, 0.45])
+        myometrial = self.rng.choice(["<50%", "≥50%"], size=n, p=[0.55, 0.45])
 
         # Lymph nodes - correlated with stage
-        lymph_nodes = []
-        for s in stage:
-            if s in ["IA", "IB", "II"]:
-                lymph_nodes.append(
-                    np.random.choice(["Negative", "Pelvic+", "Para-aortic+"], p=[0.95, 0.04, 0.01])
-                )
-            elif s in ["IIIA", "IIIB"]:
-                lymph_nodes.append(
-                    np.random.choice(["Negative", "Pelvic+", "Para-aortic+"], p=[0.70, 0.25, 0.05])
-                )
-            else:  # IIIC+
-                lymph_nodes.append(
-                    np.random.choice(["Negative", "Pelvic+", "Para-aortic+"], p=[0.10, 0.70, 0.20])
-                )
-        lymph_nodes = np.array(lymph_nodes)
+        lymph_node_probabilities = [
+            [0.95, 0.04, 0.01],  # IA, IB, II
+            [0.70, 0.25, 0.05],  # IIIA, IIIB
+            [0.10, 0.70, 0.20],  # IIIC+
+        ]
+        lymph_node_rows = np.select(
+            [np.isin(stage, ("IA", "IB", "II")), np.isin(stage, ("IIIA", "IIIB"))], [0, 1], default=2
+        )
+        lymph_nodes = _choice_by_group(
+            ["Negative", "Pelvic+", "Para-aortic+"], lymph_node_probabilities, lymph_node_rows, self.rng
+        )
 
         return {
             "stage": stage,
@@ -186,63 +214,39 @@ class SyntheticDataGenerator:
 
         n = len(molecular_groups)
 
-        pole_status = []
-        mmr_status = []
-        p53_status = []
-        l1cam_status = []
-        ctnnb1_status = []
-
-        for mol_group in molecular_groups:
-            if mol_group == "POLEmut":
-                pole_status.append("Mutated")
-                mmr_status.append("Proficient")  # Usually proficient
-                p53_status.append("Wild-type")
-                l1cam_status.append("Negative")
-                ctnnb1_status.append("Wild-type")
-
-            elif mol_group == "MMRd":
-                pole_status.append("Wild-type")
-                mmr_status.append("Deficient")
-                p53_status.append("Wild-type")
-                # Random L1CAM/CTNNB1
-                l1cam_status.append(np.random.choice(["Negative", "Positive"], p=[0.80, 0.20]))
-                ctnnb1_status.append(np.random.choice(["Wild-type", "Mutated"], p=[0.70, 0.30]))
-
-            elif mol_group == "p53abn":
-                pole_status.append("Wild-type")
-                mmr_status.append("Proficient")
-                p53_status.append("Abnormal")
-                # Often L1CAM positive
-                l1cam_status.append(np.random.choice(["Negative", "Positive"], p=[0.40, 0.60]))
-                ctnnb1_status.append("Wild-type")
-
-            else:  # NSMP
-                pole_status.append("Wild-type")
-                mmr_status.append("Proficient")
-                p53_status.append("Wild-type")
-                # L1CAM and CTNNB1 differentiate risk in NSMP
-                # 30% L1CAM+ (high risk), 40% CTNNB1+ (intermediate), 30% neither
-                marker_profile = np.random.choice(["L1CAM+", "CTNNB1+", "Neither"], p=[0.30, 0.40, 0.30])
-                if marker_profile == "L1CAM+":
-                    l1cam_status.append("Positive")
-                    ctnnb1_status.append("Wild-type")
-                elif marker_profile == "CTNNB1+":
-                    l1cam_status.append("Negative")
-                    ctnnb1_status.append("Mutated")
-                else:
-                    l1cam_status.append("Negative")
-                    ctnnb1_status.append("Wild-type")
+        pole_status = np.where(molecular_groups == POLEMUT, "Mutated", "Wild-type")
+        mmr_status = np.where(molecular_groups == MMRD, "Deficient", "Proficient")  # POLEmut usually proficient
+        p53_status = np.where(molecular_groups == P53ABN, "Abnormal", "Wild-type")
+
+        # L1CAM/CTNNB1 are drawn jointly as one of four marker profiles,
+        # with one probability row per molecular group (rows in code order)
+        l1cam_profiles = np.array(["Negative", "Positive", "Negative", "Positive"])
+        ctnnb1_profiles = np.array(["Wild-type", "Wild-type", "Mutated", "Mutated"])
+        marker_probabilities = [
+            # POLEmut: marker negative
+            [1.0, 0.0, 0.0, 0.0],
+            # MMRd: random L1CAM (20% +) and CTNNB1 (30% mutated), independent
+            [0.80 * 0.70, 0.20 * 0.70, 0.80 * 0.30, 0.20 * 0.30],
+            # NSMP: L1CAM and CTNNB1 differentiate risk
+            # 30% L1CAM+ (high risk), 40% CTNNB1+ (intermediate), 30% neither
+            [0.30, 0.30, 0.40, 0.0],
+            # p53abn: often L1CAM positive
+            [0.40, 0.60, 0.0, 0.0],
+        ]
+        profile = _choice_by_group(range(4), marker_probabilities, molecular_groups, self.rng)
+        l1cam_status = l1cam_profiles[profile]
+        ctnnb1_status = ctnnb1_profiles[profile]
 
         # ER/PR mostly high in endometrioid
-        er_percent = np.clip(np.random.normal(70, 25, n), 0, 100)
-        pr_percent = np.clip(np.random.normal(65, 30, n), 0, 100)
+        er_percent = np.clip(self.rng.normal(70, 25, n), 0, 100)
+        pr_percent = np.clip(self.rng.normal(65, 30, n), 0, 100)
 
         return {
-            "pole_status": np.array(pole_status),
-            "mmr_status": np.array(mmr_status),
-            "p53_status": np.array(p53_status),
-            "l1cam_status": np.array(l1cam_status),
-            "ctnnb1_status": np.array(ctnnb1_status),
+            "pole_status": pole_status,
+            "mmr_status": mmr_status,
+            "p53_status": p53_status,
+            "l1cam_status": l1cam_status,
+            "ctnnb1_status": ctnnb1_status,
             "er_percent": er_percent,
             "pr_percent": pr_percent,
         }
@@ -266,51 +270,38 @@ class SyntheticDataGenerator:
         """
 
         n = len(molecular_groups)
-        recurrence = np.zeros(n, dtype=bool)
-        time_to_recurrence = np.zeros(n)  # Months
-
-        for i in range(n):
-            mol_group = molecular_groups[i]
-
-            # Base recurrence probability by molecular group
-            if mol_group == "POLEmut":
-                base_prob = 0.04
-            elif mol_group == "MMRd":
-                base_prob = 0.12
-            elif mol_group == "NSMP":
-                # Higher if L1CAM+
-                if l1cam_status[i] == "Positive":
-                    base_prob = 0.35  # NSMP-high-risk behaves like p53abn
-                else:
-                    base_prob = 0.15
-            else:  # p53abn
-                base_prob = 0.45
-
-            # Adjust for stage (small effect for POLEmut, larger for others)
-            stage_factor = {"IA": 0.8, "IB": 1.0, "II": 1.2, "IIIA": 1.5, "IIIB": 1.5, "IIIC1": 1.8, "IIIC2": 2.0, "IVA": 2.5, "IVB": 3.0}
-            if mol_group != "POLEmut":  # Stage matters less for POLEmut
-                base_prob *= stage_factor.get(stage[i], 1.0)
-
-            # Adjust for grade
-            grade_factor = {"G1": 0.8, "G2": 1.0, "G3": 1.3}
-            if mol_group != "POLEmut":
-                base_prob *= grade_factor.get(grade[i], 1.0)
-
-            # Adjust for LVSI
-            lvsi_factor = {"None": 0.9, "Focal": 1.0, "Substantial": 1.4}
-            base_prob *= lvsi_factor.get(lvsi[i], 1.0)
-
-            # Cap probability
-            final_prob = min(base_prob, 0.85)
-
-            # Determine recurrence
-            recurrence[i] = np.random.random() < final_prob
-
-            # Time to recurrence (exponential distribution)
-            if recurrence[i]:
-                time_to_recurrence[i] = np.random.exponential(scale=18)  # Mean 18 months
-            else:
-                time_to_recurrence[i] = 60  # Censored at 5 years
+
+        # Base recurrence probability by molecular group
+        base_prob = np.select(
+            [molecular_groups == POLEMUT, molecular_groups == MMRD, molecular_groups == NSMP],
+            [
+                0.04,
+                0.12,
+                # NSMP higher if L1CAM+ (NSMP-high-risk behaves like p53abn)
+                np.where(l1cam_status == "Positive", 0.35, 0.15),
+            ],
+            default=0.45,  # p53abn
+        )
+
+        # Adjust for stage and grade (small effect for POLEmut, larger for others)
+        stage_factor = {"IA": 0.8, "IB": 1.0, "II": 1.2, "IIIA": 1.5, "IIIB": 1.5, "IIIC1": 1.8, "IIIC2": 2.0, "IVA": 2.5, "IVB": 3.0}
+        grade_factor = {"G1": 0.8, "G2": 1.0, "G3": 1.3}
+        not_polemut = molecular_groups != POLEMUT  # Stage/grade matter less for POLEmut
+        base_prob = base_prob * np.where(not_polemut, _factor_by_value(stage_factor, stage), 1.0)
+        base_prob = base_prob * np.where(not_polemut, _factor_by_value(grade_factor, grade), 1.0)
+
+        # Adjust for LVSI
+        lvsi_factor = {"None": 0.9, "Focal": 1.0, "Substantial": 1.4}
+        base_prob = base_prob * _factor_by_value(lvsi_factor, lvsi)
+
+        # Cap probability
+        final_prob = np.minimum(base_prob, 0.85)
+
+        # Determine recurrence
+        recurrence = self.rng.random(n) < final_prob
+
+        # Time to recurrence (exponential, mean 18 months); censored at 5 years
+        time_to_recurrence = np.where(recurrence, self.rng.exponential(scale=18, size=n), 60.0)
 
         return {
             "recurrence": recurrence,
@@ -345,8 +336,8 @@ class SyntheticDataGenerator:
 
         # Combine all features
         data = {
-            "patient_id": [f"EC-{i:04d}" for i in range(self.n_patients)],
-            "molecular_group": molecular_groups,
+            "patient_id": np.char.add("EC-", np.char.zfill(np.arange(self.n_patients).astype(str), 4)),
+            "molecular_group": MOLECULAR_GROUPS[molecular_groups],
             **clinical,
             **pathological,
             **molecular,
@@ -366,12 +357,15 @@ class SyntheticDataGenerator:
         return df
 
     def save(self, df: pd.DataFrame, path: str = None):
-        """Save dataset to CSV"""
+        """Save dataset to CSV, or to Parquet (Snappy) for a .parquet path"""
         if path is None:
             path = settings.SYNTHETIC_DATA_PATH
 
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        df.to_csv(path, index=False)
+        if path.endswith(".parquet"):
+            df.to_parquet(path, compression="snappy", index=False)
+        else:
+            df.to_csv(path, index=False)
         print(f"\nDataset saved to: {path}")
 
 
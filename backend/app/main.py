@@ -6,11 +6,20 @@ AI-Driven Molecular Risk Stratification for Endometrial Cancer
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
+import sys
+
+import numpy as np
 
 from app.config import settings
 from app.api.routes import prediction, explanation, reports, scenarios, document
+from app.core.risk_engine import get_risk_engine
+from app.core.explainer import get_shap_explainer
 
 # Configure logging
 logging.basicConfig(
@@ -20,6 +29,49 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize application on startup"""
+    logger.info(f"Starting {settings.APP_NAME} v{settings.VERSION}")
+    logger.info(f"Environment: {settings.ENVIRONMENT}")
+    logger.info("Loading ML model and initializing SHAP explainer...")
+
+    # Routes hand blocking work (PDF parsing, image preparation, model/SHAP)
+    # to the loop's default executor via asyncio.to_thread. Sized like the
+    # stdlib default, which leaves headroom for I/O-bound jobs on small hosts
+    # while still bounding bursts; the named threads show up in profiles.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(
+            max_workers=min(32, (os.cpu_count() or 1) + 4),
+            thread_name_prefix="oncorisk-worker"
+        )
+    )
+
+    # Runs per worker (after any pre-fork import), so XGBoost's predictor
+    # and OpenMP threads start here rather than on the first request
+    await asyncio.to_thread(_warm_up_models)
+
+    yield
+
+    # The AI agent is imported on first use; close its pooled connections
+    # only if some request loaded it
+    ai_agent_module = sys.modules.get("app.services.ai_agent")
+    if ai_agent_module is not None:
+        await ai_agent_module.ai_agent.aclose()
+
+
+def _warm_up_models():
+    """Build the model/explainer singletons and score one dummy row"""
+    engine = get_risk_engine()
+    explainer = get_shap_explainer()
+
+    engine.warm_up()
+    # Call the explainer directly so the dummy row never lands in the SHAP cache
+    explainer.explainer.shap_values(np.zeros((1, len(engine.feature_names)), dtype=np.float32))
+    logger.info("Model and SHAP explainer warmed up")
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
@@ -42,6 +94,8 @@ app = FastAPI(
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -54,15 +108,6 @@ app.add_middleware(
 )
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize application on startup"""
-    logger.info(f"Starting {settings.APP_NAME} v{settings.VERSION}")
-    logger.info(f"Environment: {settings.ENVIRONMENT}")
-    logger.info("Loading ML model and initializing SHAP explainer...")
-    # Model loading will happen in the routes/dependencies
-
-
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint"""
@@ -96,7 +141,7 @@ app.include_router(document.router, prefix="/api/v1", tags=["Document Analysis"]
 async def global_exception_handler(request, exc):
     """Global exception handler"""
     logger.error(f"Global exception: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "error": "Internal server error",
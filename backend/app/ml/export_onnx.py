@@ -0,0 +1,62 @@
+"""
+ONNX Export Script
+
+Converts the trained XGBoost model to ONNX so the risk engine can score small
+batches with ONNX Runtime. Run after train_model.py; the export records the
+SHA-256 of the model file it was converted from, and the risk engine ignores
+an export that no longer matches.
+"""
+
+import hashlib
+import os
+
+import xgboost as xgb
+from onnxmltools import convert_xgboost
+from onnxmltools.convert.common.data_types import FloatTensorType
+
+from app.config import settings
+from app.core.risk_engine import ONNX_INPUT_NAME, ONNX_SOURCE_DIGEST_KEY
+
+# Opset supported by every onnxruntime release the backend pins against
+TARGET_OPSET = 15
+
+
+def export_onnx(model_path: str = None, onnx_path: str = None) -> str:
+    """
+    Export the XGBoost model to ONNX
+
+    Args:
+        model_path: Path to trained XGBoost model (defaults to settings.MODEL_PATH)
+        onnx_path: Output path (defaults to model.onnx beside the model)
+
+    Returns:
+        Path the ONNX model was written to
+    """
+    model_path = model_path or settings.MODEL_PATH
+    onnx_path = onnx_path or os.path.splitext(model_path)[0] + ".onnx"
+
+    model = xgb.XGBClassifier()
+    model.load_model(model_path)
+    n_features = model.get_booster().num_features()
+
+    onnx_model = convert_xgboost(
+        model,
+        initial_types=[(ONNX_INPUT_NAME, FloatTensorType([None, n_features]))],
+        target_opset=TARGET_OPSET,
+    )
+
+    with open(model_path, "rb") as f:
+        digest = onnx_model.metadata_props.add()
+        digest.key = ONNX_SOURCE_DIGEST_KEY
+        digest.value = hashlib.sha256(f.read()).hexdigest()
+
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    with open(onnx_path, "wb") as f:
+        f.write(onnx_model.SerializeToString())
+
+    print(f"ONNX model saved to: {onnx_path}")
+    return onnx_path
+
+
+if __name__ == "__main__":
+    export_onnx()
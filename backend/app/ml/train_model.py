@@ -6,6 +6,7 @@ Trains the risk prediction model on synthetic data and saves it for inference.
 
 import pandas as pd
 import numpy as np
+from sklearn.base import clone
 from sklearn.model_selection import train_test_split, cross_val_score, StratifiedKFold
 from sklearn.metrics import (
     roc_auc_score,
@@ -19,6 +20,7 @@ import os
 import json
 
 from app.config import settings
+from app.core.explainer import cuda_available
 from app.data.synthetic_generator import generate_synthetic_data
 from app.data.feature_definitions import (
     STAGE_ENCODING,
@@ -35,6 +37,20 @@ from app.data.feature_definitions import (
 )
 
 
+class _PruningCallback(xgb.callback.TrainingCallback):
+    """Report each round's validation AUC to an Optuna trial; stop once it should be pruned"""
+
+    def __init__(self, trial):
+        super().__init__()
+        self.trial = trial
+        self.pruned = False
+
+    def after_iteration(self, model, epoch, evals_log) -> bool:
+        self.trial.report(evals_log["validation_0"]["auc"][-1], epoch)
+        self.pruned = self.trial.should_prune()
+        return self.pruned
+
+
 class RiskModelTrainer:
     """Train XGBoost risk prediction model"""
 
@@ -54,7 +70,10 @@ class RiskModelTrainer:
         """Load or generate training data"""
         if os.path.exists(self.data_path):
             print(f"Loading data from {self.data_path}")
-            df = pd.read_csv(self.data_path)
+            if self.data_path.endswith(".parquet"):
+                df = pd.read_parquet(self.data_path)
+            else:
+                df = pd.read_csv(self.data_path)
         else:
             print("Generating synthetic data...")
             df = generate_synthetic_data(n_patients=settings.N_SYNTHETIC_PATIENTS, save=True)
@@ -73,27 +92,26 @@ class RiskModelTrainer:
             Tuple of (X, y, feature_names)
         """
 
-        # Encode categorical features
-        df_encoded = df.copy()
-
-        df_encoded["stage_encoded"] = df["stage"].map(STAGE_ENCODING)
-        df_encoded["histology_encoded"] = df["histology"].map(HISTOLOGY_ENCODING)
-        df_encoded["grade_encoded"] = df["grade"].map(GRADE_ENCODING)
-        df_encoded["lvsi_encoded"] = df["lvsi"].map(LVSI_ENCODING)
-        df_encoded["myometrial_encoded"] = df["myometrial_invasion"].map(MYOMETRIAL_ENCODING)
-        df_encoded["lymph_nodes_encoded"] = df["lymph_nodes"].map(LYMPH_NODE_ENCODING)
-
-        df_encoded["pole_encoded"] = df["pole_status"].map(POLE_ENCODING)
-        df_encoded["mmr_encoded"] = df["mmr_status"].map(MMR_ENCODING)
-        df_encoded["p53_encoded"] = df["p53_status"].map(P53_ENCODING)
-        df_encoded["l1cam_encoded"] = df["l1cam_status"].map(L1CAM_ENCODING)
-        df_encoded["ctnnb1_encoded"] = df["ctnnb1_status"].map(CTNNB1_ENCODING)
-
-        df_encoded["diabetes_int"] = df["diabetes"].astype(int)
+        # Encode categorical features (only the encoded columns are built;
+        # the raw frame is not copied)
+        encoded = {
+            "stage_encoded": df["stage"].map(STAGE_ENCODING),
+            "histology_encoded": df["histology"].map(HISTOLOGY_ENCODING),
+            "grade_encoded": df["grade"].map(GRADE_ENCODING),
+            "lvsi_encoded": df["lvsi"].map(LVSI_ENCODING),
+            "myometrial_encoded": df["myometrial_invasion"].map(MYOMETRIAL_ENCODING),
+            "lymph_nodes_encoded": df["lymph_nodes"].map(LYMPH_NODE_ENCODING),
+            "pole_encoded": df["pole_status"].map(POLE_ENCODING),
+            "mmr_encoded": df["mmr_status"].map(MMR_ENCODING),
+            "p53_encoded": df["p53_status"].map(P53_ENCODING),
+            "l1cam_encoded": df["l1cam_status"].map(L1CAM_ENCODING),
+            "ctnnb1_encoded": df["ctnnb1_status"].map(CTNNB1_ENCODING),
+            "diabetes_int": df["diabetes"].to_numpy(dtype=np.uint8),
+        }
 
         # Also encode molecular_group as it's a strong predictor
         molecular_group_encoding = {"POLEmut": 0, "MMRd": 1, "NSMP": 2, "p53abn": 3}
-        df_encoded["molecular_group_encoded"] = df["molecular_group"].map(molecular_group_encoding)
+        encoded["molecular_group_encoded"] = df["molecular_group"].map(molecular_group_encoding)
 
         # Select features for training (in order of importance)
         feature_cols = [
@@ -115,13 +133,19 @@ class RiskModelTrainer:
             "diabetes_int",
         ]
 
-        # Handle missing values (fill ER/PR with median if needed)
-        for col in feature_cols:
-            if df_encoded[col].isnull().any():
-                df_encoded[col].fillna(df_encoded[col].median(), inplace=True)
+        # Write each feature straight into one float32 matrix (the dtype
+        # XGBoost bins in), column by column
+        X = np.empty((len(df), len(feature_cols)), dtype=np.float32)
+        for i, col in enumerate(feature_cols):
+            X[:, i] = encoded[col] if col in encoded else df[col]
 
-        X = df_encoded[feature_cols].values
-        y = df_encoded["recurrence"].astype(int).values
+        # Handle missing values (fill with the column median if needed)
+        for i in range(X.shape[1]):
+            missing = np.isnan(X[:, i])
+            if missing.any():
+                X[missing, i] = np.median(X[~missing, i])
+
+        y = df["recurrence"].astype(int).values
 
         self.feature_names = feature_cols
 
@@ -154,6 +178,7 @@ class RiskModelTrainer:
         params = {
             "objective": "binary:logistic",
             "eval_metric": "auc",
+            "tree_method": "hist",  # The default since XGBoost 2.0; pinned for older installs
             "max_depth": 5,
             "learning_rate": 0.05,
             "n_estimators": 200,
@@ -167,6 +192,18 @@ class RiskModelTrainer:
             "random_state": settings.RANDOM_SEED,
         }
 
+        # GPU histogram building only beats CPU on large datasets; below that,
+        # transfer and kernel-launch overhead dominate
+        use_gpu = (
+            settings.TRAIN_USE_GPU
+            and len(X_train) >= settings.TRAIN_GPU_MIN_ROWS
+            and cuda_available()
+        )
+        params["device"] = "cuda" if use_gpu else "cpu"
+
+        if settings.HPO_TRIALS > 0:
+            params.update(self.tune(X_train, y_train, params, n_trials=settings.HPO_TRIALS))
+
         self.best_params = params
 
         # Train model
@@ -177,6 +214,8 @@ class RiskModelTrainer:
             eval_set=[(X_test, y_test)],
             verbose=False,
         )
+        # Evaluation and the saved model score numpy input on the CPU
+        self.model.set_params(device="cpu")
 
         # Evaluate
         self._evaluate(X_train, y_train, X_test, y_test)
@@ -187,6 +226,68 @@ class RiskModelTrainer:
 
         return self.model
 
+    def tune(self, X, y, base_params: dict, n_trials: int = 100) -> dict:
+        """
+        Search hyperparameters with Optuna (TPE sampler, Hyperband pruning)
+
+        Trials are scored on a validation split of the training data, so the
+        held-out test set never influences the search.
+
+        Args:
+            X: Training feature matrix
+            y: Training labels
+            base_params: Fixed parameters (objective, rounds, class weight, ...)
+            n_trials: Number of trials to run
+
+        Returns:
+            Best values for the tuned parameters
+        """
+        import optuna
+
+        print(f"\n=== Hyperparameter Search ({n_trials} trials) ===")
+
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X, y, test_size=0.2, random_state=settings.RANDOM_SEED, stratify=y
+        )
+
+        def objective(trial):
+            params = {
+                **base_params,
+                "max_depth": trial.suggest_int("max_depth", 3, 8),
+                "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3, log=True),
+                "subsample": trial.suggest_float("subsample", 0.5, 1.0),
+                "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
+                "min_child_weight": trial.suggest_int("min_child_weight", 1, 10),
+                "gamma": trial.suggest_float("gamma", 1e-3, 5.0, log=True),
+                "reg_alpha": trial.suggest_float("reg_alpha", 1e-3, 10.0, log=True),
+                "reg_lambda": trial.suggest_float("reg_lambda", 1e-3, 10.0, log=True),
+            }
+            pruning = _PruningCallback(trial)
+            model = xgb.XGBClassifier(**params, callbacks=[pruning])
+            model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+            if pruning.pruned:
+                raise optuna.TrialPruned()
+            return model.evals_result()["validation_0"]["auc"][-1]
+
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        # A fixed study name keeps Hyperband's bracket assignment (hashed from
+        # the name) reproducible along with the seeded sampler
+        study = optuna.create_study(
+            study_name="risk-model-hpo",
+            direction="maximize",
+            sampler=optuna.samplers.TPESampler(seed=settings.RANDOM_SEED),
+            pruner=optuna.pruners.HyperbandPruner(
+                min_resource=20, max_resource=base_params["n_estimators"]
+            ),
+        )
+        study.optimize(objective, n_trials=n_trials)
+
+        pruned = sum(t.state == optuna.trial.TrialState.PRUNED for t in study.trials)
+        print(f"Best validation AUC: {study.best_value:.4f} ({pruned}/{n_trials} trials pruned)")
+        print(f"Best parameters: {study.best_params}")
+
+        return study.best_params
+
     def _evaluate(self, X_train, y_train, X_test, y_test):
         """Evaluate model performance"""
 
@@ -227,7 +328,13 @@ class RiskModelTrainer:
         print("\n=== 10-Fold Cross-Validation ===")
 
         cv = StratifiedKFold(n_splits=10, shuffle=True, random_state=settings.RANDOM_SEED)
-        cv_scores = cross_val_score(self.model, X, y, cv=cv, scoring="roc_auc")
+
+        # Folds train in parallel; split the cores between them so each
+        # fold's XGBoost threads don't oversubscribe the machine
+        n_cpus = os.cpu_count() or 1
+        fold_jobs = min(cv.get_n_splits(), n_cpus)
+        estimator = clone(self.model).set_params(n_jobs=max(1, n_cpus // fold_jobs))
+        cv_scores = cross_val_score(estimator, X, y, cv=cv, scoring="roc_auc", n_jobs=fold_jobs)
 
         print(f"CV AUC Scores: {cv_scores}")
         print(f"Mean CV AUC: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
@@ -240,7 +347,8 @@ class RiskModelTrainer:
 
         os.makedirs(os.path.dirname(model_path), exist_ok=True)
 
-        # Save as JSON for XGBoost
+        # XGBoost picks the format from the extension: .json, or .ubj for
+        # binary UBJSON (smaller, and ~9x faster to load)
         self.model.save_model(model_path)
         print(f"\nModel saved to: {model_path}")
 
@@ -251,7 +359,7 @@ class RiskModelTrainer:
             "version": settings.VERSION,
         }
 
-        metadata_path = model_path.replace(".json", "_metadata.json")
+        metadata_path = os.path.splitext(model_path)[0] + "_metadata.json"
         with open(metadata_path, "w") as f:
             json.dump(metadata, f, indent=2)
 
@@ -4,7 +4,7 @@ Explanation Models
 Models for SHAP explainability API responses.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Literal
 
 
@@ -19,8 +19,8 @@ class FeatureContribution(BaseModel):
     color: str = Field(..., description="Hex color for visualization")
     importance_rank: int = Field(..., description="Rank by absolute SHAP value (1 = most important)")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "name": "p53_status",
                 "display_name": "p53 Status",
@@ -30,7 +30,8 @@ class FeatureContribution(BaseModel):
                 "color": "#ef4444",
                 "importance_rank": 1,
             }
-        }
+        },
+    )
 
 
 class FeatureInteraction(BaseModel):
@@ -43,8 +44,8 @@ class FeatureInteraction(BaseModel):
     interaction_value: float = Field(..., description="Interaction effect value")
     interpretation: str = Field(..., description="Human-readable interpretation")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "feature1_name": "p53_status",
                 "feature1_display": "p53 Status",
@@ -53,7 +54,8 @@ class FeatureInteraction(BaseModel):
                 "interaction_value": 0.08,
                 "interpretation": "p53 abnormality overrides favorable early stage, indicating aggressive biology",
             }
-        }
+        },
+    )
 
 
 class ShapExplanation(BaseModel):
@@ -83,8 +85,8 @@ class ShapExplanation(BaseModel):
     # Summary
     summary: str = Field(..., description="One-sentence explanation of the prediction")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "base_value": 0.15,
                 "prediction": 0.78,
@@ -104,4 +106,5 @@ class ShapExplanation(BaseModel):
                 "interactions": [],
                 "summary": "High risk driven primarily by p53 abnormality and L1CAM positivity",
             }
-        }
+        },
+    )
@@ -4,7 +4,7 @@ Patient Data Models
 Pydantic models for patient clinical, pathological, and molecular data.
 """
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Optional, Literal
 from enum import Enum
 
@@ -143,8 +143,8 @@ class PatientData(BaseModel):
             raise ValueError("p53_pattern is required when p53_status is Abnormal")
         return v
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "patient_id": "EC-0001",
                 "age": 64,
@@ -166,4 +166,5 @@ class PatientData(BaseModel):
                 "er_percent": 20.0,
                 "pr_percent": 10.0,
             }
-        }
+        },
+    )
@@ -4,7 +4,7 @@ Prediction Response Models
 Models for risk prediction API responses.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 from typing import Literal, Optional, Dict, Any
 from enum import Enum
 
@@ -35,8 +35,9 @@ class MolecularClassification(BaseModel):
     rationale: str = Field(..., description="Explanation of classification")
     clinical_significance: str = Field(..., description="Clinical implications")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "group": "p53abn",
                 "subtype": None,
@@ -44,7 +45,8 @@ class MolecularClassification(BaseModel):
                 "rationale": "p53 immunohistochemistry shows abnormal pattern (missense)",
                 "clinical_significance": "Highest risk group with aggressive biology. Benefits from systemic therapy.",
             }
-        }
+        },
+    )
 
 
 class FIGO2023Staging(BaseModel):
@@ -59,8 +61,9 @@ class FIGO2023Staging(BaseModel):
     clinical_implications: str = Field(..., description="Treatment implications based on staging")
     staging_system: str = Field(default="FIGO 2023 (Molecular-Integrated)", description="Staging system used")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "anatomical_stage": "IA",
                 "figo_2023_stage": "IC",
@@ -71,7 +74,8 @@ class FIGO2023Staging(BaseModel):
                 "clinical_implications": "Recommend combined chemoradiotherapy per PORTEC-3",
                 "staging_system": "FIGO 2023 (Molecular-Integrated)"
             }
-        }
+        },
+    )
 
 
 class PredictionResult(BaseModel):
@@ -111,8 +115,12 @@ class PredictionResult(BaseModel):
     model_version: str = Field(..., description="Model version used")
     assessment_date: str = Field(..., description="Date of assessment (ISO format)")
 
-    class Config:
-        json_schema_extra = {
+    # Encoded feature row the model scored (internal; never serialized), so
+    # explanations can reuse it instead of re-encoding the patient
+    _features: Any = PrivateAttr(default=None)
+
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "recurrence_probability": 0.78,
                 "risk_category": "HIGH",
@@ -130,4 +138,5 @@ class PredictionResult(BaseModel):
                 "model_version": "1.0.0",
                 "assessment_date": "2025-12-19T10:30:00Z",
             }
-        }
+        },
+    )
@@ -4,8 +4,8 @@ Clinical Report Models
 Models for clinical report generation.
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Tuple
 
 
 class EvidenceItem(BaseModel):
@@ -17,8 +17,9 @@ class EvidenceItem(BaseModel):
     p_value: Optional[float] = Field(None, description="P-value (if applicable)")
     url: Optional[str] = Field(None, description="Reference URL")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "source": "PORTEC-3 (10-year follow-up)",
                 "finding": "OS 52.7% vs 36.6% with CTRT vs RT alone in p53abn",
@@ -26,7 +27,8 @@ class EvidenceItem(BaseModel):
                 "p_value": 0.021,
                 "url": "https://pubmed.ncbi.nlm.nih.gov/...",
             }
-        }
+        },
+    )
 
 
 class ClinicalTrial(BaseModel):
@@ -37,15 +39,17 @@ class ClinicalTrial(BaseModel):
     status: str = Field(..., description="Recruitment status")
     eligibility_note: Optional[str] = Field(None, description="Specific eligibility notes")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "trial_name": "RAINBO p53abn-RED",
                 "intervention": "Chemoradiation + Olaparib (PARP inhibitor)",
                 "status": "Recruiting",
                 "eligibility_note": "Check ECOG status and cardiac function",
             }
-        }
+        },
+    )
 
 
 class Alert(BaseModel):
@@ -54,10 +58,12 @@ class Alert(BaseModel):
     type: str = Field(..., description="Alert type (warning, info, critical)")
     message: str = Field(..., description="Alert message")
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {"type": "warning", "message": "Anatomical stage underestimates biological risk"}
-        }
+        },
+    )
 
 
 class TreatmentRecommendation(BaseModel):
@@ -65,13 +71,15 @@ class TreatmentRecommendation(BaseModel):
 
     primary_recommendation: str = Field(..., description="Primary treatment recommendation")
     rationale: str = Field(..., description="Rationale for recommendation")
-    evidence: List[EvidenceItem] = Field(..., description="Supporting evidence")
-    trial_eligibility: List[ClinicalTrial] = Field(..., description="Eligible clinical trials")
-    alerts: List[Alert] = Field(..., description="Important alerts")
-    contraindications: List[str] = Field(..., description="Contraindications to consider")
-
-    class Config:
-        json_schema_extra = {
+    # Tuples, not lists: cached recommendations are shared across requests
+    evidence: Tuple[EvidenceItem, ...] = Field(..., description="Supporting evidence")
+    trial_eligibility: Tuple[ClinicalTrial, ...] = Field(..., description="Eligible clinical trials")
+    alerts: Tuple[Alert, ...] = Field(..., description="Important alerts")
+    contraindications: Tuple[str, ...] = Field(..., description="Contraindications to consider")
+
+    model_config = ConfigDict(
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "primary_recommendation": "Adjuvant Chemoradiotherapy",
                 "rationale": "p53-abnormal molecular classification with 78% predicted recurrence risk",
@@ -80,7 +88,8 @@ class TreatmentRecommendation(BaseModel):
                 "alerts": [],
                 "contraindications": ["ECOG status", "Cardiac function for chemotherapy"],
             }
-        }
+        },
+    )
 
 
 class ClinicalReport(BaseModel):
@@ -125,8 +134,8 @@ class ClinicalReport(BaseModel):
         description="Legal disclaimer",
     )
 
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "patient_id": "EC-0001",
                 "assessment_date": "2025-12-19T10:30:00Z",
@@ -155,4 +164,5 @@ class ClinicalReport(BaseModel):
                 },
                 "disclaimer": "This report is for clinical decision support only...",
             }
-        }
+        },
+    )
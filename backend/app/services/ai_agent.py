@@ -8,12 +8,21 @@ This agent uses LLM to:
 4. Generate comprehensive risk assessment with medical explanations
 """
 
-import json
+import io
+import os
+import re
+import asyncio
 import base64
+import hashlib
+import importlib.util
+import tempfile
 import httpx
+import orjson
 import logging
-from typing import Dict, Any, Optional, Tuple
-from pydantic import BaseModel, Field
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Literal, Optional, Sequence, Tuple
+from pydantic import BaseModel, Field, ValidationError
 from enum import Enum
 
 from app.config import settings
@@ -35,6 +44,25 @@ class RiskCategory(str, Enum):
     HIGH = "HIGH"
 
 
+# Values the analysis prompt allows for each categorical field. Typed as
+# Literals, they become enums in the OpenAI response schema and anything
+# else fails validation (and goes through the repair loop)
+FIGOStageValue = Literal["IA", "IB", "II", "IIIA", "IIIB", "IIIC1", "IIIC2", "IVA", "IVB"]
+HistologyValue = Literal["Endometrioid", "Serous", "Clear Cell", "Carcinosarcoma", "Mixed"]
+GradeValue = Literal["G1", "G2", "G3"]
+InvasionValue = Literal["<50%", "≥50%"]
+LVSIValue = Literal["Present", "Absent", "Focal", "Substantial"]
+LymphNodeValue = Literal["Negative", "Positive", "Not Assessed"]
+MutationStatus = Literal["Mutated", "Wild-type"]
+TestedMutationStatus = Literal["Mutated", "Wild-type", "Not Tested"]
+MMRStatus = Literal["Proficient", "Deficient", "Not Tested"]
+P53Status = Literal["Wild-type", "Abnormal", "Not Tested"]
+ExpressionStatus = Literal["Positive", "Negative", "Not Tested"]
+MSIStatus = Literal["Stable", "Unstable"]
+TMBStatus = Literal["Low", "High"]
+ProteinStatus = Literal["Intact", "Lost"]
+
+
 class ExtractedPatientData(BaseModel):
     """Structured patient data extracted from document"""
     # Demographics
@@ -47,38 +75,38 @@ class ExtractedPatientData(BaseModel):
     ecog_status: Optional[int] = None
 
     # Pathological
-    stage: Optional[str] = None
-    histology: Optional[str] = None
-    grade: Optional[str] = None
-    myometrial_invasion: Optional[str] = None
-    lvsi: Optional[str] = None
-    lymph_nodes: Optional[str] = None
+    stage: Optional[FIGOStageValue] = None
+    histology: Optional[HistologyValue] = None
+    grade: Optional[GradeValue] = None
+    myometrial_invasion: Optional[InvasionValue] = None
+    lvsi: Optional[LVSIValue] = None
+    lymph_nodes: Optional[LymphNodeValue] = None
     tumor_size: Optional[float] = None
 
     # Molecular - Core TCGA markers
-    pole_status: Optional[str] = None
-    mmr_status: Optional[str] = None
-    p53_status: Optional[str] = None
-    l1cam_status: Optional[str] = None
-    ctnnb1_status: Optional[str] = None
+    pole_status: Optional[TestedMutationStatus] = None
+    mmr_status: Optional[MMRStatus] = None
+    p53_status: Optional[P53Status] = None
+    l1cam_status: Optional[ExpressionStatus] = None
+    ctnnb1_status: Optional[TestedMutationStatus] = None
 
     # NGS Data
-    msi_status: Optional[str] = None
+    msi_status: Optional[MSIStatus] = None
     tmb_score: Optional[float] = None
-    tmb_status: Optional[str] = None
+    tmb_status: Optional[TMBStatus] = None
 
     # Individual MMR proteins
-    mlh1_status: Optional[str] = None
-    pms2_status: Optional[str] = None
-    msh2_status: Optional[str] = None
-    msh6_status: Optional[str] = None
+    mlh1_status: Optional[ProteinStatus] = None
+    pms2_status: Optional[ProteinStatus] = None
+    msh2_status: Optional[ProteinStatus] = None
+    msh6_status: Optional[ProteinStatus] = None
 
     # Additional molecular markers
-    fgfr2_status: Optional[str] = None
-    pten_status: Optional[str] = None
-    pik3ca_status: Optional[str] = None
-    kras_status: Optional[str] = None
-    arid1a_status: Optional[str] = None
+    fgfr2_status: Optional[MutationStatus] = None
+    pten_status: Optional[MutationStatus] = None
+    pik3ca_status: Optional[MutationStatus] = None
+    kras_status: Optional[MutationStatus] = None
+    arid1a_status: Optional[MutationStatus] = None
 
     # Hormone receptors
     er_percent: Optional[float] = None
@@ -89,14 +117,19 @@ class ExtractedPatientData(BaseModel):
 
 
 class MedicalAssessment(BaseModel):
-    """Comprehensive medical assessment"""
+    """
+    Comprehensive medical assessment
+
+    Only the extracted data and the risk assessment itself are required; the
+    narrative and data-quality fields fall back to empty/neutral values
+    """
     # Extracted Data
     patient_data: ExtractedPatientData
 
     # Molecular Classification
     molecular_group: MolecularGroup
-    molecular_group_confidence: float = Field(ge=0, le=1)
-    molecular_rationale: str
+    molecular_group_confidence: float = Field(0.5, ge=0, le=1)
+    molecular_rationale: str = ""
 
     # Risk Assessment
     risk_category: RiskCategory
@@ -104,23 +137,96 @@ class MedicalAssessment(BaseModel):
     five_year_recurrence_risk: float = Field(ge=0, le=100)
 
     # Clinical Interpretation
-    clinical_summary: str
-    key_findings: list[str]
-    risk_factors: list[str]
-    protective_factors: list[str]
+    clinical_summary: str = ""
+    key_findings: list[str] = []
+    risk_factors: list[str] = []
+    protective_factors: list[str] = []
 
     # Treatment Implications
-    treatment_implications: str
-    recommended_surveillance: str
-    clinical_trial_eligibility: list[str]
+    treatment_implications: str = ""
+    recommended_surveillance: str = ""
+    clinical_trial_eligibility: list[str] = []
 
     # Detailed Explanation
-    detailed_explanation: str
+    detailed_explanation: str = ""
 
     # Data Quality
-    extraction_confidence: float = Field(ge=0, le=1)
-    missing_critical_data: list[str]
-    warnings: list[str]
+    extraction_confidence: float = Field(0.5, ge=0, le=1)
+    missing_critical_data: list[str] = []
+    warnings: list[str] = []
+
+
+_MMR_PROTEIN_FIELDS = ("mlh1_status", "pms2_status", "msh2_status", "msh6_status")
+
+
+def classify_molecular(patient: ExtractedPatientData) -> Optional[Tuple[MolecularGroup, str]]:
+    """
+    Apply the TCGA/ProMisE hierarchy (POLEmut > MMRd > p53abn > NSMP)
+
+    Returns the group with its rationale, or None when the extracted markers
+    cannot settle it (NSMP needs POLE, MMR and p53 all tested and normal).
+    """
+    if patient.pole_status == "Mutated":
+        return MolecularGroup.POLEmut, "POLE mutation detected, which takes precedence in the TCGA hierarchy: POLEmut."
+
+    lost = [field.split("_")[0].upper() for field in _MMR_PROTEIN_FIELDS if getattr(patient, field) == "Lost"]
+    evidence = [f"{'/'.join(lost)} loss"] if lost else []
+    if patient.mmr_status == "Deficient":
+        evidence.append("MMR deficient")
+    if patient.msi_status == "Unstable":
+        evidence.append("MSI-high")
+    if evidence:
+        return MolecularGroup.MMRd, f"{', '.join(evidence)} without a POLE mutation: MMRd."
+
+    if patient.p53_status == "Abnormal":
+        return MolecularGroup.p53abn, "Abnormal p53 without a POLE mutation or MMR deficiency: p53abn."
+
+    mmr_proficient = (
+        patient.mmr_status == "Proficient"
+        or patient.msi_status == "Stable"
+        or all(getattr(patient, field) == "Intact" for field in _MMR_PROTEIN_FIELDS)
+    )
+    if patient.pole_status == "Wild-type" and mmr_proficient and patient.p53_status == "Wild-type":
+        return MolecularGroup.NSMP, "POLE wild-type, MMR proficient and p53 wild-type: no specific molecular profile (NSMP)."
+
+    return None
+
+
+def _strict_json_schema(node: Any) -> Any:
+    """
+    Adapt a pydantic JSON schema to OpenAI's strict structured-output subset
+
+    Strict mode needs every property listed as required (optional fields
+    stay nullable via anyOf) and closed objects, and rejects defaults and
+    numeric bounds; the bounds are still enforced by MedicalAssessment.
+    """
+    if isinstance(node, list):
+        return [_strict_json_schema(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    strict = {}
+    for key, value in node.items():
+        if key in ("properties", "$defs"):
+            # Name -> subschema maps; the names themselves are not keywords
+            strict[key] = {name: _strict_json_schema(sub) for name, sub in value.items()}
+        elif key not in ("default", "minimum", "maximum", "title"):
+            strict[key] = _strict_json_schema(value)
+    if "properties" in node:
+        strict["required"] = list(node["properties"])
+        strict["additionalProperties"] = False
+    return strict
+
+
+# Built once; makes OpenAI constrain its output to the MedicalAssessment shape
+OPENAI_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "MedicalAssessment",
+        "schema": _strict_json_schema(MedicalAssessment.model_json_schema()),
+        "strict": True
+    }
+}
 
 
 # System prompt for the AI agent
@@ -160,20 +266,15 @@ Protective Factors:
 Always provide evidence-based assessments with clear rationale. When data is missing, note it and explain how it affects the assessment."""
 
 
-def get_document_analysis_prompt(document_text: str, document_type: str = "unknown") -> str:
-    """Generate the prompt for document analysis"""
-    return f"""Analyze this medical document and extract all relevant patient data for endometrial cancer risk stratification.
-
-Document Type: {document_type}
-
-DOCUMENT CONTENT:
----
-{document_text}
----
+# Extraction instructions and output schema. They never vary, so they go in
+# the system prompt after MEDICAL_AGENT_SYSTEM_PROMPT and the document goes
+# last: every request then shares the same >1024-token prefix, which both
+# providers' prompt caches can reuse
+DOCUMENT_ANALYSIS_INSTRUCTIONS = """Analyze the medical document in the user message and extract all relevant patient data for endometrial cancer risk stratification.
 
 Please provide a comprehensive analysis in the following JSON format:
-{{
-    "patient_data": {{
+{
+    "patient_data": {
         "age": <number or null>,
         "gender": "<string or null>",
         "bmi": <number or null>,
@@ -203,7 +304,7 @@ Please provide a comprehensive analysis in the following JSON format:
         "kras_status": "<Mutated, Wild-type or null>",
         "er_percent": <0-100 or null>,
         "pr_percent": <0-100 or null>
-    }},
+    },
     "molecular_group": "<POLEmut, MMRd, NSMP, p53abn, or Unknown>",
     "molecular_group_confidence": <0.0-1.0>,
     "molecular_rationale": "<detailed explanation of molecular classification>",
@@ -221,11 +322,174 @@ Please provide a comprehensive analysis in the following JSON format:
     "extraction_confidence": <0.0-1.0>,
     "missing_critical_data": ["<missing data 1>", ...],
     "warnings": ["<any concerns or caveats>", ...]
-}}
+}
 
 Be thorough and precise. Extract ALL available data from the document. If a field is not mentioned, set it to null.
 For molecular classification, strictly follow the TCGA hierarchy: POLEmut > MMRd > p53abn > NSMP."""
 
+DOCUMENT_ANALYSIS_SYSTEM_PROMPT = f"{MEDICAL_AGENT_SYSTEM_PROMPT}\n\n{DOCUMENT_ANALYSIS_INSTRUCTIONS}"
+
+
+def get_document_analysis_prompt(document_text: str, document_type: str = "unknown") -> str:
+    """Generate the per-document part of the analysis prompt"""
+    return f"""Document Type: {document_type}
+
+DOCUMENT CONTENT:
+---
+{document_text}
+---"""
+
+
+# Lines mentioning anything the extraction schema asks for. Long documents
+# are cut down to these (plus PREFILTER_CONTEXT_LINES either side) before
+# they reach the LLM. Matched against lowercased text: a lowercase pattern
+# runs about 3x faster than the same one compiled with (?i)
+_RELEVANT_LINE = re.compile(
+    r"pole|mmr|mlh1|pms2|msh[26]|p53|tp53|l1cam|ctnnb1|msi|tmb|fgfr2|pten|pik3ca|kras|arid1a"
+    r"|figo|stage|grade|lvsi|lymph|node|invasion|myometri|histolog|carcinoma|tumou?r|size"
+    r"|ecog|bmi|weight|diabet|diagnos|\bage\b|years?.old|\b\d{2}\s?y\b|dob|birth|gender|\bsex\b"
+    r"|\b(?:er|pr)\b|estrogen|oestrogen|progesterone|receptor|mutat|wild.type|intact|\blost\b|loss|deficien|proficien"
+    # Hebrew report headers (age, sex, date of birth, diagnosis)
+    r"|גיל|מין|לידה|אבחנה"
+)
+
+# Documents up to this size are sent whole; trimming them saves too little
+PREFILTER_MIN_CHARS = 4000
+PREFILTER_CONTEXT_LINES = 2
+
+
+def prefilter_medical_text(text: str) -> str:
+    """
+    Keep only the lines of a long document that can inform the extraction
+
+    A line is kept when it, or a line within PREFILTER_CONTEXT_LINES of it,
+    matches _RELEVANT_LINE. Short documents, and documents where nothing
+    matches, are returned unchanged.
+    """
+    if len(text) <= PREFILTER_MIN_CHARS:
+        return text
+
+    lines = text.split("\n")
+    keep = [False] * len(lines)
+    for i, line in enumerate(text.lower().split("\n")):
+        if _RELEVANT_LINE.search(line):
+            for j in range(max(0, i - PREFILTER_CONTEXT_LINES), min(len(lines), i + PREFILTER_CONTEXT_LINES + 1)):
+                keep[j] = True
+
+    if not any(keep):
+        return text
+    return "\n".join(line for line, kept in zip(lines, keep) if kept)
+
+
+# Number of recent document assessments kept to short-circuit repeat uploads
+ANALYSIS_CACHE_SIZE = 64
+
+# HTTP/2 lets concurrent provider calls share one connection; needs the h2
+# package (httpx[http2]), otherwise the pool speaks HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Longest image edge the vision models work at; bigger uploads are
+# downscaled here instead of being shipped whole and resized by the provider
+MAX_IMAGE_EDGE = 1568
+
+# Extra LLM round-trips allowed to fix output that fails schema validation
+MAX_REPAIR_ATTEMPTS = 2
+
+# Fingerprint of the prompt and response schema an assessment was produced
+# with; part of every cache key, so editing either retires older cached analyses
+PROMPT_VERSION = hashlib.blake2b(
+    DOCUMENT_ANALYSIS_SYSTEM_PROMPT.encode("utf-8")
+    + orjson.dumps(MedicalAssessment.model_json_schema(), option=orjson.OPT_SORT_KEYS),
+    digest_size=8
+).hexdigest()
+
+
+def prepare_image(raw: bytes) -> Tuple[str, str]:
+    """
+    Base64-encode an uploaded image for the vision APIs
+
+    PNG/JPEG images within MAX_IMAGE_EDGE are sent as they are; anything
+    larger (or in another format) is downscaled and re-encoded as JPEG.
+
+    Returns:
+        (base64 data, media type)
+    """
+    from PIL import Image  # Only the image-upload path needs Pillow
+
+    with Image.open(io.BytesIO(raw)) as image:
+        if max(image.size) <= MAX_IMAGE_EDGE and image.format in ("PNG", "JPEG"):
+            return base64.b64encode(raw).decode("ascii"), Image.MIME[image.format]
+
+        image.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, "JPEG", quality=85, optimize=True)
+
+    return base64.b64encode(buffer.getvalue()).decode("ascii"), "image/jpeg"
+
+
+class CachedAssessment(BaseModel):
+    """On-disk cache record: an assessment plus the request that produced it"""
+    provider: str
+    model: str
+    prompt_version: str
+    created_at: str
+    assessment: MedicalAssessment
+
+
+class ExtractionCache:
+    """
+    Document assessments persisted as JSON files named by request digest
+
+    get/put do blocking file I/O; async callers run them in a worker thread
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[MedicalAssessment]:
+        """Cached assessment for key, or None (unreadable entries are evicted)"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            return CachedAssessment.model_validate_json(raw).assessment
+        except ValidationError:
+            # Truncated write or an entry from an older schema
+            logger.warning(f"Discarding invalid cached analysis {key}")
+            os.remove(path)
+            return None
+
+    def put(self, key: str, record: CachedAssessment) -> None:
+        """Store record under key; the rename keeps readers from seeing partial files"""
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(record.model_dump_json())
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            # A full or read-only disk must not fail an analysis we already paid for
+            logger.warning(f"Could not cache analysis {key}: {e}")
+
+
+def _repair_prompt(error: ValueError) -> str:
+    """Follow-up turn asking the model to fix output that failed parsing"""
+    if isinstance(error, ValidationError):
+        details = "\n".join(
+            f"- {'.'.join(map(str, err['loc'])) or '<root>'}: {err['msg']}"
+            for err in error.errors(include_url=False)
+        )
+    else:
+        details = f"- {error}"
+    return f"Your previous JSON output had validation errors:\n{details}\nReturn the corrected JSON only."
+
 
 class AIAgent:
     """AI Agent for medical document analysis"""
@@ -235,98 +499,182 @@ class AIAgent:
         self.openai_key = settings.OPENAI_API_KEY
         self.model = settings.AI_MODEL
         self.max_tokens = settings.AI_MAX_TOKENS
-
-    def _get_provider(self) -> str:
-        """Determine which AI provider to use"""
-        if self.anthropic_key:
-            return "anthropic"
-        elif self.openai_key:
-            return "openai"
+        self._analysis_cache: "OrderedDict[str, MedicalAssessment]" = OrderedDict()
+        self._extraction_cache = ExtractionCache(settings.AI_CACHE_DIR) if settings.AI_CACHE_DIR else None
+        self._client: Optional[httpx.AsyncClient] = None
+        # Keys are fixed for the process lifetime, so the provider is resolved
+        # once. No key is not an error here: the singleton is created at import
+        # and the route answers 503 before calling analyze_document
+        self._provider: Optional[str] = (
+            "anthropic" if self.anthropic_key else "openai" if self.openai_key else None
+        )
+        if self._provider == "anthropic":
+            self._call_provider = self._call_anthropic
+            self._user_message = self._anthropic_user_message
         else:
-            raise ValueError("No AI API key configured. Set ANTHROPIC_API_KEY or OPENAI_API_KEY in .env")
+            self._call_provider = self._call_openai
+            self._user_message = self._openai_user_message
+
+    def _http_client(self) -> httpx.AsyncClient:
+        """Connection pool shared by all provider calls, created on first use"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(120.0, connect=10.0),
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+            )
+        return self._client
 
-    async def _call_anthropic(self, system_prompt: str, user_prompt: str, image_data: Optional[str] = None) -> str:
-        """Call Anthropic Claude API"""
-        headers = {
-            "x-api-key": self.anthropic_key,
-            "anthropic-version": "2023-06-01",
-            "content-type": "application/json"
-        }
+    async def aclose(self) -> None:
+        """Close pooled provider connections (application shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _analysis_key(
+        self,
+        provider: str,
+        document_text: str,
+        document_type: str,
+        image_data: Optional[str]
+    ) -> str:
+        """Digest identifying one LLM request (provider, model, prompt and inputs)"""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (provider, self.model, PROMPT_VERSION, document_type, document_text, image_data or ""):
+            data = part.encode("utf-8")
+            # Length-prefixed so no two distinct inputs hash the same bytes
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _remember(self, key: str, assessment: MedicalAssessment) -> None:
+        """Keep a private copy of assessment in the in-memory LRU"""
+        self._analysis_cache[key] = assessment.model_copy(deep=True)
+        if len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+            self._analysis_cache.popitem(last=False)
 
-        # Build message content
+    def _get_provider(self) -> str:
+        """Return the AI provider resolved at construction"""
+        if self._provider is None:
+            raise ValueError("No AI API key configured. Set ANTHROPIC_API_KEY or OPENAI_API_KEY in .env")
+        return self._provider
+
+    @staticmethod
+    def _anthropic_user_message(
+        user_prompt: str,
+        image_data: Optional[str] = None,
+        image_media_type: str = "image/png"
+    ) -> Dict[str, Any]:
+        """First user turn for the Anthropic Messages API"""
         content = []
         if image_data:
             content.append({
                 "type": "image",
                 "source": {
                     "type": "base64",
-                    "media_type": "image/png",  # Adjust based on actual type
+                    "media_type": image_media_type,
                     "data": image_data
                 }
             })
         content.append({"type": "text", "text": user_prompt})
+        return {"role": "user", "content": content}
+
+    @staticmethod
+    def _openai_user_message(
+        user_prompt: str,
+        image_data: Optional[str] = None,
+        image_media_type: str = "image/png"
+    ) -> Dict[str, Any]:
+        """First user turn for the OpenAI Chat Completions API"""
+        if image_data:
+            return {
+                "role": "user",
+                "content": [
+                    {"type": "image_url", "image_url": {"url": f"data:{image_media_type};base64,{image_data}"}},
+                    {"type": "text", "text": user_prompt}
+                ]
+            }
+        return {"role": "user", "content": user_prompt}
+
+    async def _call_anthropic(self, system_prompt: str, messages: Sequence[Dict[str, Any]]) -> str:
+        """Call Anthropic Claude API"""
+        headers = {
+            "x-api-key": self.anthropic_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json"
+        }
 
         payload = {
             "model": self.model,
             "max_tokens": self.max_tokens,
-            "system": system_prompt,
-            "messages": [{"role": "user", "content": content}]
+            # Mark the system prompt as a cacheable prefix; only the document
+            # in the user turn is billed at the full input rate on repeat calls
+            "system": [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ],
+            "messages": list(messages)
         }
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                "https://api.anthropic.com/v1/messages",
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["content"][0]["text"]
-
-    async def _call_openai(self, system_prompt: str, user_prompt: str, image_data: Optional[str] = None) -> str:
+        response = await self._http_client().post(
+            "https://api.anthropic.com/v1/messages",
+            headers=headers,
+            # orjson encodes the (possibly multi-MB base64) payload straight
+            # to bytes, several times faster than httpx's json.dumps + encode
+            content=orjson.dumps(payload)
+        )
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        return result["content"][0]["text"]
+
+    async def _call_openai(self, system_prompt: str, messages: Sequence[Dict[str, Any]]) -> str:
         """Call OpenAI API"""
         headers = {
             "Authorization": f"Bearer {self.openai_key}",
             "Content-Type": "application/json"
         }
 
-        messages = [
-            {"role": "system", "content": system_prompt}
-        ]
-
-        if image_data:
-            messages.append({
-                "role": "user",
-                "content": [
-                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_data}"}},
-                    {"type": "text", "text": user_prompt}
-                ]
-            })
-        else:
-            messages.append({"role": "user", "content": user_prompt})
-
         payload = {
             "model": "gpt-4o",
-            "messages": messages,
+            "messages": [{"role": "system", "content": system_prompt}, *messages],
             "max_tokens": self.max_tokens,
-            "response_format": {"type": "json_object"}
+            "response_format": OPENAI_RESPONSE_FORMAT
         }
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+        response = await self._http_client().post(
+            "https://api.openai.com/v1/chat/completions",
+            headers=headers,
+            content=orjson.dumps(payload)
+        )
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        return result["choices"][0]["message"]["content"]
+
+    @staticmethod
+    def _parse_assessment(response: str) -> MedicalAssessment:
+        """
+        Build the assessment from raw model output
+
+        Raises ValueError (including pydantic's ValidationError) when the
+        output is not JSON or does not fit the schema
+        """
+        # Find JSON in the response (it might be wrapped in markdown code blocks)
+        json_start = response.find('{')
+        json_end = response.rfind('}') + 1
+        if json_start == -1 or json_end <= json_start:
+            raise ValueError("No JSON found in response")
+
+        # Parsed and validated in one pass by pydantic-core. A missing or
+        # invalid required field (patient data, molecular group, risk) goes
+        # back to the model through the repair loop rather than being papered
+        # over with a made-up default
+        return MedicalAssessment.model_validate_json(response[json_start:json_end])
 
     async def analyze_document(
         self,
         document_text: str,
         document_type: str = "unknown",
-        image_data: Optional[str] = None
+        image_data: Optional[str] = None,
+        image_media_type: str = "image/png"
     ) -> MedicalAssessment:
         """
         Analyze a medical document and return comprehensive assessment
@@ -335,61 +683,84 @@ class AIAgent:
             document_text: Extracted text from the document
             document_type: Type of document (e.g., "NGS Report", "Pathology Report")
             image_data: Optional base64-encoded image for visual analysis
+            image_media_type: MIME type of image_data (see prepare_image)
 
         Returns:
             MedicalAssessment with extracted data and risk assessment
         """
         provider = self._get_provider()
 
-        user_prompt = get_document_analysis_prompt(document_text, document_type)
+        # Identical uploads skip the LLM round-trip; callers get their own copy
+        cache_key = self._analysis_key(provider, document_text, document_type, image_data)
+        cached = self._analysis_cache.get(cache_key)
+        if cached is not None:
+            self._analysis_cache.move_to_end(cache_key)
+            return cached.model_copy(deep=True)
+
+        if self._extraction_cache is not None:
+            cached = await asyncio.to_thread(self._extraction_cache.get, cache_key)
+            if cached is not None:
+                self._remember(cache_key, cached)
+                return cached
+
+        prompt_text = await asyncio.to_thread(prefilter_medical_text, document_text)
+        user_prompt = get_document_analysis_prompt(prompt_text, document_type)
 
         try:
-            if provider == "anthropic":
-                response = await self._call_anthropic(
-                    MEDICAL_AGENT_SYSTEM_PROMPT,
-                    user_prompt,
-                    image_data
+            user_message = self._user_message(user_prompt, image_data, image_media_type)
+
+            # Output that fails to parse is sent back with the errors for the
+            # model to correct, rather than discarding the whole call. The
+            # first turn, with any (multi-MB) image, is built once and reused
+            messages: List[Dict[str, Any]] = [user_message]
+            for attempt in range(MAX_REPAIR_ATTEMPTS + 1):
+                response = await self._call_provider(DOCUMENT_ANALYSIS_SYSTEM_PROMPT, messages)
+                try:
+                    assessment = self._parse_assessment(response)
+                    break
+                except ValueError as e:
+                    if attempt == MAX_REPAIR_ATTEMPTS:
+                        raise
+                    logger.warning(f"AI output failed validation (attempt {attempt + 1}): {e}")
+                    messages += [
+                        {"role": "assistant", "content": response},
+                        {"role": "user", "content": _repair_prompt(e)},
+                    ]
+
+            if attempt:
+                assessment.warnings.append(
+                    f"AI output needed {attempt} correction round(s) to match the expected format"
                 )
-            else:
-                response = await self._call_openai(
-                    MEDICAL_AGENT_SYSTEM_PROMPT,
-                    user_prompt,
-                    image_data
+            # The group follows from the extracted markers; don't leave it to
+            # the model's judgement when they settle it
+            classified = classify_molecular(assessment.patient_data)
+            if classified is not None:
+                group, rationale = classified
+                if group != assessment.molecular_group:
+                    assessment.warnings.append(
+                        f"Molecular group set to {group.value} from the extracted markers "
+                        f"(the model proposed {assessment.molecular_group.value})"
+                    )
+                    assessment.molecular_rationale = rationale
+                assessment.molecular_group = group
+                assessment.molecular_group_confidence = 1.0
+                assessment.patient_data.molecular_group = group.value
+
+            if len(prompt_text) < len(document_text) // 2:
+                assessment.warnings.append(
+                    f"Only the clinically relevant {len(prompt_text)} of {len(document_text)} "
+                    "document characters were analyzed"
                 )
 
-            # Parse JSON response
-            # Find JSON in the response (it might be wrapped in markdown code blocks)
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start != -1 and json_end > json_start:
-                json_str = response[json_start:json_end]
-                data = json.loads(json_str)
-            else:
-                raise ValueError("No JSON found in response")
-
-            # Construct the assessment
-            patient_data = ExtractedPatientData(**data.get("patient_data", {}))
-
-            assessment = MedicalAssessment(
-                patient_data=patient_data,
-                molecular_group=MolecularGroup(data.get("molecular_group", "Unknown")),
-                molecular_group_confidence=data.get("molecular_group_confidence", 0.5),
-                molecular_rationale=data.get("molecular_rationale", ""),
-                risk_category=RiskCategory(data.get("risk_category", "INTERMEDIATE")),
-                risk_score=data.get("risk_score", 50),
-                five_year_recurrence_risk=data.get("five_year_recurrence_risk", 20),
-                clinical_summary=data.get("clinical_summary", ""),
-                key_findings=data.get("key_findings", []),
-                risk_factors=data.get("risk_factors", []),
-                protective_factors=data.get("protective_factors", []),
-                treatment_implications=data.get("treatment_implications", ""),
-                recommended_surveillance=data.get("recommended_surveillance", ""),
-                clinical_trial_eligibility=data.get("clinical_trial_eligibility", []),
-                detailed_explanation=data.get("detailed_explanation", ""),
-                extraction_confidence=data.get("extraction_confidence", 0.5),
-                missing_critical_data=data.get("missing_critical_data", []),
-                warnings=data.get("warnings", [])
-            )
+            self._remember(cache_key, assessment)
+            if self._extraction_cache is not None:
+                await asyncio.to_thread(self._extraction_cache.put, cache_key, CachedAssessment(
+                    provider=provider,
+                    model=self.model,
+                    prompt_version=PROMPT_VERSION,
+                    created_at=datetime.now(timezone.utc).isoformat(),
+                    assessment=assessment
+                ))
 
             return assessment
 
@@ -397,6 +768,30 @@ class AIAgent:
             logger.error(f"AI analysis failed: {str(e)}")
             raise
 
+    async def analyze_documents_batch(
+        self,
+        items: Sequence[Dict[str, Any]],
+        max_concurrency: int = 8
+    ) -> List[Any]:
+        """
+        Analyze several documents concurrently
+
+        Args:
+            items: analyze_document keyword arguments, one dict per document
+            max_concurrency: Most LLM requests in flight at once
+
+        Returns:
+            One entry per item, in order: its MedicalAssessment, or the
+            exception that analysis raised (one failure doesn't sink the batch)
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def analyze_one(item: Dict[str, Any]) -> MedicalAssessment:
+            async with semaphore:
+                return await self.analyze_document(**item)
+
+        return await asyncio.gather(*(analyze_one(item) for item in items), return_exceptions=True)
+
 
 # Singleton instance
 ai_agent = AIAgent()
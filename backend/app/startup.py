@@ -0,0 +1,24 @@
+"""
+Pre-fork Application Entry Point
+
+For multi-worker deployments. With gunicorn --preload this module is imported
+once in the master process, so the XGBoost model and SHAP explainer are built
+before forking and shared copy-on-write by every worker:
+
+    gunicorn app.startup:app -k uvicorn.workers.UvicornWorker --preload
+
+The worker count and per-worker thread limits come from gunicorn.conf.py.
+"""
+
+import gc
+
+from app.main import app
+from app.core.risk_engine import get_risk_engine
+from app.core.explainer import get_shap_explainer
+
+get_risk_engine()
+get_shap_explainer()
+
+# Keep the collector from touching (and so un-sharing) the preloaded objects
+# in the workers
+gc.freeze()
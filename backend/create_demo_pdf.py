@@ -1,54 +1,62 @@
 """Create a demo PDF for patient data that can be extracted via pattern matching"""
 
+import reportlab
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, cm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
+import functools
+import hashlib
 import os
 
-def create_patient_report_pdf(output_path: str):
-    """Create a professional-looking patient pathology report PDF"""
-
-    doc = SimpleDocTemplate(
-        output_path,
-        pagesize=A4,
-        rightMargin=2*cm,
-        leftMargin=2*cm,
-        topMargin=2*cm,
-        bottomMargin=2*cm
-    )
-
-    styles = getSampleStyleSheet()
-
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=20,
-        alignment=TA_CENTER,
-        textColor=colors.HexColor('#1e3a5f')
-    )
-
-    section_style = ParagraphStyle(
-        'SectionHeader',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceBefore=15,
-        spaceAfter=10,
-        textColor=colors.HexColor('#2563eb')
-    )
-
-    body_style = ParagraphStyle(
-        'BodyText',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=6,
-        leading=14
-    )
+# Paragraph styles are immutable once built; create them once per process
+styles = getSampleStyleSheet()
+
+title_style = ParagraphStyle(
+    'CustomTitle',
+    parent=styles['Heading1'],
+    fontSize=18,
+    spaceAfter=20,
+    alignment=TA_CENTER,
+    textColor=colors.HexColor('#1e3a5f')
+)
+
+section_style = ParagraphStyle(
+    'SectionHeader',
+    parent=styles['Heading2'],
+    fontSize=14,
+    spaceBefore=15,
+    spaceAfter=10,
+    textColor=colors.HexColor('#2563eb')
+)
+
+body_style = ParagraphStyle(
+    'BodyText',
+    parent=styles['Normal'],
+    fontSize=11,
+    spaceAfter=6,
+    leading=14
+)
+
+footer_style = ParagraphStyle(
+    'Footer',
+    parent=styles['Normal'],
+    fontSize=9,
+    textColor=colors.gray,
+    alignment=TA_CENTER
+)
+
+
+@functools.cache
+def _build_elements() -> tuple:
+    """
+    The report's flowables, built once per process
 
+    Layout leaves these untouched (splitting the molecular table across the
+    page break yields new Table objects), so every build can reuse them.
+    """
     elements = []
 
     # Header
@@ -160,17 +168,49 @@ def create_patient_report_pdf(output_path: str):
     elements.append(Spacer(1, 20))
 
     # Footer
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.gray,
-        alignment=TA_CENTER
-    )
     elements.append(Paragraph("This report is for demonstration purposes only.", footer_style))
     elements.append(Paragraph("Generated for OncoRisk EC Clinical Decision Support System", footer_style))
 
-    doc.build(elements)
+    return tuple(elements)
+
+
+def _report_signature() -> str:
+    """Digest of everything the PDF depends on: this script and reportlab's version"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(__file__, "rb") as f:
+        digest.update(f.read())
+    digest.update(reportlab.Version.encode())
+    return digest.hexdigest()
+
+
+def create_patient_report_pdf(output_path: str, force: bool = False):
+    """
+    Create a professional-looking patient pathology report PDF
+
+    The report's content and layout are fixed in this script, so an existing
+    PDF whose .sig file matches the current script is left as is unless
+    force is set.
+    """
+    signature = _report_signature()
+    signature_path = output_path + ".sig"
+    if not force and os.path.exists(output_path) and os.path.exists(signature_path):
+        with open(signature_path) as f:
+            if f.read() == signature:
+                print(f"PDF up to date: {output_path}")
+                return
+
+    doc = SimpleDocTemplate(
+        output_path,
+        pagesize=A4,
+        rightMargin=2*cm,
+        leftMargin=2*cm,
+        topMargin=2*cm,
+        bottomMargin=2*cm
+    )
+
+    doc.build(list(_build_elements()))
+    with open(signature_path, "w") as f:
+        f.write(signature)
     print(f"PDF created: {output_path}")
 
 if __name__ == "__main__":
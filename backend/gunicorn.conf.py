@@ -0,0 +1,19 @@
+"""
+Gunicorn Settings
+
+Loaded automatically from the working directory by every gunicorn deployment
+(Dockerfile, Procfile, Railway, Render).
+"""
+
+import os
+
+# One worker per core unless the platform says otherwise
+workers = int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+
+# With several workers, each one gets a single OpenMP/model thread: N workers
+# each running a full thread pool oversubscribe the CPU, and a single-threaded
+# runtime is safe to fork. A lone worker keeps every core for batch scoring
+# and SHAP. Set here, before --preload imports the app and its settings.
+if workers > 1:
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    os.environ.setdefault("MODEL_N_JOBS", "1")
@@ -0,0 +1,32 @@
+"""
+Tests for rule-based field extraction from document text
+"""
+
+import pytest
+
+from app.api.routes.document import extract_from_text
+
+
+@pytest.mark.parametrize("text, stage", [
+    ("Stage IA", "IA"),
+    ("Stage IA1", "IA"),
+    ("FIGO IB2", "IB"),
+    ("stage II", "II"),
+    ("stage IIA", "II"),
+    ("stage IIB", "II"),
+    ("stage III", "II"),
+    ("Stage IIIA1", "IIIA"),
+    ("stage IIIB", "IIIB"),
+    ("stage IIIC", "II"),
+    ("stage IIIC1", "IIIC1"),
+    ("FIGO IIIC2", "IIIC2"),
+    ("stage IVA", "IVA"),
+    ("Stage IVB", "IVB"),
+])
+def test_stage_maps_to_longest_figo_prefix(text, stage):
+    assert extract_from_text(text)["stage"] == stage
+
+
+@pytest.mark.parametrize("text", ["stage IV", "no staging information"])
+def test_stage_without_figo_match_is_omitted(text):
+    assert "stage" not in extract_from_text(text)